@@ -0,0 +1,40 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+
+# Results of the trials of a cell as rows of (bad routes, total routes)
+Counts = np.ndarray
+
+
+def as_counts(results: Sequence[Tuple[int, int]]) -> Counts:
+    return np.array(results, dtype=np.int64).reshape(-1, 2)
+
+
+def rates(counts: Counts) -> np.ndarray:
+    """Percentage of bad routes of every trial, 0 for trials without routes."""
+    bad, total = counts[:, 0], counts[:, 1]
+    return np.divide(100.0 * bad, total, out=np.zeros(len(counts)), where=total > 0)
+
+
+def mean_rate(counts: Counts) -> float:
+    """Mean of the percentages of the trials, every trial weighs the same."""
+    return float(rates(counts).mean())
+
+
+def rate_variance(counts: Counts) -> float:
+    """Sample variance of the percentages of the trials."""
+    return float(rates(counts).var(ddof=1)) if len(counts) > 1 else float('nan')
+
+
+def pooled_rate(counts: Counts) -> float:
+    """Percentage of bad routes over all trials, every route weighs the same."""
+    bad, total = counts.sum(axis=0)
+    return 100.0 * bad / total if total > 0 else 0.0
+
+
+def weighted_rate_variance(counts: Counts) -> float:
+    """Variance of the percentages of the trials weighted by their number of routes."""
+    total = counts[:, 1]
+    if total.sum() == 0:
+        return float('nan')
+    return float(np.average((rates(counts) - pooled_rate(counts)) ** 2, weights=total))
@@ -1,16 +1,68 @@
+import bz2
 from collections import deque
+import gzip
+import os
+import shutil
+import tempfile
 import networkx as nx
+import numpy as np
 import random
-from typing import Dict, Generator, List, Optional, Tuple
+from operator import itemgetter
+from typing import Callable, Dict, Generator, List, NamedTuple, Optional, TextIO, Tuple, Union
 import pickle
 
 import bgpsecsim.error as error
+import bgpsecsim.keys as keys
 from bgpsecsim.asys import AS, AS_ID, Relation, Route, RoutingPolicy
-from bgpsecsim.routing_policy import DefaultPolicy
+from bgpsecsim.routing_policy import (
+    DefaultPolicy, POLICIES, POLICY_IDS, get_preference_key, local_pref, next_hop_as_id, path_length, unauthenticated,
+)
+from bgpsecsim.topology import DEPLOYMENT_FLAGS, TIER_ONE, TIER_TWO, TIER_THREE, Deployment, Topology
+
+
+# Propagation modes of ASGraph.find_routes_to and ASGraph.hijack_n_hops, both giving the same routing
+# tables: PROPAGATION_FIFO runs a generic FIFO queue of advertisements. PROPAGATION_GAO_REXFORD
+# exploits the valley-free export rules and settles the routes in three phases: up the
+# customer-provider DAG, one peer hop, and down to the customers (see ASGraph._propagate_in_phases).
+PROPAGATION_FIFO = 'fifo'
+PROPAGATION_GAO_REXFORD = 'gao-rexford'
+# Mode used by ASGraph instances that are not given one explicitly
+PROPAGATION = PROPAGATION_FIFO
+
+# Fields per line of serial-1 and serial-2 as-rel files
+AS_REL_FIELDS = (3, 4)
+# Bytes of an as-rel file parse_as_rel_edges converts to arrays at a time
+READ_CHUNK_BYTES = 1 << 24
+# Version of the directories written by load_topology, directories of other versions are compiled again
+TOPOLOGY_FORMAT = 2
+
+# Policies are stateless, so ASes deploying the same policy share one instance
+_POLICY_INSTANCES = [policy() for policy in POLICIES]
+
+# Preference rules that only depend on (local preference, unauthenticated, path length, next hop AS_ID)
+_KEY_PARTS = {local_pref: 0, unauthenticated: 1, path_length: 2, next_hop_as_id: 3}
+# Policy class -> key from the parts above, None for policies that cannot be settled in phases
+_phase_keys: Dict[type, Optional[Callable[[Tuple], Tuple]]] = {}
+
+
+def _phase_key(policy: RoutingPolicy) -> Optional[Callable[[Tuple], Tuple]]:
+    """The preference key of policy as a function of the parts of a route in _KEY_PARTS.
+
+    None unless the policy follows the valley-free export rules and prefers routes by local
+    preference first, which is what lets ASGraph._propagate_in_phases settle customer routes
+    before any others.
+    """
+    if type(policy) not in _phase_keys:
+        rules = tuple(policy.preference_rules())
+        key = None
+        if policy.valley_free and rules[0] is local_pref and all(rule in _KEY_PARTS for rule in rules):
+            key = itemgetter(*[_KEY_PARTS[rule] for rule in rules])
+        _phase_keys[type(policy)] = key
+    return _phase_keys[type(policy)]
 
 
 def parse_as_rel_file_CAIDA(filename: str) -> nx.Graph:
-    with open(filename, 'r') as f:
+    with open_as_rel_file(filename) as f:
         graph = nx.Graph()
 
         for line in f:
@@ -20,12 +72,13 @@ def parse_as_rel_file_CAIDA(filename: str) -> nx.Graph:
             # The 'serial-1' as-rel files contain p2p and p2c relationships. The format is:
             # <provider-as>|<customer-as>|-1
             # <peer-as>|<peer-as>|0
+            # 'serial-2' files add a fourth column with the source of the relationship, ignored here
             items = line.split('|')
             # item does not have all the required information, so error is thrown for this line
-            if len(items) != 3:
+            if len(items) not in AS_REL_FIELDS:
                 raise error.InvalidASRelFile(filename, f"bad line: {line}")
 
-            [as1, as2, rel] = map(int, items)
+            [as1, as2, rel] = map(int, items[:3])
             as1 = str(as1)
             as2 = str(as2)
             if as1 not in graph:
@@ -39,41 +92,30 @@ def parse_as_rel_file_CAIDA(filename: str) -> nx.Graph:
 
 
 def parse_as_rel_file_pickle(filename: str) -> nx.Graph:
-    pickleGraph = pickle.load(open(filename, "rb"))
-
-    node_relationships = {}
+    with open(filename, 'rb') as f:
+        pickleGraph = pickle.load(f)
 
     graph = nx.Graph()
 
+    # An edge u -> node of the DiGraph makes u a customer of node, unless node -> u exists as
+    # well, which makes them peers. Looking the reverse edge up in the successors of node is
+    # constant time, so every edge is classified once, whatever the degree of its ASes.
     for node in pickleGraph.nodes:
-        customers = []
-        providers = []
-        peers = []
-
-        for in_edges in pickleGraph.in_edges(node):  # Add all peers
-            for out_edges in pickleGraph.out_edges(node):
-                if in_edges[0] == out_edges[1] and in_edges[1] == out_edges[0]:
-                    peers.append(in_edges[0])
-        for edge in pickleGraph.in_edges(node):
-            if edge[0] not in peers:
-                customers.append(edge[0])  # Add all customers (who are not peers already)
-        for edge in pickleGraph.out_edges(node):
-            if edge[1] not in peers:
-                providers.append(edge[1])  # Add all providers (who are not peers already)
-
-        node_relationships[node] = (customers, providers, peers)  # Store in dict
-
-    for node in node_relationships:
-        # node:     1234: ([customers], [providers], [peers])
+        successors = pickleGraph.succ[node]
+        predecessors = pickleGraph.pred[node]
         if node not in graph:
             graph.add_node(node)
 
-        for customer in node_relationships[node][0]:
+        for customer in predecessors:
+            if customer in successors:
+                continue
             if customer not in graph:
                 graph.add_node(customer)
             graph.add_edge(node, customer, customer=customer)
 
-        for peer in node_relationships[node][2]:
+        for peer in predecessors:
+            if peer not in successors:
+                continue
             if peer not in graph:
                 graph.add_node(peer)
             graph.add_edge(node, peer, customer=None)
@@ -87,35 +129,160 @@ def parse_as_rel_file(filename: str) -> nx.Graph:
     else:
         return parse_as_rel_file_CAIDA(filename)
 
+
+def open_as_rel_file(filename: str) -> TextIO:
+    """Opens an as-rel file for reading text, decompressing .bz2 and .gz files on the fly."""
+    if filename.endswith('.bz2'):
+        return bz2.open(filename, 'rt')
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt')
+    return open(filename, 'r')
+
+
+def parse_as_rel_edges(filename: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Columns as1, as2 and rel of the lines of a CAIDA as-rel file, see parse_as_rel_file_CAIDA.
+
+    The file is read in chunks of about READ_CHUNK_BYTES, each converted to arrays right away, so
+    that compressed files are never decompressed as a whole. Lines of serial-1 and serial-2 files
+    are understood, but not mixed in one file.
+    """
+    chunks = []
+    n_fields = None
+    # Number of lines read before the current chunk
+    line_number = 0
+    with open_as_rel_file(filename) as f:
+        for raw_lines in iter(lambda: f.readlines(READ_CHUNK_BYTES), []):
+            lines = [line.rstrip('\r\n') for line in raw_lines if not line.startswith('#')]
+            if lines:
+                if n_fields is None:
+                    n_fields = lines[0].count('|') + 1
+                # Every line is checked on its own, a line with too many fields must not make up for
+                # one with too few
+                bad = next((k for k, line in enumerate(raw_lines)
+                            if not line.startswith('#') and line.count('|') != n_fields - 1), None)
+                if n_fields not in AS_REL_FIELDS:
+                    bad = next(k for k, line in enumerate(raw_lines) if not line.startswith('#'))
+                if bad is not None:
+                    raise error.InvalidASRelFile(
+                        filename, f"bad line {line_number + bad + 1}: {raw_lines[bad].rstrip()}")
+                fields = '|'.join(lines).split('|')
+                try:
+                    chunks.append(np.array([fields[i::n_fields] for i in range(3)], dtype=np.int64))
+                except ValueError as e:
+                    raise error.InvalidASRelFile(filename, str(e))
+            line_number += len(raw_lines)
+    columns = np.concatenate(chunks, axis=1) if chunks else np.zeros((3, 0), dtype=np.int64)
+    return columns[0], columns[1], columns[2]
+
+
+def parse_topology(filename: str) -> Topology:
+    """Topology of an AS relationship file, the same as Topology.from_nx_graph(parse_as_rel_file(filename)).
+
+    CAIDA files are read into arrays without building a networkx graph.
+    """
+    if "pickle" in filename:
+        return Topology.from_nx_graph(parse_as_rel_file_pickle(filename))
+    return Topology.from_edges(*parse_as_rel_edges(filename))
+
+
+def load_topology(filename: str) -> Topology:
+    """Topology of an AS relationship file, as parsed by parse_topology.
+
+    The parsed topology is compiled to the directory <filename>.topology of .npy files on first
+    load, and memory-mapped from there as long as the digest of the source file matches (see
+    Topology.load). Without write access to the directory, the file is parsed every time.
+    """
+    digest = keys.file_digest(filename)
+    compiled = filename + '.topology'
+    metadata = {'digest': digest, 'version': TOPOLOGY_FORMAT}
+    try:
+        if Topology.metadata(compiled) == metadata:
+            return Topology.load(compiled)
+    except (OSError, ValueError):
+        pass
+
+    topology = parse_topology(filename)
+    try:
+        # Written under a temporary name, so that concurrent loads never read a partial directory
+        partial = tempfile.mkdtemp(prefix=os.path.basename(compiled) + '.', suffix='.partial',
+                                   dir=os.path.dirname(compiled) or '.')
+    except OSError:
+        return topology
+    try:
+        topology.save(partial, **metadata)
+        shutil.rmtree(compiled, ignore_errors=True)
+        os.replace(partial, compiled)
+    except (OSError, TypeError):
+        shutil.rmtree(partial, ignore_errors=True)
+        return topology
+    return Topology.load(compiled)
+
+
+class RouteTree(NamedTuple):
+    """Routes to one destination as arrays, as built by ASGraph.get_route_tree.
+
+    Every node is a route, given by the node of the route it was extended from (-1 for the
+    announcement of the destination to its neighbor), the index of its final AS and whether it is
+    authenticated. table holds the node of the route of every AS, -1 for ASes without a route.
+    """
+    parents: np.ndarray
+    finals: np.ndarray
+    authenticated: np.ndarray
+    table: np.ndarray
+
+
 class ASGraph(object):
-    __slots__ = ['asyss', 'graph']
+    __slots__ = [
+        'asyss', 'graph', 'topology', 'asys_by_index', 'deployment', 'propagation', 'customer_provider_order',
+    ]
 
     asyss: Dict[AS_ID, AS]
+    # Compact array representation the AS objects are built from
+    topology: Topology
+    # AS objects in topology index order
+    asys_by_index: List[AS]
+    # Deployment the AS objects are in, as far as set through ASGraph methods, see apply_deployment
+    deployment: Deployment
+    propagation: str
+    # Cache of _propagation_order, False for graphs with a customer-provider cycle
+    customer_provider_order: Union[None, bool, List[AS]]
     tierOne = []
     tierTwo = []
     tierThree = []
 
-    def __init__(self, graph: nx.Graph, policy: RoutingPolicy = DefaultPolicy()):
+    def __init__(
+        self,
+        graph: Union[nx.Graph, Topology],
+        policy: RoutingPolicy = DefaultPolicy(),
+        propagation: Optional[str] = None
+    ):
+        if not isinstance(graph, Topology):
+            graph = Topology.from_nx_graph(graph)
+        self.topology = graph
+        self.propagation = propagation or PROPAGATION
+        self.customer_provider_order = None
         self.asyss = {}
         self.tierOne.clear()
         self.tierTwo.clear()
         self.tierThree.clear()
 
-        for as_id in graph.nodes:
+        for as_id in graph.as_ids:
             self.asyss[as_id] = AS(as_id, policy)
-        # Looks for all edges in the before created graph;
-        # evaluates them which type of relation is there and adds the information to each AS
-        for (as_id1, as_id2) in graph.edges:
-            as1 = self.asyss[as_id1]
-            as2 = self.asyss[as_id2]
-            customer = graph.edges[(as_id1, as_id2)]['customer']
-            if customer is None:
+        self.asys_by_index = list(self.asyss.values())
+        self.deployment = Deployment(len(graph), POLICY_IDS[type(policy)])
+        # The AS objects are a view on the topology: walk the edges in source order and add the
+        # relation to both ends, so that the neighbors keep the order of the source graph
+        asys_by_index = self.asys_by_index
+        for (i, j), relation in zip(graph.edges.tolist(), graph.edge_relation.tolist()):
+            as1 = asys_by_index[i]
+            as2 = asys_by_index[j]
+            if relation == Relation.PEER.value:
                 as1.add_peer(as2)
                 as2.add_peer(as1)
-            elif customer == as_id1:
+            elif relation == Relation.PROVIDER.value:
                 as1.add_provider(as2)
                 as2.add_customer(as1)
-            elif customer == as_id2:
+            else:
                 as1.add_customer(as2)
                 as2.add_provider(as1)
 
@@ -123,17 +290,14 @@ class ASGraph(object):
         # Tier1: do not have providers
         # Tier2: do have both providers and customers
         # Tier3: do not have customers
-        for as_id in graph.nodes:
-            providers = len(self.asyss[as_id].get_providers())
-            customers = len(self.asyss[as_id].get_customers())
-            if customers == 0:
+        for as_id, tier in zip(graph.as_ids, graph.tier.tolist()):
+            if tier == TIER_THREE:
                 self.tierThree.append(as_id)
-            elif providers == 0:
+            elif tier == TIER_ONE:
                 self.tierOne.append(as_id)
             else:
                 self.tierTwo.append(as_id)
 
-
     def get_asys(self, as_id: AS_ID) -> Optional[AS]:
         return self.asyss.get(as_id, None)
 
@@ -150,19 +314,17 @@ class ASGraph(object):
     # ISP is no customer of any other AS
     def identify_top_isps(self, n: int) -> List[AS]:
         """Top ISPs by customer degree."""
-        isps = [(asys, asys.neighbor_counts_by_relation())
-                for asys in self.asyss.values()]
-        isps.sort(key=lambda pair: -pair[1][Relation.CUSTOMER])
-        return [asys for asys, _ in isps[:n]]
+        ranking = self.topology.rank_by_customer_degree()
+        return [self.asys_by_index[i] for i in ranking[:n].tolist()]
 
     # ISP is no customer of any other AS
     def identify_top_isps_from_tierone_and_tiertwo(self, n: int) -> List[AS]:
         """Top ISPs by customer degree."""
-        tierone_and_tiertwo = [self.get_asys(as_id) for as_id in self.get_tierOne() + self.get_tierTwo()]
-        isps = [(asys, asys.neighbor_counts_by_relation())
-                for asys in tierone_and_tiertwo]
-        isps.sort(key=lambda pair: -pair[1][Relation.CUSTOMER])
-        return [asys for asys, _ in isps[:n]]
+        topology = self.topology
+        tierone_and_tiertwo = np.concatenate((np.flatnonzero(topology.tier == TIER_ONE),
+                                              np.flatnonzero(topology.tier == TIER_TWO)))
+        ranking = np.argsort(-topology.customer_degrees()[tierone_and_tiertwo], kind='stable')
+        return [self.asys_by_index[i] for i in tierone_and_tiertwo[ranking[:n]].tolist()]
 
     def get_providers(self, ids: List[AS_ID]) -> List[AS]:
         """Return providers of a list of ASes, as a set"""
@@ -242,16 +404,82 @@ class ASGraph(object):
     def reset_policies(self) -> None:
         for asys in self.asyss.values():
             asys.policy = DefaultPolicy()
+        self.deployment.policy[:] = POLICY_IDS[DefaultPolicy]
 
     def clear_rpki_objects(self) -> None:
         for asys in self.asyss.values():
             asys.reset_rpki_objects()
+        self.deployment.aspa[:] = False
+        self.deployment.ascones[:] = False
 
     def clear_routing_tables(self) -> None:
         for asys in self.asyss.values():
             asys.reset_routing_table()
 
+    def reset_deployment(self, policy: RoutingPolicy = DefaultPolicy()) -> None:
+        """Puts every AS back into the state of a freshly built graph with the given policy."""
+        for asys in self.asyss.values():
+            asys.policy = policy
+            asys.publishes_rpki = False
+            asys.publishes_path_end = False
+            asys.bgp_sec_enabled = False
+            asys.aspa_enabled = False
+            asys.ascones_enabled = False
+            asys.reset_rpki_objects()
+            asys.reset_routing_table()
+        self.deployment = Deployment(len(self.asys_by_index), POLICY_IDS[type(policy)])
+
+    def get_deployment(self) -> Deployment:
+        """Reads the deployment of all ASes, e.g. after policies have been assigned to the ASes directly.
+
+        RPKI objects are recorded as published, whatever their content.
+        """
+        asyss = self.asys_by_index
+        deployment = Deployment(len(asyss))
+        deployment.policy[:] = [POLICY_IDS[type(asys.policy)] for asys in asyss]
+        for flag in DEPLOYMENT_FLAGS:
+            getattr(deployment, flag)[:] = [getattr(asys, flag) for asys in asyss]
+        deployment.aspa[:] = [asys.aspa is not None for asys in asyss]
+        deployment.ascones[:] = [asys.ascones is not None for asys in asyss]
+        return deployment
+
+    def apply_deployment(self, deployment: Deployment) -> None:
+        """Brings the AS objects into the given deployment.
+
+        Only the ASes that differ from the previously applied deployment are touched, so switching
+        between similar deployments is cheap. ASes changed directly in between have to be synced
+        with `graph.deployment = graph.get_deployment()` first.
+        """
+        current = self.deployment
+        asyss = self.asys_by_index
+
+        changed = np.flatnonzero(current.policy != deployment.policy)
+        for i, policy_id in zip(changed.tolist(), deployment.policy[changed].tolist()):
+            asyss[i].policy = _POLICY_INSTANCES[policy_id]
+        for flag in DEPLOYMENT_FLAGS:
+            values = getattr(deployment, flag)
+            changed = np.flatnonzero(getattr(current, flag) != values)
+            for i, value in zip(changed.tolist(), values[changed].tolist()):
+                setattr(asyss[i], flag, value)
+        for i in np.flatnonzero(current.aspa != deployment.aspa).tolist():
+            if deployment.aspa[i]:
+                asyss[i].create_new_aspa(self)
+            else:
+                asyss[i].aspa = None
+        for i in np.flatnonzero(current.ascones != deployment.ascones).tolist():
+            if deployment.ascones[i]:
+                asyss[i].create_new_ascones()
+            else:
+                asyss[i].ascones = None
+
+        self.deployment = deployment.copy()
+
     def find_routes_to(self, target: AS) -> None:
+        if self.propagation == PROPAGATION_GAO_REXFORD:
+            announcements = {neighbor: target.originate_route(neighbor) for neighbor in target.neighbors}
+            if self._propagate_in_phases(target.as_id, target, announcements):
+                return
+
         routes: deque = deque()
         for neighbor in target.neighbors:
             # create new route object per neighbor
@@ -293,6 +521,11 @@ class ASGraph(object):
             authenticated=False
         )
 
+        if self.propagation == PROPAGATION_GAO_REXFORD:
+            announcements = {neighbor: attacker.forward_route(bad_route, neighbor) for neighbor in attacker.neighbors}
+            if self._propagate_in_phases(victim.as_id, attacker, announcements):
+                return
+
         routes: deque = deque()
         for neighbor in attacker.neighbors:
             routes.append(attacker.forward_route(bad_route, neighbor))
@@ -303,6 +536,199 @@ class ASGraph(object):
             for neighbor in asys.learn_route(route):
                 routes.append(asys.forward_route(route, neighbor))
 
+    def get_route_tree(self, dest: AS_ID) -> Optional[RouteTree]:
+        """The routes of all ASes to dest as arrays, see RouteTree and set_route_tree.
+
+        Returns None if some route does not descend from an announcement of dest to a neighbor.
+        """
+        index = self.topology.index
+        node_ids: Dict[int, int] = {}
+        parents: List[int] = []
+        finals: List[int] = []
+        authenticated: List[bool] = []
+        table = np.full(len(self.asys_by_index), -1, dtype=np.int32)
+        for i, asys in enumerate(self.asys_by_index):
+            route = asys.routing_table.get(dest)
+            if route is None or route.length == 1:
+                continue
+            # Number the routes not seen yet from the root down, so parents precede their children
+            chain = []
+            while route is not None and id(route) not in node_ids:
+                chain.append(route)
+                route = route.parent
+            parent = -1 if route is None else node_ids[id(route)]
+            for route in reversed(chain):
+                if parent < 0 and (route.length != 2 or route.origin.as_id != dest):
+                    return None
+                node_ids[id(route)] = parent = len(parents)
+                parents.append(node_ids.get(id(route.parent), -1))
+                finals.append(index[route.final.as_id])
+                authenticated.append(route.authenticated)
+            table[i] = parent
+        return RouteTree(np.array(parents, dtype=np.int32), np.array(finals, dtype=np.int32),
+                         np.array(authenticated, dtype=bool), table)
+
+    def set_route_tree(self, dest: AS, tree: RouteTree) -> None:
+        """Restores the routes to dest captured by get_route_tree as fresh Route objects."""
+        asys_by_index = self.asys_by_index
+        routes: List[Route] = []
+        for parent, final, authenticated in zip(tree.parents.tolist(), tree.finals.tolist(),
+                                                tree.authenticated.tolist()):
+            if parent < 0:
+                route = Route(dest.as_id, [dest, asys_by_index[final]],
+                              origin_invalid=False, path_end_invalid=False, authenticated=authenticated)
+            else:
+                route = routes[parent].extend(asys_by_index[final], authenticated)
+            routes.append(route)
+        for i in np.flatnonzero(tree.table >= 0).tolist():
+            asys_by_index[i].routing_table[dest.as_id] = routes[tree.table[i]]
+
+    def _propagation_order(self) -> Optional[List[AS]]:
+        """All ASes, each one after all of its customers; None if the graph has a customer-provider cycle."""
+        if self.customer_provider_order is None:
+            order = self.topology.customer_provider_order()
+            self.customer_provider_order = (False if order is None else
+                                            [self.asys_by_index[i] for i in order.tolist()])
+        return self.customer_provider_order or None
+
+    def _propagate_in_phases(self, dest: AS_ID, origin: AS, announcements: Dict[AS, Route]) -> bool:
+        """Computes the routing tables the FIFO propagation gives, in the three Gao-Rexford phases.
+
+        announcements are the routes origin (the destination or an attacker) sends to its
+        neighbors. The FIFO queue handles advertisements in generations, the routes sent to the
+        neighbors of the origin first, then the routes these forward, and so on. Within a
+        generation, an advertisement comes before another one if the advertisement it was forwarded
+        on did, or if it went to an earlier neighbor of the same AS. An advertisement is thus
+        ordered by its generation and the positions in the neighbor lists along its way, its time.
+        An AS adopts (and forwards) an advertisement exactly if it accepts it and prefers it over
+        the best route it accepted before, so that its routes only depend on the earlier
+        advertisements, whichever phase they are handled in.
+
+        As every policy prefers routes from customers first and only forwards them to peers and
+        providers, the adopted customer routes are settled up the customer-provider DAG, then the
+        peer routes and finally the provider routes down the DAG, each AS merging the advertisements
+        it receives in a phase with the routes it adopted before by their time. Advertisements that
+        are not preferred are dropped before building their route.
+
+        Returns False without touching any routing table if the graph has a customer-provider cycle
+        or if an AS runs a policy not covered by the above, in which case the caller falls back to
+        FIFO propagation.
+        """
+        order = self._propagation_order()
+        if order is None:
+            return False
+
+        # Advertisements (generation, positions before the last one, last position, sender, route
+        # of the sender) received from customers, peers and providers, by receiving AS. The
+        # advertisements of the origin are sent with their routes.
+        from_customers: Dict[AS, list] = {}
+        from_peers: Dict[AS, list] = {}
+        from_providers: Dict[AS, list] = {}
+        for position, (neighbor, relation) in enumerate(origin.neighbors.items()):
+            if neighbor not in announcements:
+                continue
+            inbox = (from_providers if relation == Relation.CUSTOMER else
+                     from_peers if relation == Relation.PEER else from_customers)
+            inbox.setdefault(neighbor, []).append((1, (), position, None, announcements[neighbor]))
+
+        customer, peer = Relation.CUSTOMER, Relation.PEER
+        # Adopted routes by AS as (time, route, preference key)
+        adopted: Dict[AS, list] = {}
+
+        def settle(asys: AS, advertisements: list, earlier: list, relation: Relation) -> Optional[list]:
+            # Routes asys adopts from advertisements; earlier are the routes adopted in previous phases
+            policy = asys.policy
+            key = _phase_key(policy)
+            if key is None:
+                return None
+            current = asys.routing_table.get(dest)
+            current_key = None if current is None else get_preference_key(policy)(current)
+            bgp_sec_enabled = asys.bgp_sec_enabled
+            relation_value = relation.value
+            adopted_now = []
+            i = 0
+            advertisements.sort()
+            for advertisement in advertisements:
+                generation, positions, position, sender, route = advertisement
+                time = advertisement[:3]
+                while i < len(earlier) and earlier[i][0] < time:
+                    current_key = earlier[i][2]
+                    i += 1
+                if sender is None:
+                    route_key = get_preference_key(policy)(route)
+                else:
+                    route_key = key((relation_value, not (route.authenticated and bgp_sec_enabled),
+                                     route.length + 1, sender.as_id))
+                if current_key is not None and not route_key < current_key:
+                    continue
+                if sender is not None:
+                    route = sender.forward_route(route, asys)
+                if policy.accept_route(route):
+                    current_key = route_key
+                    adopted_now.append((time, route, route_key))
+            return adopted_now
+
+        def forward(asys: AS, routes: list, to_all: bool) -> None:
+            # Customer routes go to all neighbors, the others only to customers
+            sent = [(generation + 1, positions + (position,), route)
+                    for (generation, positions, position), route, _ in routes]
+            for position, (neighbor, relation) in enumerate(asys.neighbors.items()):
+                if relation is customer:
+                    inbox = from_providers
+                elif not to_all:
+                    continue
+                elif relation is peer:
+                    inbox = from_peers
+                else:
+                    inbox = from_customers
+                advertisements = inbox.get(neighbor)
+                if advertisements is None:
+                    advertisements = inbox[neighbor] = []
+                for generation, positions, route in sent:
+                    advertisements.append((generation, positions, position, asys, route))
+
+        # 1. Customer routes travel up, every AS is settled after all of its customers
+        for asys in order:
+            advertisements = from_customers.get(asys)
+            if advertisements is None or asys.as_id == dest:
+                continue
+            routes = settle(asys, advertisements, [], Relation.CUSTOMER)
+            if routes is None:
+                return False
+            if routes:
+                adopted[asys] = routes
+                forward(asys, routes, True)
+        # 2. One hop over peer links, from the customer routes of the peers
+        peer_routes = []
+        for asys, advertisements in from_peers.items():
+            if asys.as_id == dest:
+                continue
+            routes = settle(asys, advertisements, adopted.get(asys, []), Relation.PEER)
+            if routes is None:
+                return False
+            if routes:
+                peer_routes.append((asys, routes))
+        for asys, routes in peer_routes:
+            adopted[asys] = sorted(adopted.get(asys, []) + routes, key=itemgetter(0))
+            forward(asys, routes, False)
+        # 3. Routes travel down, every AS is settled after all of its providers
+        for asys in reversed(order):
+            advertisements = from_providers.get(asys)
+            if advertisements is None or asys.as_id == dest:
+                continue
+            earlier = adopted.get(asys, [])
+            routes = settle(asys, advertisements, earlier, Relation.PROVIDER)
+            if routes is None:
+                return False
+            if routes:
+                adopted[asys] = earlier + routes
+                forward(asys, routes, False)
+
+        # The last route an AS adopted is the one it ends up with
+        for asys, routes in adopted.items():
+            asys.routing_table[dest] = max(routes, key=itemgetter(0))[1]
+        return True
+
 
 def bit_count(bitfield: int) -> int:
     # .count returns the number of times the value "1" appears
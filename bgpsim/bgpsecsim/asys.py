@@ -1,6 +1,6 @@
 import abc
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Callable, Dict, FrozenSet, Generator, List, Optional, Tuple
 
 AS_ID = int
 
@@ -19,7 +19,8 @@ class AS(object):
     # __slots__ states which instance attributes you expect your object instances to have -> results in faster access
     __slots__ = [
         'as_id', 'neighbors', 'policy', 'publishes_rpki', 'publishes_path_end', 'bgp_sec_enabled',
-        'routing_table', 'aspa', 'aspa_enabled', 'ascones', 'ascones_enabled'
+        'routing_table', '_aspa', 'aspa_providers', 'aspa_enabled', '_ascones', 'ascones_customers',
+        'ascones_enabled'
     ]
 
     as_id: AS_ID
@@ -31,11 +32,18 @@ class AS(object):
     bgp_sec_enabled: bool
     routing_table: Dict[AS_ID, 'Route']
     # ASPA object is a list for the current AS with its ID and all its providers, which will be candidates for connections in ASPA algorithm
-    aspa: ['AS_ID', AspaList]
+    _aspa: ['AS_ID', AspaList]
+    # The providers of the ASPA object as a set, None without ASPA object
+    aspa_providers: Optional[FrozenSet[AS_ID]]
     aspa_enabled: bool
-    ascones: ['AS_ID', ASConesList]
+    _ascones: ['AS_ID', ASConesList]
+    # The customers of the ASCONES object as a set, None without ASCONES object
+    ascones_customers: Optional[FrozenSet[AS_ID]]
     ascones_enabled: bool
 
+    # Incremented whenever an ASPA or ASCONES object changes, invalidates memoized route validation state
+    rpki_generation = 0
+
     def __init__(
         # self represents the instance of the class
         self,
@@ -54,13 +62,31 @@ class AS(object):
         self.publishes_path_end = publishes_path_end
         self.bgp_sec_enabled = bgp_sec_enabled
         self.routing_table = {}
-        self.aspa = []
         self.aspa_enabled = aspa_enabled
-        self.ascones = []
         self.ascones_enabled = ascones_enabled
         self.reset_routing_table()
         self.reset_rpki_objects()
 
+    @property
+    def aspa(self):
+        return self._aspa
+
+    @aspa.setter
+    def aspa(self, aspa) -> None:
+        self._aspa = aspa
+        self.aspa_providers = None if aspa is None else frozenset(aspa[1])
+        AS.rpki_generation += 1
+
+    @property
+    def ascones(self):
+        return self._ascones
+
+    @ascones.setter
+    def ascones(self, ascones) -> None:
+        self._ascones = ascones
+        self.ascones_customers = None if ascones is None else frozenset(ascones[1])
+        AS.rpki_generation += 1
+
     # -> marks return function annotation. So tells which type the function should return, but does not force it.
 
     def neighbor_counts_by_relation(self) -> Dict[Relation, int]:
@@ -143,13 +169,7 @@ class AS(object):
         )
 
     def forward_route(self, route: 'Route', next_hop: 'AS') -> 'Route':
-        return Route(
-            dest=route.dest,
-            path=route.path + [next_hop],
-            origin_invalid=route.origin_invalid,
-            path_end_invalid=route.path_end_invalid,
-            authenticated=route.authenticated and next_hop.bgp_sec_enabled,
-        )
+        return route.extend(next_hop, route.authenticated and next_hop.bgp_sec_enabled)
 
     def reset_routing_table(self) -> None:
         self.routing_table.clear()
@@ -196,18 +216,44 @@ class AS(object):
             return self.ascones[1]
 
 class Route(object):
-    __slots__ = ['dest', 'path', 'origin_invalid', 'path_end_invalid', 'authenticated']
+    """A route, stored as a node in a tree of routes.
+
+    Routes created from a path list keep that list. Routes created by extend only point to the
+    route they were extended from (the parent) and add one AS, so forwarding a route is O(1) and
+    routes learned from the same neighbor share their common prefix. The path list of such a
+    route is only built on demand.
+    """
+    __slots__ = [
+        'dest', 'parent', 'final', 'origin', 'length', 'members', 'has_cycle', '_path',
+        'origin_invalid', 'path_end_invalid', 'authenticated', 'preference_key', 'preference',
+        'aspa_summary', 'ascones_summary',
+    ]
 
     # Destination is an IP block that is owned by this AS. The AS_ID is the same as the origin's ID
     # for valid routes, but may differ in a hijacking attack.
     dest: AS_ID
-    path: List[AS]
+    # Route this one was extended from, None if it was created from a path list
+    parent: Optional['Route']
+    final: AS
+    origin: AS
+    length: int
+    # Bloom filter of the ASes on the path, see _membership_bit
+    members: int
+    has_cycle: bool
+    # Path list, always set for routes without a parent and filled lazily for the others
+    _path: Optional[List[AS]]
     # Whether the origin has no valid RPKI record and one is expected.
     origin_invalid: bool
     # Whether the first hop has no valid path-end record and one is expected.
     path_end_invalid: bool
     # Whether the path is authenticated with BGPsec.
     authenticated: bool
+    # Cached result of the compiled preference key function that computed it
+    preference_key: Optional[Callable[['Route'], Tuple]]
+    preference: Optional[Tuple]
+    # Memoized ASPA and ASCONES hop summaries, see routing_policy.hop_summary
+    aspa_summary: Optional[Tuple]
+    ascones_summary: Optional[Tuple]
 
     def __init__(
         self,
@@ -218,31 +264,88 @@ class Route(object):
         authenticated: bool,
     ):
         self.dest = dest
-        self.path = path
+        self.parent = None
+        self.final = path[-1]
+        self.origin = path[0]
+        self.length = len(path)
+        members = 0
+        for asys in path:
+            members |= _membership_bit(asys)
+        self.members = members
+        self.has_cycle = len(path) != len(set(path))
+        self._path = list(path)
         self.origin_invalid = origin_invalid
         self.path_end_invalid = path_end_invalid
         self.authenticated = authenticated
-
-
-# @property is python way to create getter and setter method
-    @property
-    def length(self) -> int:
-        return len(self.path)
+        self.preference_key = None
+        self.preference = None
+        self.aspa_summary = None
+        self.ascones_summary = None
+
+    def extend(self, next_hop: AS, authenticated: bool) -> 'Route':
+        """Returns the route with next_hop appended to the path."""
+        route = Route.__new__(Route)
+        route.dest = self.dest
+        route.parent = self
+        route.final = next_hop
+        route.origin = self.origin
+        route.length = self.length + 1
+        bit = _membership_bit(next_hop)
+        route.members = self.members | bit
+        route.has_cycle = self.has_cycle or (self.members & bit != 0 and self.contains(next_hop))
+        route._path = None
+        route.origin_invalid = self.origin_invalid
+        route.path_end_invalid = self.path_end_invalid
+        route.authenticated = authenticated
+        route.preference_key = None
+        route.preference = None
+        route.aspa_summary = None
+        route.ascones_summary = None
+        return route
 
     @property
-    def origin(self) -> AS:
-        return self.path[0]
+    def path(self) -> List[AS]:
+        if self._path is None:
+            suffix = []
+            route = self
+            while route._path is None:
+                suffix.append(route.final)
+                route = route.parent
+            suffix.reverse()
+            self._path = route._path + suffix
+        return self._path
 
     @property
     def first_hop(self) -> AS:
-        return self.path[-2]
-
-    @property
-    def final(self) -> AS:
-        return self.path[-1]
+        if self.parent is None:
+            return self._path[-2]
+        return self.parent.final
+
+    def reversed_path(self) -> Generator[AS, None, None]:
+        """Iterates over the path from the final AS back to the origin without building the list."""
+        route = self
+        while route._path is None:
+            yield route.final
+            route = route.parent
+        yield from reversed(route._path)
+
+    def contains(self, asys: AS) -> bool:
+        if not self.members & _membership_bit(asys):
+            return False
+        return any(hop is asys for hop in self.reversed_path())
+
+    def predecessor(self, asys: AS) -> Optional[AS]:
+        """The AS before the first occurrence of asys on the path, None if asys is the origin or absent."""
+        result = None
+        previous = None
+        for hop in self.reversed_path():
+            if previous is asys:
+                result = hop
+            previous = hop
+        return result
 
     def contains_cycle(self) -> bool:
-        return len(self.path) != len(set(self.path))
+        return self.has_cycle
 
     # __str__ returns the string representation of the object
     def __str__(self) -> str:
@@ -263,7 +366,16 @@ class Route(object):
             s += " " + " ".join(flags)
         return s
 
+def _membership_bit(asys: AS) -> int:
+    # ASes are hashed by identity; a clear bit in Route.members rules out that the AS is on the path
+    return 1 << (hash(asys) & 63)
+
 class RoutingPolicy(abc.ABC):
+    # Whether forward_to follows the valley-free export rules, i.e. routes learned from peers or
+    # providers are only forwarded to customers. Gao-Rexford propagation and the baseline cache rely
+    # on it to settle and share routes.
+    valley_free = True
+
     @abc.abstractmethod
     def accept_route(self, route: Route) -> bool:
         pass
@@ -0,0 +1,110 @@
+import hashlib
+import multiprocessing as mp
+import os
+from typing import Optional
+
+import numpy as np
+
+from bgpsecsim.asys import AS
+from bgpsecsim.as_graph import ASGraph, RouteTree
+from bgpsecsim.routing_policy import POLICIES, ROUTES_LEGITIMATE_AS_DEFAULT
+
+# Policy id -> class of policies choosing the same legitimate routes, see routing_fingerprint
+_ROUTING_CLASS = np.array([0 if policy in ROUTES_LEGITIMATE_AS_DEFAULT else policy_id + 1
+                           for policy_id, policy in enumerate(POLICIES)], dtype=np.int8)
+_VALLEY_FREE = np.array([policy.valley_free for policy in POLICIES], dtype=bool)
+
+
+def routing_fingerprint(graph: ASGraph) -> str:
+    """Fingerprint of the parts of the deployment of graph that can change legitimate routes.
+
+    Legitimate routes only depend on the policies that choose or export routes differently from
+    DefaultPolicy and on the BGPsec flags. Deploying RPKI, path-end validation, ASPA or ASCONES
+    does not change them, as these only reject announcements that valley-free legitimate routes
+    never are. Once some AS exports against the valley-free rules, the whole deployment counts.
+    The deployment is read from graph.deployment, i.e. it has to be set through apply_deployment.
+    """
+    deployment = graph.deployment
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(_ROUTING_CLASS[deployment.policy].tobytes())
+    digest.update(deployment.bgp_sec_enabled.tobytes())
+    if not _VALLEY_FREE[deployment.policy].all():
+        for array in (deployment.policy, deployment.aspa, deployment.ascones):
+            digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class BaselineCache(object):
+    """Legitimate routes to victims, shared by all deployments that route them the same way.
+
+    The routes computed by find_routes_to for a victim are stored as a RouteTree in directory,
+    keyed by the victim and the routing_fingerprint of the deployment. Later trials with the same
+    victim, also in other cells of a sweep and in other worker processes, restore the routes
+    instead of propagating them again. The stored trees take at most max_bytes, and trees that
+    cannot be written (e.g. because the file system is full) are just not stored. The counters are
+    shared memory, so they add up the lookups of all processes forked after creating the cache.
+    """
+    directory: str
+    max_bytes: int
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = mp.Value('q', 0)
+        self.misses = mp.Value('q', 0)
+        self.entries = mp.Value('q', 0)
+        self.nbytes = mp.Value('q', 0)
+
+    def _filename(self, victim: AS, fingerprint: str) -> str:
+        return os.path.join(self.directory, f"{victim.as_id}-{fingerprint}.npz")
+
+    def find_routes_to(self, graph: ASGraph, victim: AS) -> None:
+        """Same as graph.find_routes_to(victim) on cleared routing tables, reusing stored routes."""
+        filename = self._filename(victim, routing_fingerprint(graph))
+        tree = self._load(filename)
+        if tree is not None:
+            with self.hits.get_lock():
+                self.hits.value += 1
+            graph.set_route_tree(victim, tree)
+            return
+
+        with self.misses.get_lock():
+            self.misses.value += 1
+        graph.find_routes_to(victim)
+        if self.nbytes.value >= self.max_bytes:
+            return
+        tree = graph.get_route_tree(victim.as_id)
+        if tree is not None:
+            self._store(filename, tree)
+
+    def _store(self, filename: str, tree: RouteTree) -> None:
+        # Written under a temporary name, so that other processes never load a partial file
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, 'wb') as f:
+                np.savez(f, *tree)
+            size = os.path.getsize(temporary)
+            with self.nbytes.get_lock():
+                if self.nbytes.value + size > self.max_bytes or os.path.exists(filename):
+                    os.unlink(temporary)
+                    return
+                os.replace(temporary, filename)
+                self.nbytes.value += size
+        except OSError:
+            try:
+                os.unlink(temporary)
+            except OSError:
+                pass
+            return
+        with self.entries.get_lock():
+            self.entries.value += 1
+
+    def _load(self, filename: str) -> Optional[RouteTree]:
+        try:
+            with np.load(filename) as arrays:
+                return RouteTree(*(arrays[f"arr_{i}"] for i in range(len(RouteTree._fields))))
+        except FileNotFoundError:
+            return None
+
+    def __str__(self) -> str:
+        return f"{self.hits.value} hits, {self.misses.value} misses"
@@ -0,0 +1,100 @@
+import os
+import pickle
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import bgpsecsim.error as error
+
+# Set by the --resume option of generate: sweeps continue the checkpoint of an interrupted run
+RESUME = False
+
+
+class Checkpoint(object):
+    """Results of a sweep over a grid of cells, persisted after every completed cell.
+
+    The results and a mask of the completed cells are memory-mapped .npy files next to the output
+    file, so an interrupted sweep loses at most the cells it was working on. With RESUME, an
+    existing checkpoint is continued: completed cells are skipped and the trials are those of the
+    interrupted run. Otherwise a new checkpoint replaces any old one. Further per-cell results
+    are kept in the arrays named by columns, e.g. the precision of the results. With n_trials, the
+    (bad, total) counts of every trial of every cell are kept in the array 'counts' of shape
+    shape + (n_trials, 2); trials that were not run stay (0, 0).
+    """
+    filename: str
+    results: np.ndarray
+    done: np.ndarray
+    trials: Optional[List[Any]]
+    arrays: Dict[str, np.ndarray]
+
+    def __init__(self, filename: str, shape: Tuple[int, ...], make_trials: Optional[Callable[[], List[Any]]] = None,
+                 columns: Sequence[str] = (), n_trials: Optional[int] = None):
+        self.filename = filename
+        self.columns = tuple(columns) + (('counts',) if n_trials is not None else ())
+        results_file, done_file, trials_file = self._files()[:3]
+        shape = tuple(shape)
+        self.trials = None
+
+        if RESUME and os.path.exists(done_file):
+            self.results = np.load(results_file, mmap_mode='r+')
+            self.done = np.load(done_file, mmap_mode='r+')
+            if self.results.shape != shape or self.done.shape != shape:
+                raise error.CheckpointError(filename, f"grid {self.results.shape} does not match {shape}")
+            try:
+                self.arrays = {column: np.load(self._column_file(column), mmap_mode='r+') for column in self.columns}
+            except FileNotFoundError as e:
+                raise error.CheckpointError(filename, f"missing {e.filename}")
+            if n_trials is not None and self.arrays['counts'].shape != shape + (n_trials, 2):
+                raise error.CheckpointError(filename, f"counts {self.arrays['counts'].shape[-2]} trials, not {n_trials}")
+            if make_trials is not None:
+                with open(trials_file, 'rb') as f:
+                    self.trials = pickle.load(f)
+            print(f"Resuming {filename}: {int(self.done.sum())} of {self.done.size} cells completed")
+            return
+
+        # The mask is created last, a checkpoint without one is started over
+        if os.path.exists(done_file):
+            os.remove(done_file)
+        if make_trials is not None:
+            self.trials = make_trials()
+            with open(trials_file, 'wb') as f:
+                pickle.dump(self.trials, f)
+        self.results = np.lib.format.open_memmap(results_file, mode='w+', dtype=np.float64, shape=shape)
+        self.arrays = {column: np.lib.format.open_memmap(self._column_file(column), mode='w+', dtype=np.float64, shape=shape)
+                       for column in self.columns if column != 'counts'}
+        if n_trials is not None:
+            # Counts are bounded by the number of ASes
+            self.arrays['counts'] = np.lib.format.open_memmap(self._column_file('counts'), mode='w+', dtype=np.int32,
+                                                              shape=shape + (n_trials, 2))
+        self.done = np.lib.format.open_memmap(done_file, mode='w+', dtype=bool, shape=shape)
+
+    def _column_file(self, column: str) -> str:
+        return f"{self.filename}.{column}.partial.npy"
+
+    def _files(self) -> List[str]:
+        return ([self.filename + '.partial.npy', self.filename + '.done.npy', self.filename + '.trials.pkl'] +
+                [self._column_file(column) for column in self.columns])
+
+    def is_done(self, *index: int) -> bool:
+        return bool(self.done[index])
+
+    def mark_done(self, *index: int) -> None:
+        # Results reach the disk before the mask, so a cell marked as done always has its result
+        self.results.flush()
+        for array in self.arrays.values():
+            array.flush()
+        self.done[index] = True
+        self.done.flush()
+
+    def finish(self) -> np.ndarray:
+        """Returns the results of the completed sweep and removes the checkpoint files.
+
+        The arrays of the columns are copied to memory as well.
+        """
+        results = np.array(self.results)
+        self.arrays = {column: np.array(array) for column, array in self.arrays.items()}
+        del self.results, self.done
+        for filename in self._files():
+            if os.path.exists(filename):
+                os.remove(filename)
+        return results
@@ -1,11 +1,19 @@
 import click
+import multiprocessing as mp
 import networkx as nx
 import random
 
 import bgpsecsim.as_graph as as_graph
+import bgpsecsim.checkpoint as checkpoint
+import bgpsecsim.distributed as distributed
 import bgpsecsim.experiments as experiments
 import bgpsecsim.graphs as graphs
+import bgpsecsim.keys as keys
+import bgpsecsim.refinement as refinement
+import bgpsecsim.result_cache as result_cache
 import bgpsecsim.routing_policy as routing_policy
+import bgpsecsim.sampling as sampling
+import bgpsecsim.seeding as seeding
 from bgpsecsim.as_graph import ASGraph
 import other.evaluation as eval
 
@@ -16,9 +24,9 @@ def cli():
 @cli.command()
 @click.argument('as-rel-file')
 def check_graph(as_rel_file):
-    nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+    nx_graph = as_graph.load_topology(as_rel_file)
 
-    if not nx.is_connected(nx_graph):
+    if not nx.is_connected(nx_graph.to_nx_graph()):
         print("Graph is not fully connected!")
     else:
         print("Graph is fully connected")
@@ -35,7 +43,7 @@ def check_graph(as_rel_file):
 @click.argument('origin-asn', type=int)
 @click.argument('final-asn', type=int)
 def find_route(as_rel_file, origin_asn, final_asn):
-    nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+    nx_graph = as_graph.load_topology(as_rel_file)
 
     graph = ASGraph(nx_graph)
     print("Loaded graph")
@@ -52,7 +60,7 @@ def find_route(as_rel_file, origin_asn, final_asn):
 @click.argument('as-rel-file')
 @click.argument('target-asn', type=int)
 def get_path_lengths(as_rel_file, target_asn):
-    nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+    nx_graph = as_graph.load_topology(as_rel_file)
 
     graph = ASGraph(nx_graph, policy=routing_policy.RPKIPolicy())
     print("Loaded graph")
@@ -85,21 +93,97 @@ def get_path_lengths(as_rel_file, target_asn):
 @cli.command()
 @click.option('-s', '--seed', type=int)
 @click.option('--trials', type=int, default=1)
+@click.option('--propagation', type=click.Choice([as_graph.PROPAGATION_FIFO, as_graph.PROPAGATION_GAO_REXFORD]),
+              default=as_graph.PROPAGATION_FIFO)
+@click.option('--resume', is_flag=True)
+@click.option('--cache-dir', type=click.Path(file_okay=False))
+@click.option('--ci-half-width', type=float)
+@click.option('--relative-error', type=float)
+@click.option('--min-trials', type=int, default=sampling.MIN_TRIALS)
+@click.option('--refine-threshold', type=float, default=refinement.THRESHOLD)
+@click.option('--coordinator', help="HOST:PORT to serve the trials on to worker hosts instead of running them locally")
+@click.option('--authkey', envvar='BGPSECSIM_AUTHKEY', help="Shared secret of coordinator and worker hosts")
+@click.option('--chunk-size', type=int, help="Trials per message to the workers, chosen automatically by default")
+@click.option('--workers', type=int, help="Worker processes, by default one per available CPU as far as the memory allows")
+@click.option('--start-method', type=click.Choice(mp.get_all_start_methods()), help="How to start the worker processes")
 @click.argument('figure')
 @click.argument('as-rel-file')
 @click.argument('output-file')
-def generate(seed, trials, figure, as_rel_file, output_file):
+def generate(seed, trials, propagation, resume, cache_dir, ci_half_width, relative_error, min_trials, refine_threshold, coordinator, authkey, chunk_size, workers, start_method, figure, as_rel_file, output_file):
     import sys
     sys.setrecursionlimit(100000)
+    if start_method is not None:
+        mp.set_start_method(start_method)
 
     if seed is not None:
         random.seed(seed)
-
-    nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+    # Root of the random streams of the trials of random deployments
+    seeding.SEED = seed
+
+    # Picked up by the ASGraph the experiments are run on
+    as_graph.PROPAGATION = propagation
+    checkpoint.RESUME = resume
+    if (ci_half_width is not None or relative_error is not None) and figure not in graphs.SEQUENTIAL_FIGURES:
+        raise click.UsageError(f"--ci-half-width and --relative-error are only supported by "
+                               f"{', '.join(graphs.SEQUENTIAL_FIGURES)}")
+    # With a target precision, --trials is the maximum number of trials per cell
+    sampling.HALF_WIDTH = ci_half_width
+    sampling.RELATIVE_ERROR = relative_error
+    sampling.MIN_TRIALS = min_trials
+    refinement.THRESHOLD = refine_threshold
+
+    nx_graph = as_graph.load_topology(as_rel_file)
     print("Loaded graph")
+    store = None
+    if cache_dir is not None:
+        # Cells already computed by any figure on the same graph file are read from the cache
+        store = result_cache.configure(cache_dir, as_rel_file, nx_graph)
 
     func = getattr(graphs, figure)
-    func(output_file, nx_graph, trials)
+    graph = experiments.get_graph(nx_graph, routing_policy.DefaultPolicy())
+    if coordinator is not None:
+        if authkey is None:
+            raise click.UsageError("--coordinator requires --authkey or BGPSECSIM_AUTHKEY")
+        pool = distributed.Coordinator(graph, distributed.parse_address(coordinator), authkey.encode(),
+                                       keys.file_digest(as_rel_file), chunk_size or distributed.CHUNK_SIZE)
+    else:
+        experiments.PARALLELISM = experiments.worker_count(graph, workers)
+        if workers is not None and experiments.PARALLELISM < workers:
+            print(f"Memory only allows for {experiments.PARALLELISM} of {workers} workers")
+        print(f"Running {experiments.PARALLELISM} workers")
+        # One pool of workers serves all cells of the figure
+        pool = experiments.ExperimentPool(graph, chunk_size=chunk_size)
+    with pool:
+        func(output_file, nx_graph, trials)
+        if pool.baseline_cache is not None:
+            print(f"Baseline cache: {pool.baseline_cache}")
+        memory = pool.worker_memory()
+        if memory is not None:
+            shared, private = memory
+            print(f"Worker memory: {private / 2**20:.0f} MiB private, {shared / 2**20:.0f} MiB shared")
+    if store is not None:
+        print(f"Result cache: {store}")
+
+
+@cli.command()
+@click.option('--workers', '--processes', 'processes', type=int,
+              help="Worker processes, by default one per available CPU as far as the memory allows")
+@click.option('--start-method', type=click.Choice(mp.get_all_start_methods()), help="How to start the worker processes")
+@click.option('--authkey', envvar='BGPSECSIM_AUTHKEY', required=True, help="Shared secret of coordinator and worker hosts")
+@click.argument('coordinator')
+@click.argument('as-rel-file')
+def worker(processes, start_method, authkey, coordinator, as_rel_file):
+    """Runs trials for the generate --coordinator at COORDINATOR (HOST:PORT)."""
+    import sys
+    sys.setrecursionlimit(100000)
+    if start_method is not None:
+        mp.set_start_method(start_method)
+
+    nx_graph = as_graph.load_topology(as_rel_file)
+    print("Loaded graph")
+    n_chunks = distributed.serve(distributed.parse_address(coordinator), authkey.encode(), nx_graph,
+                                 keys.file_digest(as_rel_file), processes)
+    print(f"Ran {n_chunks} chunks")
 
 
 @cli.command()
@@ -0,0 +1,251 @@
+from collections import deque
+import pickle
+import threading
+import time
+import traceback
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import networkx as nx
+
+import bgpsecsim.aggregate as aggregate
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.error as error
+import bgpsecsim.experiments as experiments
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.routing_policy import DefaultPolicy
+
+# Default number of trials sent to a worker host at a time
+CHUNK_SIZE = 50
+
+# (cell, chunk number)
+ChunkKey = Tuple[int, int]
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(':')
+    return (host or 'localhost', int(port))
+
+
+class Coordinator(experiments.ExperimentPool):
+    """Pool serving the trials of every cell to worker hosts connecting over TCP.
+
+    Worker hosts run serve(): they load the same AS relationship file (checked by graph_digest),
+    receive chunks of trials together with the pickled experiment of their cell and send back the
+    results, which they compute on a local ExperimentPool. Chunks of a worker whose connection is
+    lost are handed out again, as are chunks outstanding for longer than timeout seconds, in case
+    a host hangs; the first result of a chunk counts. A cell fails once no worker host has been
+    connected for idle_timeout seconds while it waits.
+
+    Connections are authenticated with authkey. Experiments and results are pickled, so only
+    hosts trusted with the key may connect.
+    """
+    address: Tuple[str, int]
+    graph_digest: str
+    chunk_size: int
+    timeout: float
+    idle_timeout: float
+
+    def __init__(self, graph: ASGraph, address: Tuple[str, int], authkey: bytes, graph_digest: str,
+                 chunk_size: int = CHUNK_SIZE, timeout: float = 3600.0, idle_timeout: float = 600.0):
+        super().__init__(graph, processes=0, baseline_cache=False)
+        self.address = address
+        self.authkey = authkey
+        self.graph_digest = graph_digest
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._condition = threading.Condition()
+        self._pending: Deque[ChunkKey] = deque()
+        self._chunks: Dict[ChunkKey, Tuple[bytes, List[Tuple[int, Any]]]] = {}
+        # Chunk -> time it was last handed out
+        self._outstanding: Dict[ChunkKey, float] = {}
+        self._results: List[Any] = []
+        self._failure: Optional[str] = None
+        self._closing = False
+        self._listener: Optional[Listener] = None
+        # Worker hosts connected, and since when there have been none
+        self._hosts = 0
+        self._idle_since = time.monotonic()
+
+    def start(self) -> None:
+        self._listener = Listener(self.address, authkey=self.authkey)
+        # With port 0, the port actually listened on
+        self.address = self._listener.address
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        if self._listener is not None:
+            self._listener.close()
+
+    def terminate(self) -> None:
+        self.close()
+
+    def run(self, experiment: 'experiments.Experiment', trials: List[Any]) -> List[Any]:
+        """Runs the trials of one cell on the worker hosts and returns the results in trial order."""
+        self._cell += 1
+        payload = pickle.dumps(experiment)
+        indexed = list(enumerate(trials))
+        with self._condition:
+            self._results = [None] * len(trials)
+            self._failure = None
+            for chunk, start in enumerate(range(0, len(indexed), self.chunk_size)):
+                key = (self._cell, chunk)
+                self._chunks[key] = (payload, indexed[start:start + self.chunk_size])
+                self._pending.append(key)
+            self._condition.notify_all()
+            started = time.monotonic()
+            while self._chunks and not self._closing:
+                if self._hosts == 0 and time.monotonic() - max(self._idle_since, started) > self.idle_timeout:
+                    # Late results of this cell are ignored
+                    self._chunks.clear()
+                    self._pending.clear()
+                    self._outstanding.clear()
+                    raise error.ExperimentError(f"No worker host connected for {self.idle_timeout:.0f} seconds")
+                self._condition.wait(timeout=1.0)
+            if self._chunks:
+                raise error.ExperimentError("Coordinator closed before all trials were run")
+            if self._failure is not None:
+                raise error.ExperimentError(f"Trial failed on worker host:\n{self._failure}")
+            return self._results
+
+    def run_counts(self, experiment: 'experiments.Experiment', trials: List[Any]) -> aggregate.Counts:
+        return aggregate.as_counts(self.run(experiment, trials))
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                # The listener was closed
+                return
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _next_chunk(self) -> Optional[Tuple[ChunkKey, bytes, List[Any]]]:
+        """Waits for a chunk to hand out, None once the coordinator is closing."""
+        with self._condition:
+            while not self._closing:
+                key = None
+                while self._pending and key is None:
+                    key = self._pending.popleft()
+                    if key not in self._chunks:
+                        key = None
+                if key is None:
+                    now = time.monotonic()
+                    key = next((key for key, handed_out in self._outstanding.items()
+                                if now - handed_out > self.timeout), None)
+                if key is not None:
+                    self._outstanding[key] = time.monotonic()
+                    payload, indexed = self._chunks[key]
+                    return key, payload, [trial for _, trial in indexed]
+                self._condition.wait(timeout=1.0)
+            return None
+
+    def _complete(self, key: ChunkKey, results: Optional[List[Any]], failure: Optional[str]) -> None:
+        with self._condition:
+            if key not in self._chunks:
+                # Also completed by another host after a time out
+                return
+            _, indexed = self._chunks.pop(key)
+            self._outstanding.pop(key, None)
+            if failure is not None:
+                if self._failure is None:
+                    self._failure = failure
+            else:
+                for (index, _), result in zip(indexed, results):
+                    self._results[index] = result
+            self._condition.notify_all()
+
+    def _requeue(self, key: ChunkKey) -> None:
+        with self._condition:
+            if key in self._chunks:
+                self._outstanding.pop(key, None)
+                self._pending.appendleft(key)
+                self._condition.notify_all()
+
+    def _serve(self, connection: Connection) -> None:
+        key = None
+        welcomed = False
+        try:
+            _, graph_digest = connection.recv()
+            if graph_digest != self.graph_digest:
+                connection.send(('reject', f"graph {graph_digest} does not match {self.graph_digest}"))
+                return
+            connection.send(('welcome', self.graph.propagation))
+            with self._condition:
+                self._hosts += 1
+            welcomed = True
+            while True:
+                chunk = self._next_chunk()
+                if chunk is None:
+                    connection.send(('stop',))
+                    return
+                key = chunk[0]
+                connection.send(('chunk', *chunk))
+                _, result_key, results, failure = connection.recv()
+                self._complete(result_key, results, failure)
+                key = None
+        except (EOFError, OSError):
+            # The host is gone, its chunk is handed out again
+            if key is not None:
+                self._requeue(key)
+        finally:
+            connection.close()
+            if welcomed:
+                with self._condition:
+                    self._hosts -= 1
+                    if self._hosts == 0:
+                        self._idle_since = time.monotonic()
+
+
+def serve(address: Tuple[str, int], authkey: bytes, nx_graph: nx.Graph, graph_digest: str,
+          processes: Optional[int] = None, connect_timeout: float = 60.0) -> int:
+    """Runs chunks of trials for the Coordinator at address on a local pool, until it stops.
+
+    Retries connecting for connect_timeout seconds, so that worker hosts can be started before the
+    coordinator. Without processes, the pool size is chosen by experiments.worker_count. Returns
+    the number of chunks run.
+    """
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            connection = Client(address, authkey=authkey)
+            break
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1.0)
+
+    n_chunks = 0
+    with connection:
+        connection.send(('hello', graph_digest))
+        message = connection.recv()
+        if message[0] == 'reject':
+            raise error.ExperimentError(message[1])
+        _, propagation = message
+        as_graph.PROPAGATION = propagation
+
+        graph = experiments.get_graph(nx_graph, DefaultPolicy())
+        with experiments.ExperimentPool(graph, processes) as pool:
+            while True:
+                try:
+                    message = connection.recv()
+                except EOFError:
+                    # The coordinator is gone
+                    break
+                if message[0] == 'stop':
+                    break
+                _, key, payload, trials = message
+                try:
+                    results, failure = pool.run(pickle.loads(payload), trials), None
+                except error.ExperimentError as e:
+                    results, failure = None, e.message
+                except Exception:
+                    # E.g. an experiment this host cannot unpickle, it fails the cell, not the host
+                    results, failure = None, traceback.format_exc()
+                connection.send(('result', key, results, failure))
+                n_chunks += 1
+    return n_chunks
@@ -6,3 +6,12 @@ class InvalidASRelFile(Exception):
 class NoRouteError(Exception):
     def __init__(self, message: str):
         self.message = message
+
+class ExperimentError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+
+class CheckpointError(Exception):
+    def __init__(self, filename: str, message: str):
+        self.filename = filename
+        self.message = message
@@ -1,30 +1,158 @@
 import abc
 from fractions import Fraction
+import gc
 import multiprocessing as mp
-import multiprocessing.synchronize as mpsync
 import networkx as nx
+import numpy as np
+import os
+import pickle
+import queue
 import random
+import shutil
 import signal
+import tempfile
+import time
+import traceback
 import warnings
-from typing import List, Tuple
+from typing import Any, List, Optional, Tuple, Union
 import sys
 
-from bgpsecsim.asys import Relation, AS, AS_ID
+import bgpsecsim.error as error
+import bgpsecsim.aggregate as aggregate
+import bgpsecsim.result_cache as result_cache
+import bgpsecsim.seeding as seeding
+from bgpsecsim.asys import Relation, AS, AS_ID, RoutingPolicy
 from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.baseline import BaselineCache
+from bgpsecsim.topology import TIER_THREE, Deployment, Topology
 from bgpsecsim.routing_policy import (
     DefaultPolicy, RPKIPolicy, PathEndValidationPolicy,
     BGPsecHighSecPolicy, BGPsecMedSecPolicy, BGPsecLowSecPolicy,
-    RouteLeakPolicy, ASPAPolicy, ASCONESPolicy
+    RouteLeakPolicy, ASPAPolicy, ASCONESPolicy, POLICY_IDS
 )
 
-PARALLELISM = 250
+# Workers of a pool, set by the --workers option of generate. By default, one per CPU available
+# to the process, as far as the memory allows, see worker_count.
+PARALLELISM: Optional[int] = None
+# Memory a worker takes per AS and per link of its graph, including the routes to one destination,
+# measured on random graphs. Forked workers share the graph at first, but writes to the reference
+# counts of its objects copy the memory over time.
+WORKER_BYTES_PER_AS = 1500
+WORKER_BYTES_PER_LINK = 400
+# Share of the available memory the workers of a pool may take
+MEMORY_FRACTION = 0.8
+# With automatic chunking, trials are sent to the workers in chunks taking about this long to run
+CHUNK_SECONDS = 0.05
+# Seconds between the checks of an idle worker whether its pool process is still there
+PARENT_CHECK_SECONDS = 5.0
+# Trials per cell the shared count buffer of a pool holds at first, it grows for larger cells
+COUNTS_CAPACITY = 4096
+# Files shared by the parent and the workers of a pool are kept in memory where possible
+_SHARED_DIRECTORY = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Graph handed out by get_graph, together with the networkx graph it was built from
+_graph_cache: Optional[Tuple[Union[nx.Graph, Topology], ASGraph]] = None
+# Pool entered last, used by run_experiment for experiments on its graph
+_active_pool: Optional['ExperimentPool'] = None
+# Cache of legitimate routes used by the hijack experiments, set in the workers of an ExperimentPool
+_baseline_cache: Optional[BaselineCache] = None
+
+def get_graph(nx_graph: Union[nx.Graph, Topology], policy: RoutingPolicy) -> ASGraph:
+    """ASGraph of nx_graph (or of a Topology, see as_graph.load_topology) with every AS deploying the given policy.
+
+    Building the AS objects takes seconds on a full CAIDA graph, so the graph is built once per
+    nx_graph and reset on later calls. A graph returned earlier is therefore changed by each call.
+    """
+    global _graph_cache
+    if _graph_cache is not None and _graph_cache[0] is nx_graph:
+        graph = _graph_cache[1]
+        graph.reset_deployment(policy)
+        return graph
+    graph = ASGraph(nx_graph, policy=policy)
+    _graph_cache = (nx_graph, graph)
+    return graph
+
+def available_cpus() -> int:
+    """CPUs this process may run on, which can be fewer than the machine has, e.g. in containers."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def available_memory() -> Optional[int]:
+    """Bytes of memory available without swapping, None where unknown."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def process_memory(pid: int) -> Optional[Tuple[int, int]]:
+    """(shared, private) bytes of resident memory of process pid, None where unknown.
+
+    Shared pages are also resident in other processes, e.g. those a forked worker has not yet
+    copied from its parent.
+    """
+    shared = private = 0
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                field, _, value = line.partition(':')
+                if field in ('Shared_Clean', 'Shared_Dirty'):
+                    shared += int(value.split()[0]) * 1024
+                elif field in ('Private_Clean', 'Private_Dirty'):
+                    private += int(value.split()[0]) * 1024
+    except OSError:
+        return None
+    return shared, private
+
+def worker_footprint(graph: ASGraph) -> int:
+    """Estimated bytes of memory a worker holding graph takes."""
+    topology = graph.topology
+    return WORKER_BYTES_PER_AS * len(topology) + WORKER_BYTES_PER_LINK * len(topology.edges)
+
+def worker_count(graph: ASGraph, requested: Optional[int] = None) -> int:
+    """Number of workers to run experiments on graph with: requested, or else PARALLELISM, or else
+    one per available CPU, capped so that the workers fit into MEMORY_FRACTION of the available memory.
+    """
+    if requested is None:
+        requested = PARALLELISM if PARALLELISM is not None else available_cpus()
+    memory = available_memory()
+    if memory is not None:
+        requested = min(requested, int(MEMORY_FRACTION * memory) // worker_footprint(graph))
+    return max(1, requested)
+
+def find_legitimate_routes(graph: ASGraph, victim: AS) -> None:
+    """graph.find_routes_to(victim), taking the routes from the baseline cache where possible."""
+    if _baseline_cache is None:
+        graph.find_routes_to(victim)
+    else:
+        _baseline_cache.find_routes_to(graph, victim)
+
+def run_experiment(graph: ASGraph, experiment: 'Experiment', trials: List[Any]) -> List[Any]:
+    """Runs the trials of an experiment on the active pool, or on a pool started just for them."""
+    pool = _active_pool
+    if pool is not None and pool.graph.topology is graph.topology:
+        return pool.run(experiment, trials)
+    with ExperimentPool(graph, processes=min(worker_count(graph), max(1, len(trials)))) as pool:
+        return pool.run(experiment, trials)
+
+def run_counts_experiment(graph: ASGraph, experiment: 'Experiment', trials: List[Any]) -> aggregate.Counts:
+    """Same as run_experiment for experiments whose trials return (bad, total) counts."""
+    pool = _active_pool
+    if pool is not None and pool.graph.topology is graph.topology:
+        return pool.run_counts(experiment, trials)
+    with ExperimentPool(graph, processes=min(worker_count(graph), max(1, len(trials)))) as pool:
+        return pool.run_counts(experiment, trials)
 
 def figure2a_line_1_next_as(
         nx_graph: nx.Graph,
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
+    graph = get_graph(nx_graph, RPKIPolicy())
     for asys in graph.identify_top_isps(deployment):
         asys.policy = PathEndValidationPolicy()
     return figure2a_experiment(graph, trials, n_hops=1)
@@ -34,7 +162,7 @@ def figure2a_line_2_bgpsec_partial(
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
+    graph = get_graph(nx_graph, RPKIPolicy())
     for asys in graph.identify_top_isps(deployment):
         asys.policy = BGPsecMedSecPolicy()
     return figure2a_experiment(graph, trials, n_hops=1)
@@ -43,21 +171,21 @@ def figure2a_line_3_two_hop(
         nx_graph: nx.Graph,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=PathEndValidationPolicy())
+    graph = get_graph(nx_graph, PathEndValidationPolicy())
     return figure2a_experiment(graph, trials, n_hops=2)
 
 def figure2a_line_4_rpki(
         nx_graph: nx.Graph,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
+    graph = get_graph(nx_graph, RPKIPolicy())
     return figure2a_experiment(graph, trials, n_hops=1)
 
 def figure2a_line_5_bgpsec_low_full(
         nx_graph: nx.Graph,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=BGPsecLowSecPolicy())
+    graph = get_graph(nx_graph, BGPsecLowSecPolicy())
     for asys in graph.asyss.values():
         asys.bgp_sec_enabled = True
     return figure2a_experiment(graph, trials, n_hops=1)
@@ -66,7 +194,7 @@ def figure2a_line_5_bgpsec_med_full(
         nx_graph: nx.Graph,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=BGPsecMedSecPolicy())
+    graph = get_graph(nx_graph, BGPsecMedSecPolicy())
     for asys in graph.asyss.values():
         asys.bgp_sec_enabled = True
     return figure2a_experiment(graph, trials, n_hops=1)
@@ -75,7 +203,7 @@ def figure2a_line_5_bgpsec_high_full(
         nx_graph: nx.Graph,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=BGPsecHighSecPolicy())
+    graph = get_graph(nx_graph, BGPsecHighSecPolicy())
     for asys in graph.asyss.values():
         asys.bgp_sec_enabled = True
     return figure2a_experiment(graph, trials, n_hops=1)
@@ -85,7 +213,7 @@ def figure2a_line_6_aspa_partial(
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
+    graph = get_graph(nx_graph, ASPAPolicy())
     for asys in graph.identify_top_isps(deployment):
         asys.aspa_enabled = True
     return figure2a_experiment(graph, trials, n_hops=1)
@@ -94,7 +222,7 @@ def figure2a_line_7_aspa_optimal(
         nx_graph: nx.Graph,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
+    graph = get_graph(nx_graph, ASPAPolicy())
     # Values here have to be set, to use ASPA for the desired percentage by AS categorized in certain Tier
     tierTwo = 50
     tierThree = 50
@@ -111,7 +239,7 @@ def figure2a_line_8_aspa_full(
         nx_graph: nx.Graph,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
+    graph = get_graph(nx_graph, ASPAPolicy())
     for asys in graph.asyss.values():
         asys.aspa_enabled = True
     return figure2a_experiment(graph, trials, n_hops=1)
@@ -139,29 +267,7 @@ def figure2a_experiment(
         trials: List[Tuple[AS_ID, AS_ID]],
         n_hops: int
 ) -> List[Fraction]:
-    trial_queue: mp.Queue = mp.Queue()
-    result_queue: mp.Queue = mp.Queue()
-    workers = [Figure2aExperiment(trial_queue, result_queue, graph, n_hops)
-               for _ in range(PARALLELISM)]
-    for worker in workers:
-        worker.start()
-
-    for trial in trials:
-        trial_queue.put(trial)
-
-    results = []
-    for _ in range(len(trials)):
-        result = result_queue.get()
-        results.append(result)
-
-    for worker in workers:
-        worker.stop()
-    for worker in workers:
-        trial_queue.put(None)
-    for worker in workers:
-        worker.join()
-
-    return results
+    return run_experiment(graph, Figure2aExperiment(graph.get_deployment(), n_hops), trials)
 
 def figureRouteLeak_experiment_selective(
         graph: ASGraph,
@@ -169,98 +275,37 @@ def figureRouteLeak_experiment_selective(
         deployment_ASPA_objects_list: List,
         deployment_ASPA_policy_list: List,
         algorithm: str
-) -> List[Fraction]:
-    trial_queue: mp.Queue = mp.Queue()
-    result_queue: mp.Queue = mp.Queue()
-    #Workers are being reused! Meaning that any change in the graph will affect later evaluations within the same worker!
-    #Make sure to reset policies and routing tables when reusing a worker!
-    workers = [FigureRouteLeakExperiment(trial_queue, result_queue, graph, deployment_ASPA_objects_list, deployment_ASPA_policy_list, algorithm)
-               for _ in range(PARALLELISM)]
-    for worker in workers:
-        worker.start()
-
-    for trial in trials:
-        trial_queue.put(trial)
-
-    results = []
-    for _ in range(len(trials)):
-        result = result_queue.get()
-        results.append(result)
-
-    for worker in workers:
-        worker.stop()
-    for worker in workers:
-        trial_queue.put(None)
-    for worker in workers:
-        worker.join()
-
-    return results
+) -> aggregate.Counts:
+    experiment = FigureRouteLeakExperiment([asys.as_id for asys in deployment_ASPA_objects_list],
+                                           [asys.as_id for asys in deployment_ASPA_policy_list],
+                                           algorithm)
+    return run_counts_experiment(graph, experiment, trials)
 
 def figureRouteLeak_experiment_random(
         graph: ASGraph,
         trials: List[Tuple[AS_ID, AS_ID]],
         deployment_objects: int,
         deployment_policy: int,
-        algorithm: str
-) -> List[Fraction]:
-    trial_queue: mp.Queue = mp.Queue()
-    result_queue: mp.Queue = mp.Queue()
-    #Workers are being reused! Meaning that any change in the graph will affect later evaluations within the same worker!
-    #Make sure to reset policies and routing tables when reusing a worker!
-    workers = [FigureRouteLeakExperimentRandom(trial_queue, result_queue, graph, deployment_objects, deployment_policy, algorithm)
-               for _ in range(PARALLELISM)]
-    for worker in workers:
-        worker.start()
-
-    for trial in trials:
-        trial_queue.put(trial)
-
-    results = []
-    for _ in range(len(trials)):
-        result = result_queue.get()
-        results.append(result)
-
-    for worker in workers:
-        worker.stop()
-    for worker in workers:
-        trial_queue.put(None)
-    for worker in workers:
-        worker.join()
-
-    return results
+        algorithm: str,
+        seed: Optional[np.random.SeedSequence] = None,
+        first_trial: int = 0
+) -> aggregate.Counts:
+    experiment = FigureRouteLeakExperimentRandom(deployment_objects, deployment_policy, algorithm, seed)
+    # Trials carry their index in the trial list of the cell, which selects their random stream
+    return run_counts_experiment(graph, experiment, [(victim, attacker, first_trial + i) for i, (victim, attacker) in enumerate(trials)])
 
 def figureForgedOrigin_experiment_random(
         graph: ASGraph,
         trials: List[Tuple[AS_ID, AS_ID]],
         deployment_objects: int,
         deployment_policy: int,
-        algorithm: str
-) -> List[Fraction]:
-    trial_queue: mp.Queue = mp.Queue()
-    result_queue: mp.Queue = mp.Queue()
-    #Workers are being reused! Meaning that any change in the graph will affect later evaluations within the same worker!
-    #Make sure to reset policies and routing tables when reusing a worker!
-    workers = [FigureForgedOriginPrefixHijackExperimentRandom(trial_queue, result_queue, graph, deployment_objects, deployment_policy, algorithm)
-               for _ in range(PARALLELISM)]
-    for worker in workers:
-        worker.start()
-
-    for trial in trials:
-        trial_queue.put(trial)
-
-    results = []
-    for _ in range(len(trials)):
-        result = result_queue.get()
-        results.append(result)
-
-    for worker in workers:
-        worker.stop()
-    for worker in workers:
-        trial_queue.put(None)
-    for worker in workers:
-        worker.join()
-
-    return results
+        algorithm: str,
+        seed: Optional[np.random.SeedSequence] = None,
+        first_trial: int = 0
+) -> aggregate.Counts:
+    experiment = FigureForgedOriginPrefixHijackExperimentRandom(deployment_objects, deployment_policy, algorithm, seed)
+    # Trials carry their index in the trial list of the cell, which selects their random stream
+    return run_counts_experiment(graph, experiment, [(victim, attacker, first_trial + i) for i, (victim, attacker) in enumerate(trials)])
 
 def figureForgedOrigin_experiment_selective(
         graph: ASGraph,
@@ -268,36 +313,15 @@ def figureForgedOrigin_experiment_selective(
         deployment_objects_list: List,
         deployment_policy_list: List,
         algorithm: str
-) -> List[Fraction]:
-    trial_queue: mp.Queue = mp.Queue()
-    result_queue: mp.Queue = mp.Queue()
-    #Workers are being reused! Meaning that any change in the graph will affect later evaluations within the same worker!
-    #Make sure to reset policies and routing tables when reusing a worker!
-    workers = [FigureForgedOriginPrefixHijackExperiment(trial_queue, result_queue, graph, deployment_objects_list, deployment_policy_list, algorithm)
-               for _ in range(PARALLELISM)]
-    for worker in workers:
-        worker.start()
-
-    for trial in trials:
-        trial_queue.put(trial)
-
-    results = []
-    for _ in range(len(trials)):
-        result = result_queue.get()
-        results.append(result)
-
-    for worker in workers:
-        worker.stop()
-    for worker in workers:
-        trial_queue.put(None)
-    for worker in workers:
-        worker.join()
-
-    return results
+) -> aggregate.Counts:
+    experiment = FigureForgedOriginPrefixHijackExperiment([asys.as_id for asys in deployment_objects_list],
+                                                          [asys.as_id for asys in deployment_policy_list],
+                                                          algorithm)
+    return run_counts_experiment(graph, experiment, trials)
 
 
 def figure4_k_hop(nx_graph: nx.Graph, trials: List[Tuple[AS_ID, AS_ID]], n_hops: int) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
+    graph = get_graph(nx_graph, DefaultPolicy())
     return figure2a_experiment(graph, trials, n_hops)
 
 def figure7a(
@@ -305,7 +329,7 @@ def figure7a(
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
+    graph = get_graph(nx_graph, RPKIPolicy())
     for asys in graph.identify_top_isps(deployment):
         asys.policy = PathEndValidationPolicy()
     return figure2a_experiment(graph, trials, n_hops=1)
@@ -315,7 +339,7 @@ def figure7b(
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
+    graph = get_graph(nx_graph, RPKIPolicy())
     for asys in graph.identify_top_isps(deployment):
         asys.policy = BGPsecMedSecPolicy()
     return figure2a_experiment(graph, trials, n_hops=1)
@@ -326,7 +350,7 @@ def figure7c(
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
+    graph = get_graph(nx_graph, ASPAPolicy())
     for asys in graph.identify_top_isps(deployment):
         asys.aspa_enabled = True
     return figure2a_experiment(graph, trials, n_hops=1)
@@ -337,7 +361,7 @@ def figure7d(
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
+    graph = get_graph(nx_graph, ASPAPolicy())
 
     tierOne = 50
     tierTwo = 50
@@ -358,7 +382,7 @@ def figure8_line_1_next_as(
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
     results = []
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
+    graph = get_graph(nx_graph, RPKIPolicy())
     for _ in range(20):
         for asys in graph.identify_top_isps(int(deployment / p)):
             if random.random() < p:
@@ -373,7 +397,7 @@ def figure8_line_2_bgpsec_partial(
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
     results = []
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
+    graph = get_graph(nx_graph, RPKIPolicy())
     for _ in range(20):
         for asys in graph.identify_top_isps(int(deployment / p)):
             if random.random() < p:
@@ -388,7 +412,7 @@ def figure8_line_3_aspa_partial(
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
     results = []
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
+    graph = get_graph(nx_graph, ASPAPolicy())
     for _ in range(20):
         for asys in graph.identify_top_isps(int(deployment / p)):
             if random.random() < p:
@@ -401,7 +425,7 @@ def figure9_line_1_rpki_partial(
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
+    graph = get_graph(nx_graph, DefaultPolicy())
     for asys in graph.identify_top_isps(deployment):
         asys.policy = RPKIPolicy()
     return figure2a_experiment(graph, trials, n_hops=0)
@@ -414,7 +438,7 @@ def figure10_aspa(
         trials: List[Tuple[AS_ID, AS_ID]],
         tierOne: int
 ) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
+    graph = get_graph(nx_graph, ASPAPolicy())
 
     for asys in random.sample(graph.get_tierOne(), int(len(graph.get_tierOne())/100*tierOne)):
         graph.get_asys(asys).aspa_enabled=True
@@ -428,14 +452,17 @@ def figure10_aspa(
     return figure2a_experiment(graph, trials, n_hops=1)
 
 # In this method, each and every trial run chooses his ASPA ASes randomly for object creation and policy deployment (compared to choosing it once randomly for all trial runs)
-def figure11_random_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
-    return figureRouteLeak_experiment_random(graph, trials, deployment_objects, deployment_policy, 'ASPA')
+@result_cache.cached_seeded
+def figure11_random_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]], first_trial: int = 0) -> aggregate.Counts:
+    graph = get_graph(nx_graph, DefaultPolicy())
+    seed = seeding.cell_seed(figure11_random_aspa_deployment.__name__, deployment_objects, deployment_policy)
+    return figureRouteLeak_experiment_random(graph, trials, deployment_objects, deployment_policy, 'ASPA', seed, first_trial)
 
 # In this method, ASPA ASes are selected by strategy and all trial runs deploy the same ASPA objects and ASes.
 # Strategy: Objects and Policy are deployed by out-degree from top-to-bottom
-def figure12_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
+@result_cache.cached
+def figure12_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> aggregate.Counts:
+    graph = get_graph(nx_graph, DefaultPolicy())
     descending_by_cust_degree = graph.identify_top_isps(len(graph.asyss))
 
     # Select ASes for ASPA object deployment top-to-bottom by cust degree
@@ -455,8 +482,9 @@ def figure12_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: i
 
 # In this method, ASPA ASes are selected by strategy and all trial runs deploy the same ASPA objects and ASes.
 # Strategy: Policies are deployed by out-degree from top-to-bottom, object creation from bottom-to-top
-def figure14_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
+@result_cache.cached
+def figure14_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> aggregate.Counts:
+    graph = get_graph(nx_graph, DefaultPolicy())
     descending_by_cust_degree = graph.identify_top_isps(len(graph.asyss))
 
     # Select ASes for ASPA object deployment bottom-to-top by cust degree
@@ -478,15 +506,18 @@ def figure14_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: i
 
 
 # In this method, each and every trial run chooses his ASCONES ASes randomly for object creation and policy deployment (compared to choosing it once randomly for all trial runs)
-def figure30_random_ascones_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
-    return figureRouteLeak_experiment_random(graph, trials, deployment_objects, deployment_policy, 'ASCONES')
+@result_cache.cached_seeded
+def figure30_random_ascones_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]], first_trial: int = 0) -> aggregate.Counts:
+    graph = get_graph(nx_graph, DefaultPolicy())
+    seed = seeding.cell_seed(figure30_random_ascones_deployment.__name__, deployment_objects, deployment_policy)
+    return figureRouteLeak_experiment_random(graph, trials, deployment_objects, deployment_policy, 'ASCONES', seed, first_trial)
 
 
 # In this method, ASCONES ASes are selected by strategy and all trial runs deploy the same ASCONES objects and ASes.
 # Strategy: Objects and Policy are deployed by out-degree from top-to-bottom
-def figure31_selective_ascones_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
+@result_cache.cached
+def figure31_selective_ascones_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> aggregate.Counts:
+    graph = get_graph(nx_graph, DefaultPolicy())
     descending_by_cust_degree = graph.identify_top_isps(len(graph.asyss))
     tierone_and_tiertwo_descending_by_cust_degree = graph.identify_top_isps_from_tierone_and_tiertwo(len(graph.asyss))
 
@@ -500,8 +531,9 @@ def figure31_selective_ascones_deployment(nx_graph: nx.Graph, deployment_objects
 
 # In this method, ASCONES ASes are selected by strategy and all trial runs deploy the same ASCONES objects and ASes.
 # Strategy: Objects and Policy are deployed by out-degree. Objects from BottomToTop, Policy from TopToBottom
-def figure32_selective_ascones_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
+@result_cache.cached
+def figure32_selective_ascones_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> aggregate.Counts:
+    graph = get_graph(nx_graph, DefaultPolicy())
     descending_by_cust_degree = graph.identify_top_isps(len(graph.asyss))
     tierone_and_tiertwo_descending_by_cust_degree = graph.identify_top_isps_from_tierone_and_tiertwo(len(graph.asyss))
 
@@ -518,15 +550,18 @@ def figure32_selective_ascones_deployment(nx_graph: nx.Graph, deployment_objects
 
 # In this method, each and every trial run chooses his ASPA ASes randomly for object creation and policy deployment (compared to choosing it once randomly for all trial runs)
 # This method is for the forget-origin prefix hijack.
-def figure40_random_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
-    return figureForgedOrigin_experiment_random(graph, trials, deployment_objects, deployment_policy, 'ASPA')
+@result_cache.cached_seeded
+def figure40_random_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]], first_trial: int = 0) -> aggregate.Counts:
+    graph = get_graph(nx_graph, DefaultPolicy())
+    seed = seeding.cell_seed(figure40_random_aspa_deployment.__name__, deployment_objects, deployment_policy)
+    return figureForgedOrigin_experiment_random(graph, trials, deployment_objects, deployment_policy, 'ASPA', seed, first_trial)
 
 # In this method, ASPA ASes are selected by strategy and all trial runs deploy the same ASPA objects and ASes.
 # Strategy: Objects and Policy are deployed by out-degree from top-to-bottom
 # This method is for the forget-origin prefix hijack.
-def figure42_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
+@result_cache.cached
+def figure42_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> aggregate.Counts:
+    graph = get_graph(nx_graph, DefaultPolicy())
     descending_by_cust_degree = graph.identify_top_isps(len(graph.asyss))
     #print([asys.as_id for asys in descending_by_cust_degree])
 
@@ -547,8 +582,9 @@ def figure42_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: i
 # In this method, ASPA ASes are selected by strategy and all trial runs deploy the same ASPA objects and ASes.
 # Strategy: Objects and Policy are deployed by out-degree. Objects from bottom-to-top and policy from top-to-bottom
 # This method is for the forget-origin prefix hijack.
-def figure43_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
+@result_cache.cached
+def figure43_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> aggregate.Counts:
+    graph = get_graph(nx_graph, DefaultPolicy())
     descending_by_cust_degree = graph.identify_top_isps(len(graph.asyss))
 
     # Select ASes for ASPA object deployment bottom-to-top by cust degree
@@ -571,8 +607,9 @@ def figure43_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: i
 # In this method, ASPA ASes are selected by strategy and all trial runs deploy the same ASPA objects and ASes.
 # Strategy: Objects are deployed by out-degree from top-to-bottom, Policies are deployed by out-degree from bottom-to-top
 # This method is for the forget-origin prefix hijack.
-def figure44_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
+@result_cache.cached
+def figure44_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> aggregate.Counts:
+    graph = get_graph(nx_graph, DefaultPolicy())
     descending_by_cust_degree = graph.identify_top_isps(len(graph.asyss))
     #print([asys.as_id for asys in descending_by_cust_degree])
 
@@ -590,8 +627,9 @@ def figure44_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: i
 # In this method, ASPA ASes are selected by strategy and all trial runs deploy the same ASPA objects and ASes.
 # Strategy: Objects and Policies are deployed by out-degree from bottom-to-top
 # This method is for the forget-origin prefix hijack.
-def figure45_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
+@result_cache.cached
+def figure45_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: int, deployment_policy: int, trials: List[Tuple[AS_ID, AS_ID]]) -> aggregate.Counts:
+    graph = get_graph(nx_graph, DefaultPolicy())
     descending_by_cust_degree = graph.identify_top_isps(len(graph.asyss))
     #print([asys.as_id for asys in descending_by_cust_degree])
 
@@ -611,20 +649,24 @@ def figure45_selective_aspa_deployment(nx_graph: nx.Graph, deployment_objects: i
 
 #Result is a fraction, shows the ratio of successful attacks to not attacked routes
 def attacker_success_rate(graph: ASGraph, attacker: AS, victim: AS) -> Fraction:
+    #Fraction gives the first value as numerator and the second as denominator
+    return Fraction(*attacker_success_counts(graph, attacker, victim))*100
+
+#Number of routes to the victim leading to the attacker and total number of routes to the victim
+def attacker_success_counts(graph: ASGraph, attacker: AS, victim: AS) -> Tuple[int, int]:
     n_bad_routes = 0
     n_total_routes = 0
     for asys in graph.asyss.values():
         route = asys.get_route(victim.as_id)
         if route:
             n_total_routes += 1
-            if attacker in route.path and route.path[route.path.index(attacker) - 1] == victim: #check that victim is one before avoid counting regular routes received by attacker
+            if route.contains(attacker) and route.predecessor(attacker) == victim: #check that victim is one before avoid counting regular routes received by attacker
                 n_bad_routes += 1
                 #print('Attacker: ', str(attacker.as_id) + ' Victim: ' + str(victim.as_id) + ' Bad route: ', [asys.as_id for asys in route.path])
             #else:
                 #print('Attacker: ', str(attacker.as_id) + ' Victim: ' + str(victim.as_id) + ' Regular route: ', [asys.as_id for asys in route.path])
-    #Fraction gives the first value as numerator and the second as denominator
     #print('Bad routes: ' + str(n_bad_routes) + ' ; Total routes: ' + str(n_total_routes))
-    return Fraction(n_bad_routes, n_total_routes)*100
+    return (n_bad_routes, n_total_routes)
 
 #Check if route contains a relationship that goes against the Gao-Rexford model
 def leaked_route(route: ['Route']) -> AS:
@@ -643,6 +685,10 @@ def leaked_route(route: ['Route']) -> AS:
 
 # This function returns a fraction of total vs. bad routes.
 def route_leak_success_rate(graph: ASGraph, attacker: AS, victim: AS) -> Fraction:
+    return Fraction(*route_leak_counts(graph, attacker, victim))*100
+
+#Number of leaked routes to the victim and total number of routes to the victim
+def route_leak_counts(graph: ASGraph, attacker: AS, victim: AS) -> Tuple[int, int]:
     n_bad_routes = 0
     n_total_routes = 0
     for asys in graph.asyss.values():
@@ -657,53 +703,306 @@ def route_leak_success_rate(graph: ASGraph, attacker: AS, victim: AS) -> Fractio
     #print('Bad routes: ', n_bad_routes)
     #print('Total routes: ', n_total_routes)
     #print('----')
-    #Fraction gives the first value as numerator and the second as denominator
     #print('Bad routes: ' + str(n_bad_routes) + ' ; Total routes: ' + str(n_total_routes))
-    return Fraction(n_bad_routes, n_total_routes)*100
+    return (n_bad_routes, n_total_routes)
 
-class Experiment(mp.Process, abc.ABC):
-    input_queue: mp.Queue
-    output_queue: mp.Queue
-    _stopped: mpsync.Event
+class ExperimentPool(object):
+    """Long-lived worker processes, each holding its own copy of the base graph.
 
-    def __init__(self, input_queue: mp.Queue, output_queue: mp.Queue):
-        super().__init__(daemon=True)
-        self.input_queue = input_queue
-        self.output_queue = output_queue
-        self._stopped = mp.Event()
+    The workers are forked once with the graph and afterwards only receive experiments, i.e. the
+    deployment of one grid cell, and trials. Process start-up and copying the graph are thereby
+    paid once per pool instead of once per cell. Entered as a context manager, the pool is also
+    the one run_experiment hands experiments on its graph to.
 
-    def stop(self):
-        self._stopped.set()
+    Without processes, the number of workers is chosen by worker_count.
 
-    def run(self):
-        signal.signal(signal.SIGINT, lambda _signo, _frame: self.stop())
+    Workers started by spawn or forkserver (see multiprocessing.set_start_method) build their own
+    graph on the topology memory-mapped from its directory, which is written to the temporary
+    directory of the pool unless the topology was loaded from one.
 
-        while not self._stopped.is_set():
-            trial = self.input_queue.get()
+    The temporary directory of the pool is kept in memory (_SHARED_DIRECTORY) where possible and
+    removed with the pool. Unless baseline_cache is False, the workers share a BaselineCache in it.
 
-            # A None input is just used to stop blocking on the queue, so we can check stopped.
-            if trial is None:
-                continue
+    Trials are sent in chunks of chunk_size trials per message. Without a chunk_size, the size is
+    chosen from the time per trial measured in earlier cells, so that a chunk runs for about
+    CHUNK_SECONDS, while leaving at least four chunks per worker to balance the load.
+
+    With run_counts, the workers write the (bad, total) counts of the trials into a memory-mapped
+    buffer shared with the parent, and the result queue only signals completed chunks.
+    """
+    graph: ASGraph
+    processes: int
+    workers: List['Worker']
+    baseline_cache: Optional[BaselineCache]
+    chunk_size: Optional[int]
+
+    def __init__(self, graph: ASGraph, processes: Optional[int] = None, baseline_cache: bool = True,
+                 chunk_size: Optional[int] = None):
+        self.graph = graph
+        self.processes = processes if processes is not None else worker_count(graph)
+        self.workers = []
+        self.baseline_cache = None
+        self.chunk_size = chunk_size
+        self._use_baseline_cache = baseline_cache
+        self._cell = 0
+        self._previous_pool = None
+        # Moving average of the seconds a trial takes in a worker, None before the first cell
+        self._trial_seconds: Optional[float] = None
+        self._directory: Optional[str] = None
+        self._counts: Optional[np.ndarray] = None
+        self._counts_file: Optional[str] = None
+
+    def start(self) -> None:
+        self.trial_queue = mp.Queue()
+        self.result_queue = mp.Queue()
+        self._directory = tempfile.mkdtemp(prefix='bgpsecsim-pool-', dir=_SHARED_DIRECTORY)
+        if self._use_baseline_cache:
+            baseline_directory = os.path.join(self._directory, 'baselines')
+            os.mkdir(baseline_directory)
+            self.baseline_cache = BaselineCache(baseline_directory)
+        topology_directory = self.graph.topology.directory
+        if topology_directory is None and mp.get_start_method() != 'fork':
+            topology_directory = os.path.join(self._directory, 'topology')
+            self.graph.topology.save(topology_directory)
+        self.workers = [Worker(self.graph, mp.Queue(), self.trial_queue, self.result_queue, self.baseline_cache,
+                               topology_directory)
+                        for _ in range(self.processes)]
+        # The objects existing at the fork, above all those of the graph, are moved out of reach of
+        # the garbage collector, so that its passes in the workers do not copy the pages shared with
+        # the parent. This is all that is shared: routing tables still live on the AS objects and
+        # reference counts still change, so every worker copies the pages of the objects it touches
+        gc.collect()
+        gc.freeze()
+        try:
+            for worker in self.workers:
+                worker.start()
+        finally:
+            gc.unfreeze()
+
+    def worker_memory(self) -> Optional[Tuple[int, int]]:
+        """(shared, private) bytes of resident memory summed over the workers, None where unknown."""
+        memory = [process_memory(worker.pid) for worker in self.workers if worker.pid is not None]
+        if not memory or None in memory:
+            return None
+        return sum(shared for shared, _ in memory), sum(private for _, private in memory)
+
+    def close(self) -> None:
+        for _ in self.workers:
+            self.trial_queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        self._remove_workers()
+
+    def terminate(self) -> None:
+        for worker in self.workers:
+            worker.terminate()
+        for worker in self.workers:
+            worker.join()
+        self._remove_workers()
+
+    def _remove_workers(self) -> None:
+        self.workers = []
+        self._counts = None
+        self._counts_file = None
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def __enter__(self) -> 'ExperimentPool':
+        global _active_pool
+        self.start()
+        self._previous_pool = _active_pool
+        _active_pool = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        global _active_pool
+        _active_pool = self._previous_pool
+        # Queued trials of an interrupted run are not worth waiting for
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def choose_chunk_size(self, n_trials: int) -> int:
+        if self.chunk_size is not None:
+            return self.chunk_size
+        if self._trial_seconds is None:
+            return 1
+        balanced = -(-n_trials // (4 * len(self.workers)))
+        return max(1, min(balanced, round(CHUNK_SECONDS / max(self._trial_seconds, 1e-9))))
+
+    def run(self, experiment: 'Experiment', trials: List[Any]) -> List[Any]:
+        """Runs the trials of one cell on the workers and returns the results in trial order."""
+        return self._run(experiment, trials, None)
+
+    def run_counts(self, experiment: 'Experiment', trials: List[Any]) -> aggregate.Counts:
+        """Same as run for experiments whose trials return (bad, total) counts."""
+        if self._counts is None or len(self._counts) < len(trials):
+            # Workers open the new buffer when they see its file name
+            capacity = max(COUNTS_CAPACITY, 2 * len(trials))
+            if self._counts_file is not None:
+                # The memory of the old buffer is freed once the workers have switched as well
+                self._counts = None
+                os.unlink(self._counts_file)
+            self._counts_file = os.path.join(self._directory, f"counts-{capacity}.npy")
+            self._counts = np.lib.format.open_memmap(self._counts_file, mode='w+', dtype=np.int64, shape=(capacity, 2))
+        self._run(experiment, trials, self._counts_file)
+        return np.array(self._counts[:len(trials)])
+
+    def _run(self, experiment: 'Experiment', trials: List[Any], counts_file: Optional[str]) -> List[Any]:
+        self._cell += 1
+        cell = self._cell
+        # Every worker unpickles the experiment once, when it sees the first trial of the cell
+        payload = pickle.dumps(experiment)
+        for worker in self.workers:
+            worker.experiment_queue.put((cell, payload))
+        chunk_size = self.choose_chunk_size(len(trials))
+        n_chunks = 0
+        for start in range(0, len(trials), chunk_size):
+            self.trial_queue.put((cell, start, trials[start:start + chunk_size], counts_file))
+            n_chunks += 1
+
+        results: List[Any] = [None] * len(trials)
+        failure = None
+        seconds = 0.0
+        for _ in range(n_chunks):
+            start, chunk_results, failed, chunk_seconds = self.result_queue.get()
+            if failed is not None and failure is None:
+                failure = failed
+            if chunk_results is not None:
+                results[start:start + len(chunk_results)] = chunk_results
+            seconds += chunk_seconds
+        if trials:
+            trial_seconds = seconds / len(trials)
+            self._trial_seconds = (trial_seconds if self._trial_seconds is None
+                                   else 0.5 * self._trial_seconds + 0.5 * trial_seconds)
+        if failure is not None:
+            raise error.ExperimentError(f"Trial failed in worker:\n{failure}")
+        return results
+
+class Worker(mp.Process):
+    graph: ASGraph
+    experiment_queue: mp.Queue
+    trial_queue: mp.Queue
+    result_queue: mp.Queue
+    baseline_cache: Optional[BaselineCache]
+    # Directory of the topology of graph, see Topology.save, for workers not started by fork
+    topology_directory: Optional[str]
+
+    def __init__(self, graph: ASGraph, experiment_queue: mp.Queue, trial_queue: mp.Queue, result_queue: mp.Queue,
+                 baseline_cache: Optional[BaselineCache] = None, topology_directory: Optional[str] = None):
+        super().__init__(daemon=True)
+        self.graph = graph
+        self.experiment_queue = experiment_queue
+        self.trial_queue = trial_queue
+        self.result_queue = result_queue
+        self.baseline_cache = baseline_cache
+        self.topology_directory = topology_directory
+
+    def __getstate__(self):
+        # Workers started by spawn or forkserver receive the deployment instead of the AS objects,
+        # and build their graph on the memory-mapped topology arrays
+        state = self.__dict__.copy()
+        graph = state.pop('graph')
+        state['graph_state'] = (graph.propagation, graph.get_deployment())
+        return state
+
+    def __setstate__(self, state):
+        propagation, deployment = state.pop('graph_state')
+        self.__dict__.update(state)
+        self.graph = ASGraph(Topology.load(self.topology_directory), propagation=propagation)
+        self.graph.apply_deployment(deployment)
+
+    def run(self):
+        global _baseline_cache
+        # Interrupts are handled by the parent, which terminates the pool
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        _baseline_cache = self.baseline_cache
 
-            self.output_queue.put(self.run_trial(trial))
+        graph = self.graph
+        cell = None
+        experiment = None
+        prepared = False
+        counts_file = None
+        counts = None
+        while True:
+            try:
+                message = self.trial_queue.get(timeout=PARENT_CHECK_SECONDS)
+            except queue.Empty:
+                # A worker whose pool process was killed is never stopped otherwise
+                if not mp.parent_process().is_alive():
+                    break
+                continue
+            # A None input stops the worker
+            if message is None:
+                break
+
+            trial_cell, start, trials, trial_counts_file = message
+            if trial_counts_file is not None and trial_counts_file != counts_file:
+                counts_file = trial_counts_file
+                counts = np.load(counts_file, mmap_mode='r+')
+            started = time.perf_counter()
+            results = []
+            failure = None
+            if trial_cell != cell:
+                # Skips the experiments of cells this worker did not get any trial of
+                while cell != trial_cell:
+                    cell, payload = self.experiment_queue.get()
+                experiment = None
+            for trial in trials:
+                try:
+                    if experiment is None:
+                        experiment = pickle.loads(payload)
+                        prepared = False
+                    if not prepared:
+                        experiment.prepare(graph)
+                        prepared = True
+                    results.append(experiment.run_trial(graph, trial))
+                except Exception:
+                    # The graph may be left half-deployed, so it is prepared again for the next trial
+                    prepared = False
+                    results.append(None)
+                    if failure is None:
+                        failure = traceback.format_exc()
+            if trial_counts_file is not None:
+                # Only completion is signaled, the counts are read from the shared buffer
+                if failure is None:
+                    try:
+                        counts[start:start + len(results)] = results
+                    except (TypeError, ValueError):
+                        failure = traceback.format_exc()
+                results = None
+            self.result_queue.put((start, results, failure, time.perf_counter() - started))
+
+class Experiment(abc.ABC):
+    """Deployment of one grid cell and the trial run on it.
+
+    Experiments are pickled to the workers of an ExperimentPool, so they carry AS IDs rather than
+    AS objects. prepare sets up the worker's graph once per cell, run_trial is called per trial.
+    """
+
+    def prepare(self, graph: ASGraph) -> None:
+        graph.apply_deployment(Deployment(len(graph.asyss)))
 
     #Creates an abstract class which has to be definded later on
     @abc.abstractmethod
     #raise is used to give own errors, in this case if anythin happens where now error was created for
-    def run_trial(self, trial):
+    def run_trial(self, graph: ASGraph, trial):
         raise NotImplementedError()
 
 class Figure2aExperiment(Experiment):
-    graph: ASGraph
+    deployment: Deployment
     n_hops: int
 
-    def __init__(self, input_queue: mp.Queue, output_queue: mp.Queue, graph: ASGraph, n_hops: int):
-        super().__init__(input_queue, output_queue)
-        self.graph = graph
+    def __init__(self, deployment: Deployment, n_hops: int):
+        self.deployment = deployment
         self.n_hops = n_hops
 
-    def run_trial(self, trial: Tuple[(AS_ID, AS_ID)]):
-        graph = self.graph
+    def prepare(self, graph: ASGraph) -> None:
+        graph.apply_deployment(self.deployment)
+
+    def run_trial(self, graph: ASGraph, trial: Tuple[(AS_ID, AS_ID)]):
         n_hops = self.n_hops
         #Takes the value passed by the function call by "trial" and assigns them to victim and attacker
         victim_id, attacker_id = trial
@@ -722,7 +1021,7 @@ class Figure2aExperiment(Experiment):
         
         #starts to find a new routing table and executes the attack onto it by n hops
         graph.clear_routing_tables()
-        graph.find_routes_to(victim)
+        find_legitimate_routes(graph, victim)
         graph.hijack_n_hops(victim, attacker, n_hops)
         
         result = attacker_success_rate(graph, attacker, victim)
@@ -761,18 +1060,22 @@ def show_aspa_objects_count(graph):
             n += 1
     print('Total of ASPA objects', n)
 
+#Draws the given percentage of as_ids, as an index array into them
+def sample_ids(rng: np.random.Generator, as_ids: List[AS_ID], percentage: float) -> List[AS_ID]:
+    return [as_ids[i] for i in rng.choice(len(as_ids), round(len(as_ids) / 100 * percentage), replace=False)]
+
 #create ASCONES objects for only tier one and two ASes according to deployment fraction
-def create_ASCONES_objects_randomly(graph, deployment_ASCONES_objects):
-    random.seed(None)
+def create_ASCONES_objects_randomly(graph, deployment_ASCONES_objects, rng=None):
+    rng = np.random.default_rng(rng)
     sample = graph.get_tierOne() + graph.get_tierTwo()
-    for as_id in random.sample(sample, round(len(sample) / 100 * deployment_ASCONES_objects)):
+    for as_id in sample_ids(rng, sample, deployment_ASCONES_objects):
         graph.get_asys(as_id).create_new_ascones()
         #graph.get_asys(as_id).create_dummy_aspa()
 
 #create ASPA objects for all ASes according to deployment fraction
-def create_ASPA_objects_randomly(graph, deployment_ASPA_objects):
-    random.seed(None)
-    for as_id in random.sample(graph.asyss.keys(), round(len(graph.asyss.keys()) / 100 * deployment_ASPA_objects)):
+def create_ASPA_objects_randomly(graph, deployment_ASPA_objects, rng=None):
+    rng = np.random.default_rng(rng)
+    for as_id in sample_ids(rng, list(graph.asyss), deployment_ASPA_objects):
         graph.get_asys(as_id).create_new_aspa(graph)
         #graph.get_asys(as_id).create_dummy_aspa()
 
@@ -789,15 +1092,15 @@ def create_ASPA_objects(graph, deployment_ASPA_objects):
         #graph.get_asys(as_id).create_dummy_aspa()
 
 #create ASCONES policies for all ASes according to deployment fraction
-def create_ASCONES_policies_randomly(graph, deployment_ASCONES_policy):
-    random.seed(None)
-    for as_id in random.sample(graph.asyss.keys(), round(len(graph.asyss.keys()) / 100 * deployment_ASCONES_policy)):
+def create_ASCONES_policies_randomly(graph, deployment_ASCONES_policy, rng=None):
+    rng = np.random.default_rng(rng)
+    for as_id in sample_ids(rng, list(graph.asyss), deployment_ASCONES_policy):
         graph.get_asys(as_id).policy = ASCONESPolicy()
 
 #create ASPA policies for all ASes according to deployment fraction
-def create_ASPA_policies_randomly(graph, deployment_ASPA_policy):
-    random.seed(None)
-    for as_id in random.sample(graph.asyss.keys(), round(len(graph.asyss.keys()) / 100 * deployment_ASPA_policy)):
+def create_ASPA_policies_randomly(graph, deployment_ASPA_policy, rng=None):
+    rng = np.random.default_rng(rng)
+    for as_id in sample_ids(rng, list(graph.asyss), deployment_ASPA_policy):
         graph.get_asys(as_id).policy = ASPAPolicy()
 
 #create ASCONES policies for all ASes according to list parameter
@@ -810,104 +1113,111 @@ def create_ASPA_policies(graph, deployment_ASPA_policy):
     for asys in deployment_ASPA_policy:
         asys.policy = ASPAPolicy()
 
+#Draws the ASPA or ASCONES deployment of one trial of a random experiment from its stream rng
+def random_deployment(graph: ASGraph, deployment_objects: int, deployment_policy: int, algorithm: str, rng: np.random.Generator) -> Deployment:
+    n = len(graph.asyss)
+    deployment = Deployment(n)
+    policies = rng.choice(n, round(n / 100 * deployment_policy), replace=False)
+    if algorithm == 'ASPA':
+        deployment.policy[policies] = POLICY_IDS[ASPAPolicy]
+        deployment.aspa[rng.choice(n, round(n / 100 * deployment_objects), replace=False)] = True
+    elif algorithm == 'ASCONES':
+        deployment.policy[policies] = POLICY_IDS[ASCONESPolicy]
+        # ASCONES objects are only created by tier one and two ASes
+        sample = np.flatnonzero(graph.topology.tier != TIER_THREE)
+        deployment.ascones[rng.choice(sample, round(len(sample) / 100 * deployment_objects), replace=False)] = True
+    return deployment
+
+#Deployment of a selective experiment, given by the IDs of the ASes deploying objects and policies
+def selective_deployment(graph: ASGraph, deployment_objects_list: List[AS_ID], deployment_policy_list: List[AS_ID], algorithm: str) -> Deployment:
+    index = graph.topology.index
+    deployment = Deployment(len(graph.asyss))
+    objects = [index[as_id] for as_id in deployment_objects_list]
+    policies = [index[as_id] for as_id in deployment_policy_list]
+    if algorithm == 'ASPA':
+        deployment.policy[policies] = POLICY_IDS[ASPAPolicy]
+        deployment.aspa[objects] = True
+    elif algorithm == 'ASCONES':
+        deployment.policy[policies] = POLICY_IDS[ASCONESPolicy]
+        deployment.ascones[objects] = True
+    return deployment
+
 class FigureRouteLeakExperimentRandom(Experiment):
-    graph: ASGraph
-    deployment: int
+    deployment_objects: int
+    deployment_policy: int
+    algorithm: str
+    seed: np.random.SeedSequence
 
-    def __init__(self, input_queue: mp.Queue, output_queue: mp.Queue, graph: ASGraph, deployment_objects: int, deployment_policy: int, algorithm: str):
-        super().__init__(input_queue, output_queue)
-        self.graph = graph
+    def __init__(self, deployment_objects: int, deployment_policy: int, algorithm: str, seed: Optional[np.random.SeedSequence] = None):
         self.deployment_objects = deployment_objects
         self.deployment_policy = deployment_policy
         self.algorithm = algorithm
+        self.seed = seed if seed is not None else seeding.cell_seed(type(self).__name__, deployment_objects, deployment_policy, algorithm)
 
-    def run_trial(self, trial: Tuple[(AS_ID, AS_ID)]):
-        graph = self.graph
-        deployment_objects = self.deployment_objects
-        deployment_policy = self.deployment_policy
-        algorithm = self.algorithm
+    def run_trial(self, graph: ASGraph, trial: Tuple[AS_ID, AS_ID, int]):
         # Takes the value passed by the function call by "trial" and assigns them to victim and attacker
-        victim_id, attacker_id = trial
-
-        graph.reset_policies() #Reset all AS policies to DefaultPolicy
-        graph.clear_rpki_objects()  # Reset all AS policies to DefaultPolicy
+        victim_id, attacker_id, index = trial
 
         # Takes the desired AS as victim out of the full graph by its ID
         victim = graph.get_asys(victim_id)
         if victim is None:
             warnings.warn(f"No AS with ID {victim_id}")
-            return Fraction(0, 1)
+            return (0, 0)
 
         # Takes AS of attacker out of graph, like did for the victim
         attacker = graph.get_asys(attacker_id)
         if attacker is None:
             warnings.warn(f"No AS with ID {attacker_id}")
-            return Fraction(0, 1)
-
-        if algorithm == 'ASPA':
-            # Set ASPA policies for ASes in the current graph
-            create_ASPA_policies_randomly(graph, deployment_policy)
-            create_ASPA_objects_randomly(graph, deployment_objects)
-        elif algorithm == 'ASCONES':
-            create_ASCONES_policies_randomly(graph, deployment_policy)
-            create_ASCONES_objects_randomly(graph, deployment_objects)
+            return (0, 0)
 
-        attacker.policy = RouteLeakPolicy() #This will change the attackers policy to leak all routes
+        # Every trial draws its own deployment, from its own stream
+        deployment = random_deployment(graph, self.deployment_objects, self.deployment_policy, self.algorithm,
+                                       seeding.trial_rng(self.seed, index))
+        deployment.policy[graph.topology.index[attacker_id]] = POLICY_IDS[RouteLeakPolicy] #This will change the attackers policy to leak all routes
+        graph.apply_deployment(deployment)
 
         # starts to find a new routing table and executes the attack onto it by n hops
         graph.clear_routing_tables()
         graph.find_routes_to(victim)
 
-        result = route_leak_success_rate(graph, attacker, victim)
+        result = route_leak_counts(graph, attacker, victim)
 
         return result
 
 class FigureRouteLeakExperiment(Experiment):
-    graph: ASGraph
-    deployment: int
+    deployment_objects_list: List[AS_ID]
+    deployment_policy_list: List[AS_ID]
+    algorithm: str
 
-    def __init__(self, input_queue: mp.Queue, output_queue: mp.Queue, graph: ASGraph, deployment_objects_list: List, deployment_policy_list: List, algorithm: str):
-        super().__init__(input_queue, output_queue)
-        self.graph = graph
+    def __init__(self, deployment_objects_list: List[AS_ID], deployment_policy_list: List[AS_ID], algorithm: str):
         self.deployment_objects_list = deployment_objects_list
         self.deployment_policy_list = deployment_policy_list
         self.algorithm = algorithm
 
-    def run_trial(self, trial: Tuple[(AS_ID, AS_ID)]):
-        graph = self.graph
-        deployment_objects_list = self.deployment_objects_list
-        deployment_policy_list = self.deployment_policy_list
-        algorithm = self.algorithm
+    #All trials of a cell share the deployment, only the policy of the attacker changes between them
+    def prepare(self, graph: ASGraph) -> None:
+        self.deployment = selective_deployment(graph, self.deployment_objects_list, self.deployment_policy_list, self.algorithm)
+        graph.apply_deployment(self.deployment)
+
+    def run_trial(self, graph: ASGraph, trial: Tuple[(AS_ID, AS_ID)]):
         # Takes the value passed by the function call by "trial" and assigns them to victim and attacker
         victim_id, attacker_id = trial
 
-        graph.reset_policies() #Reset all AS policies to DefaultPolicy
-        graph.clear_rpki_objects()  # Reset all AS policies to DefaultPolicy
-
         # Takes the desired AS as victim out of the full graph by its ID
         victim = graph.get_asys(victim_id)
         if victim is None:
             warnings.warn(f"No AS with ID {victim_id}")
-            return Fraction(0, 1)
+            return (0, 0)
 
         # Takes AS of attacker out of graph, like did for the victim
         attacker = graph.get_asys(attacker_id)
         if attacker is None:
             warnings.warn(f"No AS with ID {attacker_id}")
-            return Fraction(0, 1)
+            return (0, 0)
 
-        if algorithm == 'ASPA':
-            # Set ASPA policies for ASes in the current graph
-            create_ASPA_policies(graph, deployment_policy_list)
-            # Creates ASPA objects for ASes in the current graph
-            create_ASPA_objects(graph, deployment_objects_list)
-        elif algorithm == 'ASCONES':
-            # Set ASPA policies for ASes in the current graph
-            create_ASCONES_policies(graph, deployment_policy_list)
-            # Creates ASPA objects for ASes in the current graph
-            create_ASCONES_objects(graph, deployment_objects_list)
-
-        attacker.policy = RouteLeakPolicy() #This will change the attackers policy to leak all routes
+        deployment = self.deployment.copy()
+        deployment.policy[graph.topology.index[attacker_id]] = POLICY_IDS[RouteLeakPolicy] #This will change the attackers policy to leak all routes
+        graph.apply_deployment(deployment)
         #print("Route Leak AS: ", attacker.as_id)
         #print("Victim AS: ", victim.as_id)
 
@@ -920,110 +1230,88 @@ class FigureRouteLeakExperiment(Experiment):
         graph.find_routes_to(victim)
 #        graph.hijack_n_hops(victim, attacker, n_hops)
 
-        result = route_leak_success_rate(graph, attacker, victim)
+        result = route_leak_counts(graph, attacker, victim)
 
         return result
 
 
 class FigureForgedOriginPrefixHijackExperimentRandom(Experiment):
-    graph: ASGraph
-    deployment: int
+    deployment_objects: int
+    deployment_policy: int
+    algorithm: str
+    seed: np.random.SeedSequence
 
-    def __init__(self, input_queue: mp.Queue, output_queue: mp.Queue, graph: ASGraph, deployment_objects: int, deployment_policy: int, algorithm: str):
-        super().__init__(input_queue, output_queue)
-        self.graph = graph
+    def __init__(self, deployment_objects: int, deployment_policy: int, algorithm: str, seed: Optional[np.random.SeedSequence] = None):
         self.deployment_objects = deployment_objects
         self.deployment_policy = deployment_policy
         self.algorithm = algorithm
+        self.seed = seed if seed is not None else seeding.cell_seed(type(self).__name__, deployment_objects, deployment_policy, algorithm)
 
-    def run_trial(self, trial: Tuple[(AS_ID, AS_ID)]):
-        graph = self.graph
-        deployment_objects = self.deployment_objects
-        deployment_policy = self.deployment_policy
-        algorithm = self.algorithm
+    def run_trial(self, graph: ASGraph, trial: Tuple[AS_ID, AS_ID, int]):
         # Takes the value passed by the function call by "trial" and assigns them to victim and attacker
-        victim_id, attacker_id = trial
-
-        graph.reset_policies() #Reset all AS policies to DefaultPolicy
-        graph.clear_rpki_objects()  # Reset all AS policies to DefaultPolicy
+        victim_id, attacker_id, index = trial
 
         # Takes the desired AS as victim out of the full graph by its ID
         victim = graph.get_asys(victim_id)
         if victim is None:
             warnings.warn(f"No AS with ID {victim_id}")
-            return Fraction(0, 1)
+            return (0, 0)
 
         # Takes AS of attacker out of graph, like did for the victim
         attacker = graph.get_asys(attacker_id)
         if attacker is None:
             warnings.warn(f"No AS with ID {attacker_id}")
-            return Fraction(0, 1)
-
-        if algorithm == 'ASPA':
-            # Set ASPA policies for ASes in the current graph
-            create_ASPA_policies_randomly(graph, deployment_policy)
-            create_ASPA_objects_randomly(graph, deployment_objects)
-        elif algorithm == 'ASCONES':
-            create_ASCONES_policies_randomly(graph, deployment_policy)
-            create_ASCONES_objects_randomly(graph, deployment_objects)
+            return (0, 0)
 
-        attacker.policy = DefaultPolicy() #This will change the attackers policy to default policy in order not to drop her own hijacked route
+        # Every trial draws its own deployment, from its own stream
+        deployment = random_deployment(graph, self.deployment_objects, self.deployment_policy, self.algorithm,
+                                       seeding.trial_rng(self.seed, index))
+        deployment.policy[graph.topology.index[attacker_id]] = POLICY_IDS[DefaultPolicy] #This will change the attackers policy to default policy in order not to drop her own hijacked route
+        graph.apply_deployment(deployment)
 
         # starts to find a new routing table and executes the attack onto it by n hops
         graph.clear_routing_tables()
-        graph.find_routes_to(victim)
+        find_legitimate_routes(graph, victim)
         graph.hijack_n_hops(victim, attacker, 1)
 
-        result = attacker_success_rate(graph, attacker, victim)
+        result = attacker_success_counts(graph, attacker, victim)
 
         return result
 
 class FigureForgedOriginPrefixHijackExperiment(Experiment):
-    graph: ASGraph
-    deployment: int
+    deployment_objects_list: List[AS_ID]
+    deployment_policy_list: List[AS_ID]
+    algorithm: str
 
-    def __init__(self, input_queue: mp.Queue, output_queue: mp.Queue, graph: ASGraph, deployment_objects_list: List, deployment_policy_list: List, algorithm: str):
-        super().__init__(input_queue, output_queue)
-        self.graph = graph
+    def __init__(self, deployment_objects_list: List[AS_ID], deployment_policy_list: List[AS_ID], algorithm: str):
         self.deployment_objects_list = deployment_objects_list
         self.deployment_policy_list = deployment_policy_list
         self.algorithm = algorithm
 
-    def run_trial(self, trial: Tuple[(AS_ID, AS_ID)]):
-        graph = self.graph
-        deployment_objects_list = self.deployment_objects_list
-        deployment_policy_list = self.deployment_policy_list
-        algorithm = self.algorithm
+    #All trials of a cell share the deployment, only the policy of the attacker changes between them
+    def prepare(self, graph: ASGraph) -> None:
+        self.deployment = selective_deployment(graph, self.deployment_objects_list, self.deployment_policy_list, self.algorithm)
+        graph.apply_deployment(self.deployment)
+
+    def run_trial(self, graph: ASGraph, trial: Tuple[(AS_ID, AS_ID)]):
         # Takes the value passed by the function call by "trial" and assigns them to victim and attacker
         victim_id, attacker_id = trial
 
-        graph.reset_policies() #Reset all AS policies to DefaultPolicy
-        graph.clear_rpki_objects()  # Reset all AS policies to DefaultPolicy
-
         # Takes the desired AS as victim out of the full graph by its ID
         victim = graph.get_asys(victim_id)
         if victim is None:
             warnings.warn(f"No AS with ID {victim_id}")
-            return Fraction(0, 1)
+            return (0, 0)
 
         # Takes AS of attacker out of graph, like did for the victim
         attacker = graph.get_asys(attacker_id)
         if attacker is None:
             warnings.warn(f"No AS with ID {attacker_id}")
-            return Fraction(0, 1)
+            return (0, 0)
 
-        if algorithm == 'ASPA':
-            # Set ASPA policies for ASes in the current graph
-            create_ASPA_policies(graph, deployment_policy_list)
-            # Creates ASPA objects for ASes in the current graph
-            create_ASPA_objects(graph, deployment_objects_list)
-        elif algorithm == 'ASCONES':
-            # Set ASPA policies for ASes in the current graph
-            create_ASCONES_policies(graph, deployment_policy_list)
-            # Creates ASPA objects for ASes in the current graph
-            create_ASCONES_objects(graph, deployment_objects_list)
-
-        attacker.policy = DefaultPolicy() #This will change the attackers policy to default policy in order not to drop her own hijacked route
+        deployment = self.deployment.copy()
+        deployment.policy[graph.topology.index[attacker_id]] = POLICY_IDS[DefaultPolicy] #This will change the attackers policy to default policy in order not to drop her own hijacked route
+        graph.apply_deployment(deployment)
         #print("Route Leak AS: ", attacker.as_id)
         #print("Victim AS: ", victim.as_id)
 
@@ -1033,9 +1321,9 @@ class FigureForgedOriginPrefixHijackExperiment(Experiment):
 
         # starts to find a new routing table and executes the attack onto it by n hops
         graph.clear_routing_tables()
-        graph.find_routes_to(victim)
+        find_legitimate_routes(graph, victim)
         graph.hijack_n_hops(victim, attacker, 1)
 
-        result = attacker_success_rate(graph, attacker, victim)
+        result = attacker_success_counts(graph, attacker, victim)
 
-        return result
\ No newline at end of file
+        return result
@@ -21,7 +21,12 @@ from datetime import timedelta
 from bgpsecsim.asys import AS_ID
 import bgpsecsim.as_graph as as_graph
 from bgpsecsim.as_graph import ASGraph
+import bgpsecsim.aggregate as aggregate
 import bgpsecsim.experiments as experiments
+from bgpsecsim.routing_policy import DefaultPolicy
+from bgpsecsim.checkpoint import Checkpoint
+import bgpsecsim.refinement as refinement
+import bgpsecsim.sampling as sampling
 import other.evaluation as eval
 
 def get_attacks():
@@ -71,7 +76,7 @@ def get_current_content_providers() -> List[AS_ID]:
 
 def target_content_provider_trials(nx_graph: nx.Graph, n_trials: int, providers: List[AS_ID]) -> List[Tuple[AS_ID, AS_ID]]:
     content_providers_set = set(providers)
-    asyss_set = set(nx_graph.nodes)
+    asyss_set = set(nx_graph)
     assert content_providers_set <= asyss_set
 
     as_ids: List[AS_ID] = list(asyss_set - content_providers_set)
@@ -79,11 +84,11 @@ def target_content_provider_trials(nx_graph: nx.Graph, n_trials: int, providers:
     return list(itertools.product(providers, attackers))
 
 def uniform_random_trials(nx_graph: nx.Graph, n_trials: int) -> List[Tuple[AS_ID, AS_ID]]:
-    as_ids: List[AS_ID] = list(nx_graph.nodes)
+    as_ids: List[AS_ID] = list(nx_graph)
     return [random_pair(as_ids) for _ in range(n_trials)]
 
 def trials_with_predefined_attackers(nx_graph: nx.Graph, n_trials: int, attacker: List[AS_ID]) -> List[Tuple[AS_ID, AS_ID]]:
-    as_ids: List[AS_ID] = list(nx_graph.nodes)
+    as_ids: List[AS_ID] = list(nx_graph)
     pairs = [random_pair(as_ids) for _ in range(n_trials)]
     new_pairs = []
     index = 0
@@ -101,12 +106,12 @@ def get_route_leak_trial(graph: ASGraph) -> Tuple[AS_ID, AS_ID]:
 
 #might be obsolete
 def route_leak_trials(nx_graph: nx.Graph, n_trials: int) -> List[Tuple[AS_ID, AS_ID]]:
-    graph = ASGraph(nx_graph) #Create ASGraph to check for neighbor relationships
+    graph = experiments.get_graph(nx_graph, DefaultPolicy())  # Check for neighbor relationships on the shared graph
     return [get_route_leak_trial(graph) for _ in range(n_trials)]
 
 # This function returns a list without any repetition
 def find_asyss_without_repetition(nx_graph: nx.Graph, tier: int, n: int) -> List[AS_ID]:
-    graph = ASGraph(nx_graph)  # Create ASGraph to check for neighbor relationships
+    graph = experiments.get_graph(nx_graph, DefaultPolicy())  # Check for neighbor relationships on the shared graph
     if tier == 1:
         return random.sample(graph.tierOne, n)
     elif tier == 2:
@@ -117,7 +122,7 @@ def find_asyss_without_repetition(nx_graph: nx.Graph, tier: int, n: int) -> List
 
 # This function returns a list with a possibly repeated list of entries
 def find_asyss_with_repetition(nx_graph: nx.Graph, tier: int, n: int) -> List[AS_ID]:
-    graph = ASGraph(nx_graph)  # Create ASGraph to check for neighbor relationships
+    graph = experiments.get_graph(nx_graph, DefaultPolicy())  # Check for neighbor relationships on the shared graph
     if tier == 1:
         return [random.choice(graph.tierOne) for _ in range(n)]
     elif tier == 2:
@@ -239,7 +244,7 @@ def figure7a(filename: str, nx_graph: nx.Graph, n_trials: int):
     attacks = get_attacks()
 
     for (label, filepath, as_rel_file) in attacks:
-        nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+        nx_graph = as_graph.load_topology(as_rel_file)
         print("Loaded graph for ", label)
 
         with open(filepath) as f:
@@ -278,7 +283,7 @@ def figure7b(filename: str, nx_graph: nx.Graph, n_trials: int):
     attacks = get_attacks()
 
     for (label, filepath, as_rel_file) in attacks:
-        nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+        nx_graph = as_graph.load_topology(as_rel_file)
         print("Loaded graph for ", label)
 
         with open(filepath) as f:
@@ -317,7 +322,7 @@ def figure7c(filename: str, nx_graph: nx.Graph, n_trials: int):
     attacks = get_attacks()
 
     for (label, filepath, as_rel_file) in attacks:
-        nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+        nx_graph = as_graph.load_topology(as_rel_file)
         print("Loaded graph for ", label)
 
         with open(filepath) as f:
@@ -356,7 +361,7 @@ def figure7d(filename: str, nx_graph: nx.Graph, n_trials: int):
     attacks = get_attacks()
 
     for (label, filepath, as_rel_file) in attacks:
-        nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+        nx_graph = as_graph.load_topology(as_rel_file)
         print("Loaded graph for ", label)
 
         with open(filepath) as f:
@@ -579,7 +584,8 @@ def figure10_20(filename: str, nx_graph: nx.Graph, n_trials: int):
 def figure11(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
     #trials = route_leak_trials(nx_graph, n_trials)
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials), CI_COLUMNS, n_trials)
+    trials = checkpoint.trials
     #attacker_sample = find_asyss_with_repetition(nx_graph, 3, n_trials)
     #print('Attackers: ', attacker_sample)
     #trials = trials_with_predefined_attackers(nx_graph, n_trials, attacker_sample)
@@ -587,15 +593,20 @@ def figure11(filename: str, nx_graph: nx.Graph, n_trials:int):
 
     ASPA_object_deployment = np.arange(0, 101, 1)
     ASPA_policy_deployment = np.arange(0, 101, 1)
-    ASPA_results = np.zeros((101, 101))
+    ASPA_results = checkpoint.results
 
     #Fill numpy array with results
     for ASPA_objects_index in ASPA_object_deployment:
         for ASPA_policy_index in ASPA_policy_deployment:
-            ASPA_results[ASPA_objects_index][ASPA_policy_index] = fmean(experiments.figure11_random_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, trials))
-            print('Object deployment: ' + str(ASPA_objects_index) + '%; Policy Deployment: ' + str(ASPA_policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', ASPA_results[ASPA_objects_index][ASPA_policy_index])
+            if checkpoint.is_done(ASPA_objects_index, ASPA_policy_index):
+                continue
+            estimate = estimate_cell(checkpoint, (ASPA_objects_index, ASPA_policy_index), lambda cell_trials, first_trial: experiments.figure11_random_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, cell_trials, first_trial), trials)
+            print('Object deployment: ' + str(ASPA_objects_index) + '%; Policy Deployment: ' + str(ASPA_policy_index) + '%; Averaged attacker success rate over ' + str(estimate.n_trials) + ' trial runs: ', estimate.mean, '+-', estimate.half_width)
+            checkpoint.mark_done(ASPA_objects_index, ASPA_policy_index)
 
     # Save results for later processing:
+    ASPA_results = checkpoint.finish()
+    save_ci(filename, checkpoint)
     np.save(filename, ASPA_results) #Save numpy array for later use
     #ASPA_results = np.load(filename + '.npy') # Load numpy array
 
@@ -622,20 +633,26 @@ def figure11(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure12(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials), CI_COLUMNS, n_trials)
+    trials = checkpoint.trials
 
     ASPA_object_deployment = np.arange(0, 101, 1)
     ASPA_policy_deployment = np.arange(0, 101, 1)
-    ASPA_results = np.zeros((101, 101))
+    ASPA_results = checkpoint.results
 
     #Fill numpy array with results
     for ASPA_objects_index in ASPA_object_deployment:
         for ASPA_policy_index in ASPA_policy_deployment:
-            ASPA_results[ASPA_objects_index][ASPA_policy_index] = fmean(experiments.figure12_selective_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, trials))
-            print('Object deployment: ' + str(ASPA_objects_index) + '%; Policy Deployment: ' + str(ASPA_policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', ASPA_results[ASPA_objects_index][ASPA_policy_index])
+            if checkpoint.is_done(ASPA_objects_index, ASPA_policy_index):
+                continue
+            estimate = estimate_cell(checkpoint, (ASPA_objects_index, ASPA_policy_index), lambda cell_trials, first_trial: experiments.figure12_selective_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, cell_trials), trials)
+            print('Object deployment: ' + str(ASPA_objects_index) + '%; Policy Deployment: ' + str(ASPA_policy_index) + '%; Averaged attacker success rate over ' + str(estimate.n_trials) + ' trial runs: ', estimate.mean, '+-', estimate.half_width)
+            checkpoint.mark_done(ASPA_objects_index, ASPA_policy_index)
 
     #print(ASPA_results)
 
+    ASPA_results = checkpoint.finish()
+    save_ci(filename, checkpoint)
     np.save(filename, ASPA_results) #Save numpy array for later use
 
     indices = np.arange(0, 101, 1)
@@ -672,35 +689,46 @@ def figure13(filename: str, nx_graph: nx.Graph, n_trials:int):
     # 10000 trials: 242 sec
     # Total time: roughly 4 days
 
+    checkpoint = Checkpoint(filename, (4, 1000))
+    overall_results = checkpoint.results
+
     print('Started trials with 10')
-    results_10 = []
     for i in range(1000):
+        if checkpoint.is_done(0, i):
+            continue
         print('10 trials, Run: ', i)
         trials = uniform_random_trials(nx_graph, 10)
-        results_10.append(fmean(experiments.figure12_selective_aspa_deployment(nx_graph, 0, 0, trials)))
+        overall_results[0][i] = aggregate.mean_rate(experiments.figure12_selective_aspa_deployment(nx_graph, 0, 0, trials))
+        checkpoint.mark_done(0, i)
 
     print('Started trials with 100')
-    results_100 = []
     for i in range(1000):
+        if checkpoint.is_done(1, i):
+            continue
         print('100 trials, Run: ', i)
         trials = uniform_random_trials(nx_graph, 100)
-        results_100.append(fmean(experiments.figure12_selective_aspa_deployment(nx_graph, 0, 0, trials)))
+        overall_results[1][i] = aggregate.mean_rate(experiments.figure12_selective_aspa_deployment(nx_graph, 0, 0, trials))
+        checkpoint.mark_done(1, i)
 
     print('Started trials with 1.000')
-    results_1000 = []
     for i in range(1000):
+        if checkpoint.is_done(2, i):
+            continue
         print('1.000 trials, Run: ', i)
         trials = uniform_random_trials(nx_graph, 1000)
-        results_1000.append(fmean(experiments.figure12_selective_aspa_deployment(nx_graph, 0, 0, trials)))
+        overall_results[2][i] = aggregate.mean_rate(experiments.figure12_selective_aspa_deployment(nx_graph, 0, 0, trials))
+        checkpoint.mark_done(2, i)
         
     print('Started trials with 10.000')
-    results_10000 = []
     for i in range(1000):
+        if checkpoint.is_done(3, i):
+            continue
         print('10.000 trials, Run: ', i)
         trials = uniform_random_trials(nx_graph, 10000)
-        results_10000.append(fmean(experiments.figure12_selective_aspa_deployment(nx_graph, 0, 0, trials)))
+        overall_results[3][i] = aggregate.mean_rate(experiments.figure12_selective_aspa_deployment(nx_graph, 0, 0, trials))
+        checkpoint.mark_done(3, i)
 
-    overall_results = np.array([results_10, results_100, results_1000, results_10000])
+    overall_results = checkpoint.finish()
 
     np.save(filename, overall_results) #Save numpy array for later use
     #data = np.load(filename + '.npy') # Load numpy array
@@ -785,20 +813,25 @@ def figure13(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure14(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials))
+    trials = checkpoint.trials
 
     ASPA_object_deployment = np.arange(0, 101, 1)
     ASPA_policy_deployment = np.arange(0, 101, 1)
-    ASPA_results = np.zeros((101, 101))
+    ASPA_results = checkpoint.results
 
     #Fill numpy array with results
     for ASPA_objects_index in ASPA_object_deployment:
         for ASPA_policy_index in ASPA_policy_deployment:
-            ASPA_results[ASPA_objects_index][ASPA_policy_index] = fmean(experiments.figure14_selective_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, trials))
+            if checkpoint.is_done(ASPA_objects_index, ASPA_policy_index):
+                continue
+            ASPA_results[ASPA_objects_index][ASPA_policy_index] = aggregate.mean_rate(experiments.figure14_selective_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, trials))
             print('Object deployment: ' + str(ASPA_objects_index) + '%; Policy Deployment: ' + str(ASPA_policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', ASPA_results[ASPA_objects_index][ASPA_policy_index])
+            checkpoint.mark_done(ASPA_objects_index, ASPA_policy_index)
 
     #print(ASPA_results)
 
+    ASPA_results = checkpoint.finish()
     np.save(filename, ASPA_results) #Save numpy array for later use
     #data = np.load(filename + '.npy') # Load numpy array
 
@@ -825,24 +858,29 @@ def figure14(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure15(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials))
+    trials = checkpoint.trials
 
     ASPA_object_deployment = np.round(np.arange(0, 20.1, 0.2), decimals=1) #Adjusted to 0- 20 % deployment!
     ASPA_policy_deployment = np.round(np.arange(0, 20.1, 0.2), decimals=1) #Adjusted to 0- 20 % deployment!
     ASPA_object_deployment_positions = np.arange(0, 101, 1) #Needed for indexing
     ASPA_policy_deployment_positions = np.arange(0, 101, 1) #Needed for indexing
-    ASPA_results = np.zeros((101, 101))
+    ASPA_results = checkpoint.results
 
     #Fill numpy array with results
     for ASPA_objects_deployment_position in ASPA_object_deployment_positions:
         ASPA_objects_index = ASPA_object_deployment[ASPA_objects_deployment_position]
         for ASPA_policy_deployment_position in ASPA_policy_deployment_positions:
             ASPA_policy_index = ASPA_policy_deployment[ASPA_policy_deployment_position]
-            ASPA_results[ASPA_objects_deployment_position][ASPA_policy_deployment_position] = fmean(experiments.figure12_selective_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, trials))
+            if checkpoint.is_done(ASPA_objects_deployment_position, ASPA_policy_deployment_position):
+                continue
+            ASPA_results[ASPA_objects_deployment_position][ASPA_policy_deployment_position] = aggregate.mean_rate(experiments.figure12_selective_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, trials))
             print('Object deployment: ' + str(ASPA_objects_index) + '%; Policy Deployment: ' + str(ASPA_policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', ASPA_results[ASPA_objects_deployment_position][ASPA_policy_deployment_position])
+            checkpoint.mark_done(ASPA_objects_deployment_position, ASPA_policy_deployment_position)
 
     #print(ASPA_results)
 
+    ASPA_results = checkpoint.finish()
     np.save(filename, ASPA_results) #Save numpy array for later use
     #data = np.load(filename + '.npy') # Load numpy array
 
@@ -870,24 +908,29 @@ def figure15(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure16(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials))
+    trials = checkpoint.trials
 
     ASPA_object_deployment = np.round(np.arange(0, 30.1, 0.3), decimals=1) #Adjusted to 0- 30 % deployment!
     ASPA_policy_deployment = np.round(np.arange(0, 30.1, 0.3), decimals=1) #Adjusted to 0- 30 % deployment!
     ASPA_object_deployment_positions = np.arange(0, 101, 1) #Needed for indexing
     ASPA_policy_deployment_positions = np.arange(0, 101, 1) #Needed for indexing
-    ASPA_results = np.zeros((101, 101))
+    ASPA_results = checkpoint.results
 
     #Fill numpy array with results
     for ASPA_objects_deployment_position in ASPA_object_deployment_positions:
         ASPA_objects_index = ASPA_object_deployment[ASPA_objects_deployment_position]
         for ASPA_policy_deployment_position in ASPA_policy_deployment_positions:
             ASPA_policy_index = ASPA_policy_deployment[ASPA_policy_deployment_position]
-            ASPA_results[ASPA_objects_deployment_position][ASPA_policy_deployment_position] = fmean(experiments.figure12_selective_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, trials))
+            if checkpoint.is_done(ASPA_objects_deployment_position, ASPA_policy_deployment_position):
+                continue
+            ASPA_results[ASPA_objects_deployment_position][ASPA_policy_deployment_position] = aggregate.mean_rate(experiments.figure12_selective_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, trials))
             print('Object deployment: ' + str(ASPA_objects_index) + '%; Policy Deployment: ' + str(ASPA_policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', ASPA_results[ASPA_objects_deployment_position][ASPA_policy_deployment_position])
+            checkpoint.mark_done(ASPA_objects_deployment_position, ASPA_policy_deployment_position)
 
     #print(ASPA_results)
 
+    ASPA_results = checkpoint.finish()
     np.save(filename, ASPA_results) #Save numpy array for later use
     #data = np.load(filename + '.npy') # Load numpy array
 
@@ -916,24 +959,29 @@ def figure16(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure17(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials))
+    trials = checkpoint.trials
 
     ASPA_object_deployment = np.round(np.arange(95, 100.05, 0.05), decimals=2) #Adjusted to 95 - 100 % deployment!
     ASPA_policy_deployment = np.round(np.arange(0, 101, 1), decimals=1) #Adjusted to 0- 20 % deployment!
     ASPA_object_deployment_positions = np.arange(0, 101, 1) #Needed for indexing
     ASPA_policy_deployment_positions = np.arange(0, 101, 1) #Needed for indexing
-    ASPA_results = np.zeros((101, 101))
+    ASPA_results = checkpoint.results
 
     #Fill numpy array with results
     for ASPA_objects_deployment_position in ASPA_object_deployment_positions:
         ASPA_objects_index = ASPA_object_deployment[ASPA_objects_deployment_position]
         for ASPA_policy_deployment_position in ASPA_policy_deployment_positions:
             ASPA_policy_index = ASPA_policy_deployment[ASPA_policy_deployment_position]
-            ASPA_results[ASPA_objects_deployment_position][ASPA_policy_deployment_position] = fmean(experiments.figure14_selective_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, trials))
+            if checkpoint.is_done(ASPA_objects_deployment_position, ASPA_policy_deployment_position):
+                continue
+            ASPA_results[ASPA_objects_deployment_position][ASPA_policy_deployment_position] = aggregate.mean_rate(experiments.figure14_selective_aspa_deployment(nx_graph, ASPA_objects_index, ASPA_policy_index, trials))
             print('Object deployment: ' + str(ASPA_objects_index) + '%; Policy Deployment: ' + str(ASPA_policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', ASPA_results[ASPA_objects_deployment_position][ASPA_policy_deployment_position])
+            checkpoint.mark_done(ASPA_objects_deployment_position, ASPA_policy_deployment_position)
 
     #print(ASPA_results)
 
+    ASPA_results = checkpoint.finish()
     np.save(filename, ASPA_results) #Save numpy array for later use
     #data = np.load(filename + '.npy') # Load numpy array
 
@@ -957,11 +1005,61 @@ def figure17(filename: str, nx_graph: nx.Graph, n_trials:int):
 
     print(timedelta(seconds=end-start))
 
+# Adaptive version of the object/policy heatmaps: instead of zooming into the interesting regions by hand (figure15-17),
+# a coarse 10% grid is refined where neighboring results differ (see refinement.AdaptiveSweep).
+# Saves the evaluated points as filename_points.npy and the interpolated grid as filename.npy.
+def adaptive_heatmap(filename: str, nx_graph: nx.Graph, n_trials: int, experiment, xlabel: str, ylabel: str):
+    start = timer()
+
+    trials = uniform_random_trials(nx_graph, n_trials)
+
+    def evaluate(objects: float, policy: float) -> float:
+        estimate = sampling.sequential_estimate(lambda cell_trials, first_trial: experiment(nx_graph, objects, policy, cell_trials), trials)
+        print('Object deployment: ' + str(objects) + '%; Policy Deployment: ' + str(policy) + '%; Averaged attacker success rate over ' + str(estimate.n_trials) + ' trial runs: ', estimate.mean)
+        return estimate.mean
+
+    # Deployments less than one AS apart are the same, they are not refined
+    sweep = refinement.AdaptiveSweep(evaluate, min_step=refinement.min_step_for(len(nx_graph)))
+    sweep.run()
+    print('Evaluated ' + str(len(sweep.results)) + ' deployments')
+
+    points = sweep.points()
+    axis, results = sweep.dense_grid()
+    np.save(filename + '_points', points)
+    np.save(filename, results) #Save numpy array for later use
+
+    cmap = matplotlib.colors.LinearSegmentedColormap.from_list("", ["green", "yellow", "red"])
+    norm = matplotlib.colors.Normalize(vmin=0)
+
+    plt.figure(figsize=(10, 8))
+    plt.pcolormesh(axis, axis, results, cmap=cmap, norm=norm, shading='nearest')
+    plt.colorbar();  # show color scale
+    plt.scatter(points[:, 1], points[:, 0], c='black', s=0.5) # Evaluated deployments
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+
+    plt.savefig(filename + '.svg', format="svg")
+
+    end = timer()
+
+    print(timedelta(seconds=end-start))
+
+# ASPA Selection Strategy: top-to-bottom object creation, top-to-bottom policy assignment (adaptive figure12, figure15, figure16)
+def figure12_adaptive(filename: str, nx_graph: nx.Graph, n_trials:int):
+    adaptive_heatmap(filename, nx_graph, n_trials, experiments.figure12_selective_aspa_deployment,
+                     "ASPA policy deployment \n (Top-to-bottom selection)", "ASPA object deployment \n (Top-to-bottom selection)")
+
+# ASPA Selection Strategy: bottom-to-top object creation, top-to-bottom policy assignment (adaptive figure14, figure17)
+def figure14_adaptive(filename: str, nx_graph: nx.Graph, n_trials:int):
+    adaptive_heatmap(filename, nx_graph, n_trials, experiments.figure14_selective_aspa_deployment,
+                     "ASPA policy deployment \n (Top-to-bottom selection)", "ASPA object deployment \n (Bottom-to-top selection)")
+
 # ASCones Selection Strategy: Random object creation, random policy assignment
 def figure30(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
     #trials = route_leak_trials(nx_graph, n_trials)
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials))
+    trials = checkpoint.trials
     #attacker_sample = find_asyss_with_repetition(nx_graph, 3, n_trials)
     #print('Attackers: ', attacker_sample)
     #trials = trials_with_predefined_attackers(nx_graph, n_trials, attacker_sample)
@@ -969,15 +1067,19 @@ def figure30(filename: str, nx_graph: nx.Graph, n_trials:int):
 
     object_deployment = np.arange(0, 101, 1)
     policy_deployment = np.arange(0, 101, 1)
-    results = np.zeros((101, 101))
+    results = checkpoint.results
 
     #Fill numpy array with results
     for objects_index in object_deployment:
         for policy_index in policy_deployment:
-            results[objects_index][policy_index] = fmean(experiments.figure30_random_ascones_deployment(nx_graph, objects_index, policy_index, trials))
+            if checkpoint.is_done(objects_index, policy_index):
+                continue
+            results[objects_index][policy_index] = aggregate.mean_rate(experiments.figure30_random_ascones_deployment(nx_graph, objects_index, policy_index, trials))
             print('Object deployment: ' + str(objects_index) + '%; Policy Deployment: ' + str(policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', results[objects_index][policy_index])
+            checkpoint.mark_done(objects_index, policy_index)
 
     # Save results for later processing:
+    results = checkpoint.finish()
     np.save(filename, results) #Save numpy array for later use
     #ASPA_results = np.load(filename + '.npy') # Load numpy array
 
@@ -1004,19 +1106,24 @@ def figure30(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure31(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials))
+    trials = checkpoint.trials
 
     object_deployment = np.arange(0, 101, 1)
     policy_deployment = np.arange(0, 101, 1)
-    results = np.zeros((101, 101))
+    results = checkpoint.results
 
     #Fill numpy array with results
     for objects_index in object_deployment:
         for policy_index in policy_deployment:
-            results[objects_index][policy_index] = fmean(experiments.figure31_selective_ascones_deployment(nx_graph, objects_index, policy_index, trials))
+            if checkpoint.is_done(objects_index, policy_index):
+                continue
+            results[objects_index][policy_index] = aggregate.mean_rate(experiments.figure31_selective_ascones_deployment(nx_graph, objects_index, policy_index, trials))
             print('Object deployment: ' + str(objects_index) + '%; Policy Deployment: ' + str(policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', results[objects_index][policy_index])
+            checkpoint.mark_done(objects_index, policy_index)
 
     # Save results for later processing:
+    results = checkpoint.finish()
     np.save(filename, results) #Save numpy array for later use
     #ASPA_results = np.load(filename + '.npy') # Load numpy array
 
@@ -1044,19 +1151,24 @@ def figure31(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure32(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials))
+    trials = checkpoint.trials
 
     object_deployment = np.arange(0, 101, 1)
     policy_deployment = np.arange(0, 101, 1)
-    results = np.zeros((101, 101))
+    results = checkpoint.results
 
     #Fill numpy array with results
     for objects_index in object_deployment:
         for policy_index in policy_deployment:
-            results[objects_index][policy_index] = fmean(experiments.figure32_selective_ascones_deployment(nx_graph, objects_index, policy_index, trials))
+            if checkpoint.is_done(objects_index, policy_index):
+                continue
+            results[objects_index][policy_index] = aggregate.mean_rate(experiments.figure32_selective_ascones_deployment(nx_graph, objects_index, policy_index, trials))
             print('Object deployment: ' + str(objects_index) + '%; Policy Deployment: ' + str(policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', results[objects_index][policy_index])
+            checkpoint.mark_done(objects_index, policy_index)
 
     # Save results for later processing:
+    results = checkpoint.finish()
     np.save(filename, results) #Save numpy array for later use
     #ASPA_results = np.load(filename + '.npy') # Load numpy array
 
@@ -1084,19 +1196,25 @@ def figure32(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure40(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials), CI_COLUMNS, n_trials)
+    trials = checkpoint.trials
 
     object_deployment = np.arange(0, 101, 1)
     policy_deployment = np.arange(0, 101, 1)
-    results = np.zeros((101, 101))
+    results = checkpoint.results
 
     #Fill numpy array with results
     for objects_index in object_deployment:
         for policy_index in policy_deployment:
-            results[objects_index][policy_index] = fmean(experiments.figure40_random_aspa_deployment(nx_graph, objects_index, policy_index, trials))
-            print('Object deployment: ' + str(objects_index) + '%; Policy Deployment: ' + str(policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', results[objects_index][policy_index])
+            if checkpoint.is_done(objects_index, policy_index):
+                continue
+            estimate = estimate_cell(checkpoint, (objects_index, policy_index), lambda cell_trials, first_trial: experiments.figure40_random_aspa_deployment(nx_graph, objects_index, policy_index, cell_trials, first_trial), trials)
+            print('Object deployment: ' + str(objects_index) + '%; Policy Deployment: ' + str(policy_index) + '%; Averaged attacker success rate over ' + str(estimate.n_trials) + ' trial runs: ', estimate.mean, '+-', estimate.half_width)
+            checkpoint.mark_done(objects_index, policy_index)
 
     # Save results for later processing:
+    results = checkpoint.finish()
+    save_ci(filename, checkpoint)
     np.save(filename, results) #Save numpy array for later use
     #ASPA_results = np.load(filename + '.npy') # Load numpy array
 
@@ -1163,36 +1281,46 @@ def figure40(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure41(filename: str, nx_graph: nx.Graph, n_trials: int):
     start = timer()
 
+    checkpoint = Checkpoint(filename, (4, 1000))
+    overall_results = checkpoint.results
+
     print('Started trials with 10')
-    results_10 = []
     for i in range(1000):
+        if checkpoint.is_done(0, i):
+            continue
         print('10 trials, Run: ', i)
         trials = uniform_random_trials(nx_graph, 10)
-        results_10.append(fmean(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials)))
+        overall_results[0][i] = aggregate.mean_rate(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials))
+        checkpoint.mark_done(0, i)
 
     print('Started trials with 100')
-    results_100 = []
     for i in range(1000):
+        if checkpoint.is_done(1, i):
+            continue
         print('100 trials, Run: ', i)
         trials = uniform_random_trials(nx_graph, 100)
-        results_100.append(fmean(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials)))
+        overall_results[1][i] = aggregate.mean_rate(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials))
+        checkpoint.mark_done(1, i)
 
     print('Started trials with 1.000')
-    results_1000 = []
     for i in range(1000):
+        if checkpoint.is_done(2, i):
+            continue
         print('1.000 trials, Run: ', i)
         trials = uniform_random_trials(nx_graph, 1000)
-        results_1000.append(fmean(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials)))
+        overall_results[2][i] = aggregate.mean_rate(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials))
+        checkpoint.mark_done(2, i)
 
     print('Started trials with 10.000')
-    results_10000 = []
     for i in range(1000):
+        if checkpoint.is_done(3, i):
+            continue
         print('10.000 trials, Run: ', i)
         trials = uniform_random_trials(nx_graph, 10000)
-        results_10000.append(fmean(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials)))
+        overall_results[3][i] = aggregate.mean_rate(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials))
+        checkpoint.mark_done(3, i)
 
-    #overall_results = np.array([results_10, results_100, results_1000, results_10000])
-    overall_results = np.array([results_10, results_100, results_1000, results_10000])
+    overall_results = checkpoint.finish()
 
     np.save(filename, overall_results)  # Save numpy array for later use
     # data = np.load(filename + '.npy') # Load numpy array
@@ -1201,20 +1329,25 @@ def figure41(filename: str, nx_graph: nx.Graph, n_trials: int):
 def figure42(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials))
+    trials = checkpoint.trials
     #print(trials)
 
     object_deployment = np.arange(0, 101, 1)
     policy_deployment = np.arange(0, 101, 1)
-    results = np.zeros((101, 101))
+    results = checkpoint.results
 
     #Fill numpy array with results
     for objects_index in object_deployment:
         for policy_index in policy_deployment:
-            results[objects_index][policy_index] = fmean(experiments.figure42_selective_aspa_deployment(nx_graph, objects_index, policy_index, trials))
+            if checkpoint.is_done(objects_index, policy_index):
+                continue
+            results[objects_index][policy_index] = aggregate.mean_rate(experiments.figure42_selective_aspa_deployment(nx_graph, objects_index, policy_index, trials))
             print('Object deployment: ' + str(objects_index) + '%; Policy Deployment: ' + str(policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', results[objects_index][policy_index])
+            checkpoint.mark_done(objects_index, policy_index)
 
     # Save results for later processing:
+    results = checkpoint.finish()
     np.save(filename, results) #Save numpy array for later use
     #ASPA_results = np.load(filename + '.npy') # Load numpy array
 
@@ -1280,19 +1413,24 @@ def figure42(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure43(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials))
+    trials = checkpoint.trials
 
     object_deployment = np.arange(0, 101, 1)
     policy_deployment = np.arange(0, 101, 1)
-    results = np.zeros((101, 101))
+    results = checkpoint.results
 
     #Fill numpy array with results
     for objects_index in object_deployment:
         for policy_index in policy_deployment:
-            results[objects_index][policy_index] = fmean(experiments.figure43_selective_aspa_deployment(nx_graph, objects_index, policy_index, trials))
+            if checkpoint.is_done(objects_index, policy_index):
+                continue
+            results[objects_index][policy_index] = aggregate.mean_rate(experiments.figure43_selective_aspa_deployment(nx_graph, objects_index, policy_index, trials))
             print('Object deployment: ' + str(objects_index) + '%; Policy Deployment: ' + str(policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', results[objects_index][policy_index])
+            checkpoint.mark_done(objects_index, policy_index)
 
     # Save results for later processing:
+    results = checkpoint.finish()
     np.save(filename, results) #Save numpy array for later use
     #ASPA_results = np.load(filename + '.npy') # Load numpy array
 
@@ -1359,20 +1497,25 @@ def figure43(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure44(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials))
+    trials = checkpoint.trials
     #print(trials)
 
     object_deployment = np.arange(0, 101, 1)
     policy_deployment = np.arange(0, 101, 1)
-    results = np.zeros((101, 101))
+    results = checkpoint.results
 
     #Fill numpy array with results
     for objects_index in object_deployment:
         for policy_index in policy_deployment:
-            results[objects_index][policy_index] = fmean(experiments.figure44_selective_aspa_deployment(nx_graph, objects_index, policy_index, trials))
+            if checkpoint.is_done(objects_index, policy_index):
+                continue
+            results[objects_index][policy_index] = aggregate.mean_rate(experiments.figure44_selective_aspa_deployment(nx_graph, objects_index, policy_index, trials))
             print('Object deployment: ' + str(objects_index) + '%; Policy Deployment: ' + str(policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', results[objects_index][policy_index])
+            checkpoint.mark_done(objects_index, policy_index)
 
     # Save results for later processing:
+    results = checkpoint.finish()
     np.save(filename, results) #Save numpy array for later use
 
     end = timer()
@@ -1382,20 +1525,25 @@ def figure44(filename: str, nx_graph: nx.Graph, n_trials:int):
 def figure45(filename: str, nx_graph: nx.Graph, n_trials:int):
     start = timer()
 
-    trials = uniform_random_trials(nx_graph, n_trials)
+    checkpoint = Checkpoint(filename, (101, 101), lambda: uniform_random_trials(nx_graph, n_trials))
+    trials = checkpoint.trials
     #print(trials)
 
     object_deployment = np.arange(0, 101, 1)
     policy_deployment = np.arange(0, 101, 1)
-    results = np.zeros((101, 101))
+    results = checkpoint.results
 
     #Fill numpy array with results
     for objects_index in object_deployment:
         for policy_index in policy_deployment:
-            results[objects_index][policy_index] = fmean(experiments.figure45_selective_aspa_deployment(nx_graph, objects_index, policy_index, trials))
+            if checkpoint.is_done(objects_index, policy_index):
+                continue
+            results[objects_index][policy_index] = aggregate.mean_rate(experiments.figure45_selective_aspa_deployment(nx_graph, objects_index, policy_index, trials))
             print('Object deployment: ' + str(objects_index) + '%; Policy Deployment: ' + str(policy_index) + '%; Averaged attacker success rate over ' + str(n_trials) + ' trial runs: ', results[objects_index][policy_index])
+            checkpoint.mark_done(objects_index, policy_index)
 
     # Save results for later processing:
+    results = checkpoint.finish()
     np.save(filename, results) #Save numpy array for later use
 
     end = timer()
@@ -1412,9 +1560,9 @@ def find_seed_routeleak(filename: str, nx_graph: nx.Graph, n_trials:int):
         trials100 = uniform_random_trials(nx_graph, 100)
         random.seed(seed)
         trials1000 = uniform_random_trials(nx_graph, 1000)
-        result10 = fmean(experiments.figure11_random_aspa_deployment(nx_graph, 0, 0, trials10))
-        result100 = fmean(experiments.figure11_random_aspa_deployment(nx_graph, 0, 0, trials100))
-        result1000 = fmean(experiments.figure11_random_aspa_deployment(nx_graph, 0, 0, trials1000))
+        result10 = aggregate.mean_rate(experiments.figure11_random_aspa_deployment(nx_graph, 0, 0, trials10))
+        result100 = aggregate.mean_rate(experiments.figure11_random_aspa_deployment(nx_graph, 0, 0, trials100))
+        result1000 = aggregate.mean_rate(experiments.figure11_random_aspa_deployment(nx_graph, 0, 0, trials1000))
         print("Seed: " + str(seed) + " and the follwing % of AS Graph had leaked route in their RIB: ")
         print('10 Trials: ', result10)
         print('100 Trials: ', result100)
@@ -1443,9 +1591,9 @@ def find_seed_hijacking(filename: str, nx_graph: nx.Graph, n_trials:int):
         trials100 = uniform_random_trials(nx_graph, 100)
         random.seed(seed)
         trials1000 = uniform_random_trials(nx_graph, 1000)
-        result10 = fmean(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials10))
-        result100 = fmean(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials100))
-        result1000 = fmean(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials1000))
+        result10 = aggregate.mean_rate(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials10))
+        result100 = aggregate.mean_rate(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials100))
+        result1000 = aggregate.mean_rate(experiments.figure40_random_aspa_deployment(nx_graph, 0, 0, trials1000))
         print("Seed: " + str(seed) + " and the follwing % of AS Graph had leaked route in their RIB: ")
         print('10 Trials: ', result10)
         print('100 Trials: ', result100)
@@ -1457,6 +1605,32 @@ def fmean(vals: Sequence[Fraction]) -> float:
     return float(statistics.mean(vals))
 
 
+# Checkpoint columns of sweeps reporting the precision of every cell
+CI_COLUMNS = ('half_width', 'n_trials')
+
+# Figures running the trials of every cell until the target precision of sampling is reached; the
+# others always run all trials, so generate rejects a target precision for them
+SEQUENTIAL_FIGURES = ('figure11', 'figure12', 'figure40', 'figure12_adaptive', 'figure14_adaptive')
+
+# Runs the trials of a cell until the target precision of sampling is reached
+def estimate_cell(checkpoint: Checkpoint, index: Tuple[int, int], run, trials: List[Tuple[AS_ID, AS_ID]]) -> sampling.Estimate:
+    counts = sampling.sequential_counts(run, trials)
+    estimate = sampling.estimate_of(counts)
+    checkpoint.results[index] = estimate.mean
+    checkpoint.arrays['half_width'][index] = estimate.half_width
+    checkpoint.arrays['n_trials'][index] = estimate.n_trials
+    if 'counts' in checkpoint.arrays:
+        checkpoint.arrays['counts'][index][:len(counts)] = counts
+    return estimate
+
+# Saves the confidence interval half-widths and trial counts of a finished sweep next to its results,
+# and the (bad, total) counts of every trial if the checkpoint kept them
+def save_ci(filename: str, checkpoint: Checkpoint):
+    np.save(filename + '_ci', np.stack([checkpoint.arrays[column] for column in CI_COLUMNS]))
+    if 'counts' in checkpoint.arrays:
+        np.save(filename + '_trials', checkpoint.arrays['counts'])
+
+
 def random_pair(as_ids: List[AS_ID]) -> Tuple[AS_ID, AS_ID]:
     [asn1, asn2] = random.sample(as_ids, 2)
     return (asn1, asn2)
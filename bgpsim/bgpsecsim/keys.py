@@ -0,0 +1,23 @@
+import hashlib
+import numbers
+from typing import Any
+
+
+def file_digest(filename: str) -> str:
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize(value: Any) -> Any:
+    """value made JSON-serializable for cache keys and seeds, equal for equal cells."""
+    # Deployment percentages are passed as Python or NumPy ints and floats, 2 and 2.0 are the same cell
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, numbers.Real):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    raise TypeError(f"Cannot use {type(value).__name__} in a result cache key")
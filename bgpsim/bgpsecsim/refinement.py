@@ -0,0 +1,104 @@
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Set by the --refine-threshold option of generate
+THRESHOLD = 0.05
+
+# (object deployment, policy deployment) in percent
+Point = Tuple[float, float]
+
+
+def min_step_for(n_ases: int, step: float = 10.0, min_step: float = 0.3125) -> float:
+    """Smallest side step / 2^k of at least min_step that still changes the deployment by one AS."""
+    while step / 2 >= max(min_step, 100 / n_ases):
+        step /= 2
+    return step
+
+
+class AdaptiveSweep(object):
+    """Sweep of a result over (object deployment, policy deployment) that refines where it changes.
+
+    The sweep starts with a coarse grid of squares of side step over [low, high]². A square whose
+    corner results differ by more than threshold times the range of results on the coarse grid is
+    split into four, down to squares of side min_step. As every split halves the side, the points
+    are exact binary fractions and shared corners are evaluated once. Regions with a constant
+    result stay at the coarse resolution, so features smaller than a coarse square that do not
+    show at its corners are missed.
+    """
+    evaluate: Callable[[float, float], float]
+    results: Dict[Point, float]
+    # (object deployment, policy deployment, side) of the squares left after refinement
+    leaves: List[Tuple[float, float, float]]
+
+    def __init__(self, evaluate: Callable[[float, float], float], step: float = 10.0, min_step: float = 0.3125,
+                 threshold: Optional[float] = None, low: float = 0.0, high: float = 100.0):
+        self.evaluate = evaluate
+        self.step = step
+        self.min_step = min_step
+        self.threshold = THRESHOLD if threshold is None else threshold
+        self.low = low
+        self.high = high
+        self.results = {}
+        self.leaves = []
+
+    def value(self, objects: float, policy: float) -> float:
+        point = (objects, policy)
+        if point not in self.results:
+            self.results[point] = self.evaluate(objects, policy)
+        return self.results[point]
+
+    def run(self) -> None:
+        coarse = np.arange(self.low, self.high, self.step)
+        squares = deque((float(objects), float(policy), self.step) for objects in coarse for policy in coarse)
+        for objects, policy, side in squares:
+            for corner in self._corners(objects, policy, side):
+                self.value(*corner)
+        values = self.results.values()
+        scale = max(values) - min(values)
+
+        # Breadth-first, so that the sweep progresses evenly over the whole grid
+        while squares:
+            objects, policy, side = squares.popleft()
+            corners = [self.value(*corner) for corner in self._corners(objects, policy, side)]
+            if side / 2 < self.min_step or max(corners) - min(corners) <= self.threshold * scale:
+                self.leaves.append((objects, policy, side))
+                continue
+            half = side / 2
+            for d_objects in (0.0, half):
+                for d_policy in (0.0, half):
+                    squares.append((objects + d_objects, policy + d_policy, half))
+
+    @staticmethod
+    def _corners(objects: float, policy: float, side: float) -> List[Point]:
+        return [(objects, policy), (objects, policy + side), (objects + side, policy), (objects + side, policy + side)]
+
+    def points(self) -> np.ndarray:
+        """Evaluated points as rows of (object deployment, policy deployment, result)."""
+        return np.array([(objects, policy, result) for (objects, policy), result in sorted(self.results.items())])
+
+    def dense_grid(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Results on a regular grid of spacing min_step, interpolated bilinearly within each square.
+
+        Squares are filled coarsest first, so that where a coarse square meets finer ones (a
+        T-junction), the shared edge takes the values of the finer squares, which include the points
+        evaluated on it. Evaluated points always keep their results.
+
+        Returns the axis (the same for objects and policy) and the grid indexed by [objects][policy].
+        """
+        axis = np.arange(self.low, self.high + self.min_step / 2, self.min_step)
+        grid = np.zeros((len(axis), len(axis)))
+        for objects, policy, side in sorted(self.leaves, key=lambda leaf: -leaf[2]):
+            rows = np.flatnonzero((axis >= objects) & (axis <= objects + side))
+            columns = np.flatnonzero((axis >= policy) & (axis <= policy + side))
+            u = ((axis[rows] - objects) / side)[:, np.newaxis]
+            v = ((axis[columns] - policy) / side)[np.newaxis, :]
+            c00, c01, c10, c11 = (self.results[corner] for corner in self._corners(objects, policy, side))
+            grid[np.ix_(rows, columns)] = (c00 * (1 - u) * (1 - v) + c01 * (1 - u) * v +
+                                           c10 * u * (1 - v) + c11 * u * v)
+        points = self.points()
+        if len(points):
+            indices = np.rint((points[:, :2] - self.low) / self.min_step).astype(int)
+            grid[indices[:, 0], indices[:, 1]] = points[:, 2]
+        return axis, grid
@@ -0,0 +1,118 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Callable, List, Optional
+
+import networkx as nx
+
+import bgpsecsim.seeding as seeding
+from bgpsecsim.keys import file_digest, normalize
+
+# Modules the results of the experiments depend on, their source is part of every key
+_CODE_MODULES = ('asys.py', 'as_graph.py', 'routing_policy.py', 'topology.py', 'experiments.py', 'baseline.py',
+                 'seeding.py', 'aggregate.py', 'keys.py')
+
+# Store used by the cached experiment functions, set up by the --cache-dir option of generate
+_store: Optional['ResultStore'] = None
+
+
+def code_version() -> str:
+    """Digest of the source of the simulation modules."""
+    directory = os.path.dirname(__file__)
+    digest = hashlib.sha256()
+    for module in _CODE_MODULES:
+        with open(os.path.join(directory, module), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ResultStore(object):
+    """Results of experiment cells on disk, keyed by everything they depend on.
+
+    A key is the digest of the AS relationship file the graph was parsed from, the experiment
+    function, its arguments (deployment cell and trial list) and the source of the simulation
+    modules. Any figure calling the same experiment function with the same arguments is served
+    from the store, whichever figure computed the results first.
+    """
+    directory: str
+    nx_graph: nx.Graph
+    hits: int
+    misses: int
+
+    def __init__(self, directory: str, graph_file: str, nx_graph: nx.Graph):
+        self.directory = directory
+        self.nx_graph = nx_graph
+        self.hits = 0
+        self.misses = 0
+        self._prefix = [file_digest(graph_file), code_version()]
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, function: Callable, args: List[Any]) -> str:
+        description = self._prefix + [function.__module__, function.__qualname__, normalize(list(args))]
+        return hashlib.sha256(json.dumps(description).encode()).hexdigest()
+
+    def _filename(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.pkl')
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._filename(key), 'rb') as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: Any) -> None:
+        filename = self._filename(key)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # Written under a temporary name, so that an interrupted run never leaves a partial result
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            pickle.dump(result, f)
+        os.replace(temporary, filename)
+
+    def __str__(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses"
+
+
+def configure(directory: str, graph_file: str, nx_graph: nx.Graph) -> ResultStore:
+    """Serves the cached experiment functions called on nx_graph from a store in directory."""
+    global _store
+    _store = ResultStore(directory, graph_file, nx_graph)
+    return _store
+
+
+def cached(function: Callable) -> Callable:
+    """Decorator for experiment functions f(nx_graph, *args) whose results only depend on their arguments.
+
+    Results are only cached for the graph the store was configured with.
+    """
+    return _cached(function, seeded=False)
+
+
+def cached_seeded(function: Callable) -> Callable:
+    """Decorator for experiment functions drawing from the streams of seeding.
+
+    Results are only cached for runs with a seeding.SEED, which is part of the key.
+    """
+    return _cached(function, seeded=True)
+
+
+def _cached(function: Callable, seeded: bool) -> Callable:
+    @functools.wraps(function)
+    def cached_function(nx_graph: nx.Graph, *args):
+        store = _store
+        if store is None or nx_graph is not store.nx_graph or (seeded and seeding.SEED is None):
+            return function(nx_graph, *args)
+        key = store.key(function, [seeding.SEED, *args] if seeded else args)
+        result = store.get(key)
+        if result is None:
+            result = function(nx_graph, *args)
+            store.put(key, result)
+        return result
+
+    return cached_function
@@ -1,6 +1,53 @@
-from typing import Callable, Generator
+from typing import Any, Callable, Dict, Generator, List, Tuple
+
+from bgpsecsim.asys import AS, Relation, Route, RoutingPolicy
+
+# Preference rules map a route to a value, routes with smaller values are preferred
+
+def local_pref(route: Route) -> int:
+    relation = route.final.get_relation(route.first_hop)
+    return relation.value if relation else -1
+
+def path_length(route: Route) -> int:
+    return route.length
+
+def unauthenticated(route: Route) -> bool:
+    return not route.authenticated
+
+def next_hop_as_id(route: Route) -> Any:
+    return route.first_hop.as_id
+
+
+PreferenceKey = Callable[[Route], Tuple]
+
+# Compiled preference keys by policy class, see get_preference_key
+_preference_keys: Dict[type, PreferenceKey] = {}
+
+def compile_preference_key(rules: Generator[Callable[[Route], Any], None, None]) -> PreferenceKey:
+    """Compiles a sequence of preference rules into a single key function.
+
+    The key of a route is the tuple of all rule values, so comparing two keys compares the rules in
+    order. The key is cached on the route, which is usually compared several times by the same AS.
+    """
+    rules = tuple(rules)
+
+    def preference_key(route: Route) -> Tuple:
+        if route.preference_key is preference_key:
+            return route.preference
+        preference = tuple([rule(route) for rule in rules])
+        route.preference_key = preference_key
+        route.preference = preference
+        return preference
+
+    return preference_key
+
+def get_preference_key(policy: RoutingPolicy) -> PreferenceKey:
+    """The compiled preference_rules of a policy, built once per policy class."""
+    preference_key = _preference_keys.get(type(policy))
+    if preference_key is None:
+        preference_key = _preference_keys[type(policy)] = compile_preference_key(policy.preference_rules())
+    return preference_key
 
-from bgpsecsim.asys import Relation, Route, RoutingPolicy
 
 class DefaultPolicy(RoutingPolicy):
     def __init__(self):
@@ -16,18 +63,9 @@ class DefaultPolicy(RoutingPolicy):
         # assert triggers error as soon as condition is false, in this case, if both final AS aren't the same
         assert current.final == new.final, "routes must have same final AS"
 
-        for rule in self.preference_rules():
-            current_val = rule(current)
-            new_val = rule(new)
-
-            if current_val is not None:
-                if new_val is not None:
-                    if current_val < new_val:
-                        return False
-                    if new_val < current_val:
-                        return True
-
-        return False
+        # The rules are compared in order, the first one that differs decides
+        preference_key = get_preference_key(self)
+        return preference_key(new) < preference_key(current)
 
     def forward_to(self, route: Route, relation: Relation) -> bool:
         asys = route.final
@@ -41,14 +79,11 @@ class DefaultPolicy(RoutingPolicy):
     # Generators do not store all the values in memory, they generate the values on the fly:
     def preference_rules(self) -> Generator[Callable[[Route], int], None, None]:
         # 1. Local preferences
-        def local_pref(route):
-            relation = route.final.get_relation(route.first_hop)
-            return relation.value if relation else -1
         yield local_pref
         # 2. AS-path length
-        yield lambda route: route.length
+        yield path_length
         # 3. Next hop AS number
-        yield lambda route: route.first_hop.as_id
+        yield next_hop_as_id
 
 
 class RPKIPolicy(DefaultPolicy):
@@ -76,20 +111,16 @@ class BGPsecHighSecPolicy(DefaultPolicy):
         # bgp_sec_enabled, but that is less convenient in our simulation.
         return super().accept_route(route) and not route.origin_invalid
 
-    # Lambda takes several arguments, but only has one expression
     def preference_rules(self) -> Generator[Callable[[Route], int], None, None]:
         # Prefer authenticated routes
-        yield lambda route: not route.authenticated
+        yield unauthenticated
 
         # 1. Local preferences
-        def local_pref(route):
-            relation = route.final.get_relation(route.first_hop)
-            return relation.value if relation else -1
         yield local_pref
         # 2. AS-path length
-        yield lambda route: route.length
+        yield path_length
         # 3. Next hop AS number
-        yield lambda route: route.first_hop.as_id
+        yield next_hop_as_id
 
 
 class BGPsecMedSecPolicy(DefaultPolicy):
@@ -103,16 +134,13 @@ class BGPsecMedSecPolicy(DefaultPolicy):
 
     def preference_rules(self) -> Generator[Callable[[Route], int], None, None]:
         # 1. Local preferences
-        def local_pref(route):
-            relation = route.final.get_relation(route.first_hop)
-            return relation.value if relation else -1
         yield local_pref
         # Prefer authenticated routes
-        yield lambda route: not route.authenticated
+        yield unauthenticated
         # 2. AS-path length
-        yield lambda route: route.length
+        yield path_length
         # 3. Next hop AS number
-        yield lambda route: route.first_hop.as_id
+        yield next_hop_as_id
 
 
 class BGPsecLowSecPolicy(DefaultPolicy):
@@ -126,19 +154,18 @@ class BGPsecLowSecPolicy(DefaultPolicy):
 
     def preference_rules(self) -> Generator[Callable[[Route], int], None, None]:
         # 1. Local preferences
-        def local_pref(route):
-            relation = route.final.get_relation(route.first_hop)
-            return relation.value if relation else -1
         yield local_pref
         # 2. AS-path length
-        yield lambda route: route.length
+        yield path_length
         # Prefer authenticated routes
-        yield lambda route: not route.authenticated
+        yield unauthenticated
         # 3. Next hop AS number
-        yield lambda route: route.first_hop.as_id
+        yield next_hop_as_id
 
 # Rules are all the same for RouteLeakPolicy and DefaultPolicy, except that RouteLeakPolicy forwards routes to any peer.
 class RouteLeakPolicy(RoutingPolicy):
+    valley_free = False
+
     def __init__(self):
         self.name = 'RouteLeakPolicy'
 
@@ -152,18 +179,9 @@ class RouteLeakPolicy(RoutingPolicy):
         # assert triggers error as soon as condition is false, in this case, if both final AS aren't the same
         assert current.final == new.final, "routes must have same final AS"
 
-        for rule in self.preference_rules():
-            current_val = rule(current)
-            new_val = rule(new)
-
-            if current_val is not None:
-                if new_val is not None:
-                    if current_val < new_val:
-                        return False
-                    if new_val < current_val:
-                        return True
-
-        return False
+        # The rules are compared in order, the first one that differs decides
+        preference_key = get_preference_key(self)
+        return preference_key(new) < preference_key(current)
 
     def forward_to(self, route: Route, relation: Relation) -> bool:
 #        asys = route.final
@@ -175,14 +193,11 @@ class RouteLeakPolicy(RoutingPolicy):
     # Generators do not store all the values in memory, they generate the values on the fly:
     def preference_rules(self) -> Generator[Callable[[Route], int], None, None]:
         # 1. Local preferences
-        def local_pref(route):
-            relation = route.final.get_relation(route.first_hop)
-            return relation.value if relation else -1
         yield local_pref
         # 2. AS-path length
-        yield lambda route: route.length
+        yield path_length
         # 3. Next hop AS number
-        yield lambda route: route.first_hop.as_id
+        yield next_hop_as_id
 
 
 def perform_ASPA_algorithm(route):
@@ -483,16 +498,131 @@ def perform_ASCONES_algorithm(route):
 
     return result
 
+# Results of hop(AS(i), AS(j)) in the ASPA draft
+PROVIDER_PLUS = 0
+NOT_PROVIDER_PLUS = 1
+NO_ATTESTATION = 2
+
+def aspa_hop(asys: AS, next_asys: AS) -> int:
+    """hop(asys, next_asys) based on the ASPA object of asys, i.e. whether next_asys is its provider."""
+    if asys.aspa_providers is None:
+        return NO_ATTESTATION
+    return PROVIDER_PLUS if next_asys.as_id in asys.aspa_providers else NOT_PROVIDER_PLUS
+
+def ascones_hop(asys: AS, next_asys: AS) -> int:
+    """hop(asys, next_asys) based on the ASCONES object of next_asys, i.e. whether asys is its customer."""
+    if next_asys.ascones_customers is None:
+        return NO_ATTESTATION
+    return PROVIDER_PLUS if asys.as_id in next_asys.ascones_customers else NOT_PROVIDER_PLUS
+
+# A hop summary condenses the hops between the ASes of a path into the positions the ASPA
+# algorithm depends on. Hop i is the up hop hop(path[i], path[i + 1]) and the down hop
+# hop(path[i + 1], path[i]); positions are -1 if there is no such hop. The summary is a tuple of
+# (AS.rpki_generation, lowest i whose up hop is not Provider+, kind of that hop, lowest i whose up
+# hop is Not Provider+, highest i whose up hop is not Provider+, kind of that hop, highest i whose
+# down hop is not Provider+, highest i whose down hop is Not Provider+).
+HopSummary = Tuple[int, int, int, int, int, int, int, int]
+
+def extend_hop_summary(summary: HopSummary, i: int, up: int, down: int) -> HopSummary:
+    _, first_up, first_up_kind, first_up_not_provider, last_up, last_up_kind, last_down, last_down_not_provider = summary
+    if up != PROVIDER_PLUS:
+        if first_up < 0:
+            first_up = i
+            first_up_kind = up
+        last_up = i
+        last_up_kind = up
+        if up == NOT_PROVIDER_PLUS and first_up_not_provider < 0:
+            first_up_not_provider = i
+    if down != PROVIDER_PLUS:
+        last_down = i
+        if down == NOT_PROVIDER_PLUS:
+            last_down_not_provider = i
+    return (AS.rpki_generation, first_up, first_up_kind, first_up_not_provider,
+            last_up, last_up_kind, last_down, last_down_not_provider)
+
+def path_hop_summary(path: List[AS], hop: Callable[[AS, AS], int]) -> HopSummary:
+    summary = (AS.rpki_generation, -1, PROVIDER_PLUS, -1, -1, PROVIDER_PLUS, -1, -1)
+    for i in range(len(path) - 1):
+        summary = extend_hop_summary(summary, i, hop(path[i], path[i + 1]), hop(path[i + 1], path[i]))
+    return summary
+
+def hop_summary(route: Route, hop: Callable[[AS, AS], int], cache: str) -> HopSummary:
+    """The hop summary of the whole path of route, memoized on the route in the slot cache.
+
+    A route extended from a parent only adds the hop from the parent's final AS, so the summary is
+    derived in O(1) from the (usually already memoized) summary of the parent. Memoized summaries
+    are discarded when any ASPA or ASCONES object changed since they were computed.
+    """
+    summary = getattr(route, cache)
+    if summary is not None and summary[0] == AS.rpki_generation:
+        return summary
+    if route.parent is None:
+        summary = path_hop_summary(route.path, hop)
+    else:
+        parent = route.parent
+        summary = extend_hop_summary(hop_summary(parent, hop, cache), route.length - 2,
+                                     hop(parent.final, route.final), hop(route.final, parent.final))
+    setattr(route, cache, summary)
+    return summary
+
+def validate_path(route: Route, hop: Callable[[AS, AS], int], cache: str, upstream_from_verifier: bool) -> str:
+    """Incremental variant of perform_ASPA_algorithm and perform_ASCONES_algorithm.
+
+    The verification only depends on the hops between the ASes before the verifying AS, i.e. on
+    the hop summary of the route the verifying AS received extended from, so no path is walked.
+    The results are the same as those of the reference implementations for all routes without
+    cycles (routes with cycles are rejected by the policies anyway), including their order of
+    checks: upstream verification stops at the first hop that is not Provider+, walking from the
+    origin for ASPA and from the verifying AS for ASCONES (upstream_from_verifier).
+    """
+    relation = route.final.get_relation(route.first_hop)
+    if relation != Relation.CUSTOMER and relation != Relation.PEER and relation != Relation.PROVIDER:
+        raise Exception("Unknown relationship type", relation)
+
+    n = route.length
+    if n < 2:  # case never happens
+        raise Exception('Route length below verifyable!')
+    if n == 2 or (relation == Relation.PROVIDER and n == 3):
+        return 'Valid'
+
+    if route.parent is None:
+        # Summary of the path without the verifying AS
+        summary = path_hop_summary(route.path[:-1], hop)
+    else:
+        summary = hop_summary(route.parent, hop, cache)
+    _, first_up, first_up_kind, first_up_not_provider, last_up, last_up_kind, last_down, last_down_not_provider = summary
+
+    if relation != Relation.PROVIDER:
+        kind = last_up_kind if upstream_from_verifier else first_up_kind
+        if kind == NOT_PROVIDER_PLUS:
+            return 'Invalid'
+        if kind == NO_ATTESTATION:
+            return 'Unknown'
+        return 'Valid'
+
+    # Indices as in the reference implementation, where AS(x) is path[x - 1]
+    u_min = n if first_up_not_provider < 0 else first_up_not_provider + 2
+    v_max = last_down_not_provider + 1
+    if u_min <= v_max:
+        return 'Invalid'
+    k = n - 1 if first_up < 0 else first_up + 1
+    l = last_down + 2
+    return 'Valid' if l - k <= 1 else 'Unknown'
+
+def validate_ASPA(route: Route) -> str:
+    return validate_path(route, aspa_hop, 'aspa_summary', upstream_from_verifier=False)
+
+def validate_ASCONES(route: Route) -> str:
+    return validate_path(route, ascones_hop, 'ascones_summary', upstream_from_verifier=True)
+
 class ASPAPolicy(DefaultPolicy):
     def __init__(self):
         self.name = 'ASPAPolicy'
 
     # https://datatracker.ietf.org/doc/html/draft-ietf-sidrops-aspa-verification-16
     def accept_route(self, route: Route) -> bool:
-        result = perform_ASPA_algorithm(route)
-
         # Accepts the route if none of the elements with ASPA activated has returned INVALID
-        return super().accept_route(route) and not (result == 'Invalid')
+        return super().accept_route(route) and not (validate_ASPA(route) == 'Invalid')
 
 class ASCONESPolicy(DefaultPolicy):
     def __init__(self):
@@ -500,7 +630,17 @@ class ASCONESPolicy(DefaultPolicy):
 
     # https://datatracker.ietf.org/doc/html/draft-ietf-sidrops-aspa-verification-16
     def accept_route(self, route: Route) -> bool:
-        result = perform_ASCONES_algorithm(route)
-
         # Accepts the route if none of the elements with ASPA activated has returned INVALID
-        return super().accept_route(route) and not (result == 'Invalid')
\ No newline at end of file
+        return super().accept_route(route) and not (validate_ASCONES(route) == 'Invalid')
+
+# Dense policy ids, used by the per-AS policy array of Deployment
+POLICIES = [
+    DefaultPolicy, RPKIPolicy, PathEndValidationPolicy,
+    BGPsecHighSecPolicy, BGPsecMedSecPolicy, BGPsecLowSecPolicy,
+    RouteLeakPolicy, ASPAPolicy, ASCONESPolicy
+]
+POLICY_IDS = {policy: policy_id for policy_id, policy in enumerate(POLICIES)}
+# Policies choosing the same legitimate routes as DefaultPolicy. They only reject origin-invalid,
+# path-end-invalid or ASPA/ASCONES-invalid announcements, which valley-free routes announced by
+# the destination itself never are.
+ROUTES_LEGITIMATE_AS_DEFAULT = {DefaultPolicy, RPKIPolicy, PathEndValidationPolicy, ASPAPolicy, ASCONESPolicy}
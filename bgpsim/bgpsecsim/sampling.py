@@ -0,0 +1,64 @@
+import math
+import statistics
+from typing import Any, Callable, List, NamedTuple, Optional
+
+import numpy as np
+
+import bgpsecsim.aggregate as aggregate
+
+# Set by the --ci-half-width and --relative-error options of generate. Without a target, every
+# trial of a cell is run.
+HALF_WIDTH: Optional[float] = None
+RELATIVE_ERROR: Optional[float] = None
+# Trials run before the first check of the target, the sample variance is unreliable below that
+MIN_TRIALS = 30
+CONFIDENCE = 0.95
+
+
+class Estimate(NamedTuple):
+    mean: float
+    # Half-width of the CONFIDENCE interval of the mean, normal approximation
+    half_width: float
+    n_trials: int
+
+
+def estimate_of(counts: aggregate.Counts) -> Estimate:
+    rates = aggregate.rates(counts)
+    if len(rates) < 2:
+        return Estimate(float(rates.mean()) if len(rates) else math.nan, math.inf, len(rates))
+    z = statistics.NormalDist().inv_cdf((1 + CONFIDENCE) / 2)
+    half_width = z * float(rates.std(ddof=1)) / math.sqrt(len(rates))
+    return Estimate(float(rates.mean()), half_width, len(rates))
+
+
+def target_reached(estimate: Estimate) -> bool:
+    if HALF_WIDTH is not None and estimate.half_width <= HALF_WIDTH:
+        return True
+    if RELATIVE_ERROR is not None and estimate.half_width <= RELATIVE_ERROR * abs(estimate.mean):
+        return True
+    return False
+
+
+def sequential_estimate(run: Callable[[List[Any], int], aggregate.Counts], trials: List[Any]) -> Estimate:
+    """Estimates the mean result of run over trials, stopping once the target precision is reached."""
+    return estimate_of(sequential_counts(run, trials))
+
+
+def sequential_counts(run: Callable[[List[Any], int], aggregate.Counts], trials: List[Any]) -> aggregate.Counts:
+    """Counts of the trials run until the target precision of the mean result is reached.
+
+    Trials are taken from the front of the list in batches, starting with MIN_TRIALS and doubling
+    the number of trials run so far, so that the pool has enough work per batch. The list is the
+    cap: if the target is not reached, all trials are run. run is called with a batch of trials and
+    the index of its first trial in the list.
+    """
+    if HALF_WIDTH is None and RELATIVE_ERROR is None:
+        return run(trials, 0)
+
+    counts = aggregate.as_counts([])
+    n = min(MIN_TRIALS, len(trials))
+    while True:
+        counts = np.concatenate([counts, run(trials[len(counts):n], len(counts))])
+        if n == len(trials) or target_reached(estimate_of(counts)):
+            return counts
+        n = min(2 * n, len(trials))
@@ -0,0 +1,37 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+import numpy as np
+
+import bgpsecsim.keys as keys
+
+# Set by the --seed option of generate. Without a seed, the streams of a run derive from fresh entropy.
+SEED: Optional[int] = None
+
+_entropy: Optional[int] = None
+
+
+def entropy() -> int:
+    global _entropy
+    if SEED is not None:
+        return SEED
+    if _entropy is None:
+        _entropy = np.random.SeedSequence().entropy
+    return _entropy
+
+
+def cell_seed(*cell: Any) -> np.random.SeedSequence:
+    """Seed sequence of a cell of a sweep, identified by e.g. the experiment function and deployment.
+
+    The cell is hashed into the spawn key, so that every cell of every figure has its own streams,
+    independent of the order the cells are run in. Must be called before the experiment is sent to
+    the workers, which would otherwise draw their own entropy without a SEED.
+    """
+    digest = hashlib.blake2b(json.dumps(keys.normalize(list(cell))).encode(), digest_size=16).digest()
+    return np.random.SeedSequence(entropy(), spawn_key=tuple(np.frombuffer(digest, dtype=np.uint32).tolist()))
+
+
+def trial_rng(cell: np.random.SeedSequence, index: int) -> np.random.Generator:
+    """Random stream of the trial with the given index in a cell, the same as of cell.spawn(index + 1)[index]."""
+    return np.random.default_rng(np.random.SeedSequence(cell.entropy, spawn_key=cell.spawn_key + (index,)))
@@ -0,0 +1,304 @@
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+from bgpsecsim.asys import AS_ID, Relation
+
+# Arrays of a Topology written by save and memory-mapped by load
+SAVED_ARRAYS = ('edges', 'edge_relation', 'customers_indptr', 'customers', 'peers_indptr', 'peers',
+                'providers_indptr', 'providers', 'tier', 'rank')
+
+# Tier codes stored in Topology.tier
+TIER_ONE = 1
+TIER_TWO = 2
+TIER_THREE = 3
+
+
+class Topology(object):
+    """Compact array representation of an AS-level topology.
+
+    ASes are addressed by dense integer indices (0..n-1) in the order of the source graph. The
+    neighbors of every AS are stored as one CSR adjacency per Relation, i.e. the customers of AS i
+    are customers[customers_indptr[i]:customers_indptr[i + 1]]. The per-AS attributes (policy ids,
+    ASPA and ASCONES objects, flags) are not part of the topology, they are the arrays of a
+    Deployment.
+
+    The original edge order is kept as well, so that ASGraph can build its AS objects as a view on
+    the topology with exactly the neighbor order it would have had when built from networkx. Route
+    propagation still walks these AS objects; the arrays are used for loading, saving and sharing
+    graphs, for the tiers and ranks of ASes and for the customer-provider order of the Gao-Rexford
+    propagation.
+
+    save writes a topology to a directory of .npy files, which load memory-maps.
+    """
+    __slots__ = [
+        'as_ids', 'index', 'edges', 'edge_relation',
+        'customers_indptr', 'customers', 'peers_indptr', 'peers', 'providers_indptr', 'providers',
+        'tier', 'rank', 'directory',
+    ]
+
+    # AS_ID of every index and the inverse mapping
+    as_ids: List[AS_ID]
+    index: Dict[AS_ID, int]
+    # Undirected edges (a, b) in source order; edge_relation holds the Relation value of b as seen from a
+    edges: np.ndarray
+    edge_relation: np.ndarray
+    customers_indptr: np.ndarray
+    customers: np.ndarray
+    peers_indptr: np.ndarray
+    peers: np.ndarray
+    providers_indptr: np.ndarray
+    providers: np.ndarray
+    # TIER_ONE: no providers, TIER_TWO: providers and customers, TIER_THREE: no customers
+    tier: np.ndarray
+    # Cache of rank_by_customer_degree
+    rank: Optional[np.ndarray]
+    # Directory the arrays are memory-mapped from, None for topologies in memory
+    directory: Optional[str]
+
+    def __init__(self, as_ids: List[AS_ID], edges: np.ndarray, edge_relation: np.ndarray):
+        n = len(as_ids)
+        self.as_ids = list(as_ids)
+        self.index = {as_id: i for i, as_id in enumerate(self.as_ids)}
+        self.edges = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+        self.edge_relation = np.asarray(edge_relation, dtype=np.int8)
+
+        # Every undirected edge becomes two directed entries (a -> b, rel) and (b -> a, inverse rel),
+        # interleaved so that both keep the position of the edge in source order
+        src = self.edges.reshape(-1)
+        dst = self.edges[:, ::-1].reshape(-1)
+        inverse = np.array([0, Relation.PROVIDER.value, Relation.PEER.value, Relation.CUSTOMER.value],
+                           dtype=np.int8)
+        rel = np.stack((self.edge_relation, inverse[self.edge_relation]), axis=1).reshape(-1)
+
+        for relation, name in ((Relation.CUSTOMER, 'customers'),
+                               (Relation.PEER, 'peers'),
+                               (Relation.PROVIDER, 'providers')):
+            mask = rel == relation.value
+            indptr, indices = _build_csr(n, src[mask], dst[mask])
+            setattr(self, name + '_indptr', indptr)
+            setattr(self, name, indices)
+
+        n_customers = np.diff(self.customers_indptr)
+        n_providers = np.diff(self.providers_indptr)
+        self.tier = np.full(n, TIER_TWO, dtype=np.int8)
+        self.tier[n_providers == 0] = TIER_ONE
+        self.tier[n_customers == 0] = TIER_THREE
+        self.rank = None
+        self.directory = None
+
+    @classmethod
+    def from_nx_graph(cls, graph: nx.Graph) -> 'Topology':
+        """Builds a topology from a graph as returned by parse_as_rel_file."""
+        as_ids = list(graph.nodes)
+        index = {as_id: i for i, as_id in enumerate(as_ids)}
+        edges = np.empty((graph.number_of_edges(), 2), dtype=np.int32)
+        edge_relation = np.empty(graph.number_of_edges(), dtype=np.int8)
+        for k, (as_id1, as_id2, customer) in enumerate(graph.edges(data='customer')):
+            edges[k] = index[as_id1], index[as_id2]
+            if customer is None:
+                edge_relation[k] = Relation.PEER.value
+            elif customer == as_id1:
+                edge_relation[k] = Relation.PROVIDER.value
+            else:
+                edge_relation[k] = Relation.CUSTOMER.value
+        return cls(as_ids, edges, edge_relation)
+
+    @classmethod
+    def from_edges(cls, as1: np.ndarray, as2: np.ndarray, rel: np.ndarray) -> 'Topology':
+        """Builds a topology from the lines as1|as2|rel of a CAIDA as-rel file, rel being -1 if as1 is
+        a provider of as2 and 0 for peers.
+
+        The result is the same as from_nx_graph of the graph parse_as_rel_file builds from the
+        lines, AS_IDs, their order and the order of the edges included: ASes are numbered by first
+        appearance, an edge listed more than once keeps its first position and the relation of its
+        last line, and the edges are ordered by the AS seen first, then by their first line.
+        """
+        as1 = np.asarray(as1, dtype=np.int64)
+        as2 = np.asarray(as2, dtype=np.int64)
+        rel = np.asarray(rel)
+        # Dense indices in order of first appearance, as1 before as2 on every line
+        asns, first, inverse = np.unique(np.stack((as1, as2), axis=1).reshape(-1), return_index=True,
+                                         return_inverse=True)
+        appearance = np.argsort(first, kind='stable')
+        rank = np.empty(len(asns), dtype=np.int64)
+        rank[appearance] = np.arange(len(asns))
+        ends = rank[inverse].reshape(-1, 2)
+        low, high = ends.min(axis=1), ends.max(axis=1)
+
+        # First and last line of every distinct edge
+        key = low * len(asns) + high
+        order = np.argsort(key, kind='stable')
+        starts = np.flatnonzero(np.r_[True, key[order][1:] != key[order][:-1]])
+        first_line = order[starts]
+        last_line = order[np.r_[starts[1:], len(order)] - 1]
+
+        edge_order = np.lexsort((first_line, low[first_line]))
+        first_line, last_line = first_line[edge_order], last_line[edge_order]
+        edges = np.stack((low[first_line], high[first_line]), axis=1)
+        # Relation of the second AS of every edge as seen from the first one
+        provider_first = ends[last_line, 0] == low[first_line]
+        edge_relation = np.where(provider_first, Relation.CUSTOMER.value, Relation.PROVIDER.value).astype(np.int8)
+        edge_relation[rel[last_line] == 0] = Relation.PEER.value
+
+        as_ids = [str(asn) for asn in asns[appearance].tolist()]
+        return cls(as_ids, edges, edge_relation)
+
+    @classmethod
+    def load(cls, directory: str) -> 'Topology':
+        """Opens a topology written by save.
+
+        The adjacency, tier and ranking arrays are memory-mapped read-only, so all processes
+        loading the same directory share one copy in the page cache, however they were started.
+        """
+        topology = cls.__new__(cls)
+        topology.as_ids = np.load(os.path.join(directory, 'as_ids.npy')).tolist()
+        topology.index = {as_id: i for i, as_id in enumerate(topology.as_ids)}
+        for name in SAVED_ARRAYS:
+            setattr(topology, name, np.load(os.path.join(directory, name + '.npy'), mmap_mode='r'))
+        topology.directory = directory
+        return topology
+
+    @staticmethod
+    def metadata(directory: str) -> Dict[str, Any]:
+        """The metadata passed to save."""
+        with open(os.path.join(directory, 'metadata.json')) as f:
+            return json.load(f)
+
+    def save(self, directory: str, **metadata: Any) -> None:
+        """Writes the AS_IDs and the arrays of the topology to .npy files in directory.
+
+        AS_IDs have to be all strings or all integers. metadata is written to a JSON file next to them.
+        """
+        as_ids = np.asarray(self.as_ids)
+        if as_ids.dtype.kind not in 'Uiu':
+            raise TypeError(f"Cannot save AS_IDs of type {as_ids.dtype}")
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'as_ids.npy'), as_ids)
+        self.rank_by_customer_degree()
+        for name in SAVED_ARRAYS:
+            np.save(os.path.join(directory, name + '.npy'), getattr(self, name))
+        with open(os.path.join(directory, 'metadata.json'), 'w') as f:
+            json.dump(metadata, f)
+
+    def to_nx_graph(self) -> nx.Graph:
+        """The graph in the form returned by parse_as_rel_file, for analyses that need networkx."""
+        graph = nx.Graph()
+        graph.add_nodes_from(self.as_ids)
+        as_ids = self.as_ids
+        for (i, j), relation in zip(self.edges.tolist(), self.edge_relation.tolist()):
+            if relation == Relation.PEER.value:
+                customer = None
+            elif relation == Relation.PROVIDER.value:
+                customer = as_ids[i]
+            else:
+                customer = as_ids[j]
+            graph.add_edge(as_ids[i], as_ids[j], customer=customer)
+        return graph
+
+    def __len__(self) -> int:
+        return len(self.as_ids)
+
+    def __iter__(self) -> Iterator[AS_ID]:
+        return iter(self.as_ids)
+
+    def get_customers(self, i: int) -> np.ndarray:
+        return self.customers[self.customers_indptr[i]:self.customers_indptr[i + 1]]
+
+    def get_peers(self, i: int) -> np.ndarray:
+        return self.peers[self.peers_indptr[i]:self.peers_indptr[i + 1]]
+
+    def get_providers(self, i: int) -> np.ndarray:
+        return self.providers[self.providers_indptr[i]:self.providers_indptr[i + 1]]
+
+    def customer_degrees(self) -> np.ndarray:
+        return np.diff(self.customers_indptr)
+
+    def provider_degrees(self) -> np.ndarray:
+        return np.diff(self.providers_indptr)
+
+    def peer_degrees(self) -> np.ndarray:
+        return np.diff(self.peers_indptr)
+
+    def rank_by_customer_degree(self) -> np.ndarray:
+        """Indices of all ASes sorted by descending customer degree, ties kept in index order."""
+        if self.rank is None:
+            self.rank = np.argsort(-self.customer_degrees(), kind='stable')
+        return self.rank
+
+    def customer_provider_order(self) -> Optional[np.ndarray]:
+        """Topological order of the customer-provider DAG, every AS after all of its customers.
+
+        Returns None if the graph has a customer-provider cycle.
+        """
+        n = len(self)
+        remaining = self.customer_degrees().copy()
+        n_providers = self.provider_degrees()
+        frontier = np.flatnonzero(remaining == 0)
+        levels = []
+        while len(frontier):
+            levels.append(frontier)
+            # Gather the providers of all ASes in the frontier at once
+            counts = n_providers[frontier]
+            starts = np.repeat(self.providers_indptr[frontier] - np.cumsum(counts) + counts, counts)
+            providers = self.providers[starts + np.arange(counts.sum())]
+            remaining -= np.bincount(providers, minlength=n)
+            frontier = np.unique(providers[remaining[providers] == 0])
+        order = np.concatenate(levels) if levels else np.zeros(0, dtype=np.int64)
+        if len(order) != n:
+            return None
+        return order
+
+    def nbytes(self) -> int:
+        """Memory held by the arrays of the topology (excluding the AS_ID mapping)."""
+        return sum(getattr(self, name).nbytes for name in self.__slots__
+                   if isinstance(getattr(self, name), np.ndarray))
+
+
+# Boolean AS attributes kept by a Deployment, next to the policy and the RPKI objects
+DEPLOYMENT_FLAGS = ('publishes_rpki', 'publishes_path_end', 'bgp_sec_enabled', 'aspa_enabled', 'ascones_enabled')
+
+
+class Deployment(object):
+    """Policies, flags and RPKI objects of all ASes of a topology, indexed like the topology.
+
+    policy holds the POLICY_IDS of the policy classes. aspa and ascones mark the ASes publishing the
+    object AS.create_new_aspa and AS.create_new_ascones would create. Deployments are plain arrays,
+    so experiments can build and change them without touching any AS object, and ASGraph
+    .apply_deployment only has to update the ASes that differ from the deployment applied before.
+    """
+    __slots__ = ['policy', 'aspa', 'ascones'] + list(DEPLOYMENT_FLAGS)
+
+    policy: np.ndarray
+    aspa: np.ndarray
+    ascones: np.ndarray
+    publishes_rpki: np.ndarray
+    publishes_path_end: np.ndarray
+    bgp_sec_enabled: np.ndarray
+    aspa_enabled: np.ndarray
+    ascones_enabled: np.ndarray
+
+    def __init__(self, n: int, policy: int = 0):
+        self.policy = np.full(n, policy, dtype=np.int8)
+        for name in self.__slots__[1:]:
+            setattr(self, name, np.zeros(n, dtype=bool))
+
+    def __len__(self) -> int:
+        return len(self.policy)
+
+    def copy(self) -> 'Deployment':
+        deployment = Deployment.__new__(Deployment)
+        for name in self.__slots__:
+            setattr(deployment, name, getattr(self, name).copy())
+        return deployment
+
+
+def _build_csr(n: int, src: np.ndarray, dst: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # A stable sort keeps the neighbors of each AS in edge order
+    order = np.argsort(src, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order].astype(np.int32)
@@ -0,0 +1,32 @@
+import unittest
+from fractions import Fraction
+import statistics
+
+import bgpsecsim.aggregate as aggregate
+
+
+class TestAggregate(unittest.TestCase):
+
+    def setUp(self):
+        self.results = [(1, 4), (0, 3), (3, 3), (0, 0)]
+        self.counts = aggregate.as_counts(self.results)
+
+    def test_rates(self):
+        assert aggregate.rates(self.counts).tolist() == [25.0, 0.0, 100.0, 0.0]
+        # Same as averaging the exact percentages
+        fractions = [Fraction(bad, total) * 100 if total else Fraction(0) for bad, total in self.results]
+        self.assertAlmostEqual(aggregate.mean_rate(self.counts), float(statistics.mean(fractions)))
+        self.assertAlmostEqual(aggregate.rate_variance(self.counts), float(statistics.variance(fractions)))
+
+    def test_weighted(self):
+        assert aggregate.pooled_rate(self.counts) == 40.0
+        # (4 * 15² + 3 * 40² + 3 * 60²) / 10
+        self.assertAlmostEqual(aggregate.weighted_rate_variance(self.counts), 1650.0)
+
+    def test_empty(self):
+        counts = aggregate.as_counts([])
+        assert counts.shape == (0, 2)
+        assert aggregate.pooled_rate(counts) == 0.0
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,19 @@
 import unittest
+import bz2
+import gzip
 import sys
 import os
+import pickle
+import shutil
+import tempfile
+from unittest import mock
+
+import networkx as nx
 
 import bgpsecsim.as_graph as as_graph
 from bgpsecsim.asys import AS, AS_ID, Relation, Route, RoutingPolicy
 from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.topology import Topology
 from bgpsecsim.routing_policy import (
     DefaultPolicy, RPKIPolicy, PathEndValidationPolicy,
     BGPsecHighSecPolicy, BGPsecMedSecPolicy, BGPsecLowSecPolicy,
@@ -39,6 +48,83 @@ class TestASGraph(unittest.TestCase):
         assert graph.edges[('2', '6')]['customer'] == '6'
         assert graph.edges[('5', '6')]['customer'] is None
 
+    def test_parse_as_rel_file_pickle(self):
+        # Edges point from customers to providers, edges in both directions link peers
+        digraph = nx.DiGraph([('4', '1'), ('2', '1'), ('1', '3'), ('3', '1'), ('5', '2'), ('5', '3'), ('3', '5')])
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'G_test.pickle')
+            with open(filename, 'wb') as f:
+                pickle.dump(digraph, f)
+            graph = as_graph.parse_as_rel_file(filename)
+        assert list(graph.nodes) == ['4', '1', '2', '3', '5']
+        assert dict(graph.edges) == {
+            ('4', '1'): {'customer': '4'}, ('1', '2'): {'customer': '2'}, ('1', '3'): {'customer': None},
+            ('2', '5'): {'customer': '5'}, ('3', '5'): {'customer': None},
+        }
+
+    def test_compressed_and_serial_2_files(self):
+        expected = as_graph.parse_topology(AS_REL_FILEPATH)
+        with open(AS_REL_FILEPATH) as f:
+            lines = f.read().splitlines()
+        serial_2 = [line if line.startswith('#') else line + '|bgp' for line in lines]
+        with tempfile.TemporaryDirectory() as directory:
+            files = [(os.path.join(directory, 'serial-1.as-rel.txt.bz2'), bz2.open, lines),
+                     (os.path.join(directory, 'serial-2.as-rel2.txt.gz'), gzip.open, serial_2)]
+            for filename, open_file, file_lines in files:
+                with open_file(filename, 'wt') as f:
+                    f.write('\n'.join(file_lines) + '\n')
+                # Chunks of a few lines
+                with mock.patch.object(as_graph, 'READ_CHUNK_BYTES', 40):
+                    topology = as_graph.parse_topology(filename)
+                assert topology.as_ids == expected.as_ids
+                assert topology.edges.tolist() == expected.edges.tolist()
+                assert topology.edge_relation.tolist() == expected.edge_relation.tolist()
+                assert dict(as_graph.parse_as_rel_file(filename).edges) == dict(as_graph.parse_as_rel_file(AS_REL_FILEPATH).edges)
+
+            with gzip.open(files[1][0], 'at') as f:
+                f.write('17|99|-1\n')
+            with self.assertRaises(as_graph.error.InvalidASRelFile):
+                as_graph.parse_topology(files[1][0])
+
+    def test_as_rel_file_with_bad_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'as-rel.txt')
+            # The missing field of line 3 is made up for by the extra one of line 4
+            for lines, message in [(['# source', '1|2|-1', '2|3', '3|4|0|0'], "bad line 3: 2|3"),
+                                   (['1|2|-1|bgp', '2|3|0|bgp', '3|4|-1'], "bad line 3: 3|4|-1"),
+                                   (['1|2'], "bad line 1: 1|2")]:
+                with open(filename, 'w') as f:
+                    f.write('\n'.join(lines) + '\n')
+                with self.assertRaises(as_graph.error.InvalidASRelFile) as context:
+                    as_graph.parse_topology(filename)
+                assert context.exception.message == message
+                with mock.patch.object(as_graph, 'READ_CHUNK_BYTES', 8):
+                    with self.assertRaises(as_graph.error.InvalidASRelFile) as context:
+                        as_graph.parse_topology(filename)
+                assert context.exception.message == message
+
+    def test_load_topology(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'as-rel.txt')
+            shutil.copy(AS_REL_FILEPATH, filename)
+            topology = as_graph.load_topology(filename)
+            assert sorted(os.listdir(directory)) == ['as-rel.txt', 'as-rel.txt.topology']
+            assert topology.directory == filename + '.topology'
+            expected = Topology.from_nx_graph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+            assert topology.as_ids == expected.as_ids
+            assert (topology.edges == expected.edges).all()
+
+            # Loaded from the compiled file while the source is unchanged
+            with mock.patch.object(as_graph, 'parse_topology', side_effect=AssertionError):
+                compiled = as_graph.load_topology(filename)
+            assert compiled.as_ids == expected.as_ids
+            assert (compiled.edge_relation == expected.edge_relation).all()
+            assert (compiled.customers == expected.customers).all()
+
+            with open(filename, 'a') as f:
+                f.write('17|99|-1\n')
+            assert '99' in as_graph.load_topology(filename).index
+
     def test_ASGraph_constructor(self):
         graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
         for i in range(1, 18):
@@ -71,6 +157,107 @@ class TestASGraph(unittest.TestCase):
             route = asys.routing_table['8']
             assert route.final == asys
 
+    def routing_tables(self, graph, dest):
+        return {as_id: str(asys.routing_table.get(dest)) for as_id, asys in graph.asyss.items()}
+
+    def test_gao_rexford_propagation(self):
+        nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        for policy in [DefaultPolicy(), RPKIPolicy(), PathEndValidationPolicy(), BGPsecHighSecPolicy(),
+                       BGPsecMedSecPolicy(), BGPsecLowSecPolicy(), ASPAPolicy()]:
+            fifo = ASGraph(nx_graph, policy=policy, propagation=as_graph.PROPAGATION_FIFO)
+            gao_rexford = ASGraph(nx_graph, policy=policy, propagation=as_graph.PROPAGATION_GAO_REXFORD)
+            for graph in (fifo, gao_rexford):
+                for asys in graph.asyss.values():
+                    asys.create_new_aspa(graph)
+                    asys.bgp_sec_enabled = asys.as_id in ('5', '6', '9')
+
+            for victim, attacker in [('17', '16'), ('8', '11'), ('1', '18'), ('13', '6')]:
+                for graph in (fifo, gao_rexford):
+                    for asys in graph.asyss.values():
+                        asys.reset_routing_table()
+                    graph.find_routes_to(graph.get_asys(victim))
+                assert self.routing_tables(fifo, victim) == self.routing_tables(gao_rexford, victim)
+
+                for graph in (fifo, gao_rexford):
+                    graph.hijack_n_hops(graph.get_asys(victim), graph.get_asys(attacker), 1)
+                assert self.routing_tables(fifo, victim) == self.routing_tables(gao_rexford, victim)
+
+    def test_gao_rexford_propagation_in_phases(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH), propagation=as_graph.PROPAGATION_GAO_REXFORD)
+        victim = graph.get_asys('17')
+        announcements = {neighbor: victim.originate_route(neighbor) for neighbor in victim.neighbors}
+        assert graph._propagate_in_phases('17', victim, announcements)
+        for asys in graph.asyss.values():
+            assert '17' in asys.routing_table
+
+        # BGPsecHighSecPolicy prefers authenticated routes over customer routes
+        graph.clear_routing_tables()
+        graph.get_asys('3').policy = BGPsecHighSecPolicy()
+        assert not graph._propagate_in_phases('17', victim, announcements)
+        for asys in graph.asyss.values():
+            assert asys is victim or '17' not in asys.routing_table
+
+    def test_gao_rexford_propagation_route_leak(self):
+        nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        fifo = ASGraph(nx_graph, propagation=as_graph.PROPAGATION_FIFO)
+        gao_rexford = ASGraph(nx_graph, propagation=as_graph.PROPAGATION_GAO_REXFORD)
+        for graph in (fifo, gao_rexford):
+            # AS 14 leaks the route learned from one of its providers (AS 7) to the other one (AS 8)
+            graph.get_asys('14').policy = RouteLeakPolicy()
+            graph.find_routes_to(graph.get_asys('17'))
+        assert self.routing_tables(fifo, '17') == self.routing_tables(gao_rexford, '17')
+
+    def test_gao_rexford_propagation_with_cycle(self):
+        nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        nx_graph.add_edge('1', '16', customer='1')
+        graph = ASGraph(nx_graph, propagation=as_graph.PROPAGATION_GAO_REXFORD)
+        # Falls back to FIFO propagation
+        graph.find_routes_to(graph.get_asys('8'))
+        for asys in graph.asyss.values():
+            assert '8' in asys.routing_table
+
+    def test_route_tree(self):
+        nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        for propagation in (as_graph.PROPAGATION_FIFO, as_graph.PROPAGATION_GAO_REXFORD):
+            graph = ASGraph(nx_graph, policy=BGPsecMedSecPolicy(), propagation=propagation)
+            for asys in graph.asyss.values():
+                asys.bgp_sec_enabled = asys.as_id in ('2', '5', '9', '17')
+            for victim in graph.asyss.values():
+                graph.clear_routing_tables()
+                graph.find_routes_to(victim)
+                expected = {as_id: (str(route), route.authenticated)
+                            for as_id, route in ((as_id, asys.routing_table.get(victim.as_id))
+                                                 for as_id, asys in graph.asyss.items()) if route}
+                tree = graph.get_route_tree(victim.as_id)
+                graph.clear_routing_tables()
+                graph.set_route_tree(victim, tree)
+                assert {as_id: (str(route), route.authenticated)
+                        for as_id, route in ((as_id, asys.routing_table.get(victim.as_id))
+                                             for as_id, asys in graph.asyss.items()) if route} == expected
+
+    def test_compiled_preference_key(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        for asys in graph.asyss.values():
+            asys.bgp_sec_enabled = asys.as_id in ('2', '5', '9', '17')
+        graph.find_routes_to(graph.get_asys('17'))
+
+        # All routes to AS 17 which the neighbors of each AS could send to it
+        candidates = [
+            [neighbor.forward_route(neighbor.routing_table['17'], asys) for neighbor in asys.neighbors]
+            for asys in graph.asyss.values() if asys.as_id != '17'
+        ]
+        for policy in [DefaultPolicy(), BGPsecHighSecPolicy(), BGPsecMedSecPolicy(),
+                       BGPsecLowSecPolicy(), RouteLeakPolicy()]:
+            for routes in candidates:
+                for current in routes:
+                    for new in routes:
+                        expected = False
+                        for rule in policy.preference_rules():
+                            if rule(current) != rule(new):
+                                expected = rule(new) < rule(current)
+                                break
+                        assert policy.prefer_route(current, new) == expected
+
     def test_ascones_object_creation(self):
         graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
         asys_8 = graph.get_asys('8')
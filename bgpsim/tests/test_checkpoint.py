@@ -0,0 +1,78 @@
+import unittest
+import os
+import tempfile
+
+import bgpsecsim.checkpoint as checkpoint
+from bgpsecsim.checkpoint import Checkpoint
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'figure')
+
+    def tearDown(self):
+        checkpoint.RESUME = False
+        self.directory.cleanup()
+
+    def test_resume(self):
+        sweep = Checkpoint(self.filename, (3, 4), lambda: [('1', '2'), ('3', '4')])
+        sweep.results[1][2] = 0.5
+        sweep.mark_done(1, 2)
+        sweep.results[2][0] = 0.25
+        # Interrupted before the cell (2, 0) was marked as done
+        del sweep
+
+        checkpoint.RESUME = True
+        sweep = Checkpoint(self.filename, (3, 4), lambda: self.fail("trials are loaded from the checkpoint"))
+        assert sweep.trials == [('1', '2'), ('3', '4')]
+        assert sweep.is_done(1, 2) and sweep.results[1][2] == 0.5
+        assert not sweep.is_done(2, 0)
+        assert sweep.done.sum() == 1
+
+        with self.assertRaises(checkpoint.error.CheckpointError):
+            Checkpoint(self.filename, (4, 4))
+
+        results = sweep.finish()
+        assert results[1][2] == 0.5
+        assert os.listdir(self.directory.name) == []
+
+    def test_columns(self):
+        sweep = Checkpoint(self.filename, (2, 2), columns=('half_width', 'n_trials'))
+        sweep.results[0][1] = 0.5
+        sweep.arrays['n_trials'][0][1] = 30
+        sweep.mark_done(0, 1)
+        del sweep
+
+        checkpoint.RESUME = True
+        sweep = Checkpoint(self.filename, (2, 2), columns=('half_width', 'n_trials'))
+        assert sweep.arrays['n_trials'][0][1] == 30
+        sweep.finish()
+        assert sweep.arrays['n_trials'][0][1] == 30
+        assert os.listdir(self.directory.name) == []
+
+    def test_trial_counts(self):
+        sweep = Checkpoint(self.filename, (2, 2), n_trials=4)
+        sweep.arrays['counts'][1][0][:2] = [[1, 5], [0, 5]]
+        sweep.mark_done(1, 0)
+        del sweep
+
+        checkpoint.RESUME = True
+        with self.assertRaises(checkpoint.error.CheckpointError):
+            Checkpoint(self.filename, (2, 2), n_trials=8)
+        sweep = Checkpoint(self.filename, (2, 2), n_trials=4)
+        assert sweep.arrays['counts'].shape == (2, 2, 4, 2)
+        assert sweep.arrays['counts'][1][0].tolist() == [[1, 5], [0, 5], [0, 0], [0, 0]]
+        sweep.finish()
+        assert os.listdir(self.directory.name) == []
+
+    def test_start_over(self):
+        sweep = Checkpoint(self.filename, (2, 2))
+        sweep.mark_done(0, 0)
+        # Without RESUME, a new run replaces the old checkpoint
+        sweep = Checkpoint(self.filename, (2, 2))
+        assert not sweep.done.any()
+
+if __name__ == '__main__':
+    unittest.main()
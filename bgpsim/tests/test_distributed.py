@@ -0,0 +1,120 @@
+import unittest
+import os
+import itertools
+import multiprocessing as mp
+import time
+from multiprocessing.connection import Client
+
+import numpy as np
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.distributed as distributed
+import bgpsecsim.error as error
+import bgpsecsim.experiments as experiments
+from bgpsecsim.routing_policy import DefaultPolicy
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel-extended.txt')
+AUTHKEY = b'test'
+
+
+def take_chunk(address, hang):
+    # A worker host that receives a chunk and then disappears or hangs
+    with Client(address, authkey=AUTHKEY) as connection:
+        connection.send(('hello', 'fixture'))
+        connection.recv()
+        connection.recv()
+        if hang:
+            connection.recv()
+
+
+class UnpicklableExperiment(experiments.FigureRouteLeakExperiment):
+
+    def __setstate__(self, state):
+        raise RuntimeError("not on this host")
+
+
+class TestCoordinator(unittest.TestCase):
+
+    def setUp(self):
+        self.nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        self.trials = [(victim, attacker)
+                       for victim, attacker in itertools.product(['9', '13', '17', '18'], ['3', '11', '15'])]
+        self.processes = []
+
+    def tearDown(self):
+        for process in self.processes:
+            # Worker hosts stop their pools once the coordinator is closed
+            process.join(timeout=10)
+            process.terminate()
+            process.join()
+
+    def start(self, target, *args):
+        # Worker hosts start pools of their own, so they cannot be daemons
+        process = mp.Process(target=target, args=args)
+        process.start()
+        self.processes.append(process)
+        return process
+
+    def test_worker_hosts(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        top_isps = graph.identify_top_isps(len(graph.asyss))
+        cells = [(top_isps[:n_objects], top_isps[:5]) for n_objects in (0, 8)]
+        expected = [experiments.figureRouteLeak_experiment_selective(graph, self.trials, objects, policies, 'ASPA')
+                    for objects, policies in cells]
+
+        coordinator = distributed.Coordinator(graph, ('localhost', 0), AUTHKEY, 'fixture', chunk_size=5, timeout=2)
+        with coordinator:
+            with Client(coordinator.address, authkey=AUTHKEY) as connection:
+                connection.send(('hello', 'other graph'))
+                assert connection.recv()[0] == 'reject'
+
+            # The chunks taken by these hosts are lost and handed out again
+            dropped = self.start(take_chunk, coordinator.address, False)
+            hanging = self.start(take_chunk, coordinator.address, True)
+            for _ in range(2):
+                self.start(distributed.serve, coordinator.address, AUTHKEY, self.nx_graph, 'fixture', 1)
+
+            results = [experiments.figureRouteLeak_experiment_selective(graph, self.trials, objects, policies, 'ASPA')
+                       for objects, policies in cells]
+            dropped.join()
+        hanging.terminate()
+        for process in self.processes[2:]:
+            process.join()
+            assert process.exitcode == 0
+        assert all(np.array_equal(result, expected_result) for result, expected_result in zip(results, expected))
+
+    def test_failed_trials(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        with distributed.Coordinator(graph, ('localhost', 0), AUTHKEY, 'fixture', chunk_size=5) as coordinator:
+            self.start(distributed.serve, coordinator.address, AUTHKEY, self.nx_graph, 'fixture', 1)
+            experiment = experiments.FigureRouteLeakExperiment(['1'], ['1'], 'ASPA')
+            with self.assertRaises(error.ExperimentError):
+                coordinator.run(experiment, [('9', '3', 'not a trial')])
+            with self.assertRaises(error.ExperimentError):
+                coordinator.run(UnpicklableExperiment(['1'], ['1'], 'ASPA'), self.trials[:2])
+            # The host keeps serving later cells
+            results = coordinator.run(experiment, self.trials[:2])
+            experiment.prepare(graph)
+            assert results == [experiment.run_trial(graph, trial) for trial in self.trials[:2]]
+
+    def test_no_worker_hosts(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        experiment = experiments.FigureRouteLeakExperiment(['1'], ['1'], 'ASPA')
+        with distributed.Coordinator(graph, ('localhost', 0), AUTHKEY, 'fixture', idle_timeout=1) as coordinator:
+            started = time.monotonic()
+            with self.assertRaises(error.ExperimentError):
+                coordinator.run(experiment, self.trials)
+            assert time.monotonic() - started < 10
+
+            # A host connecting later runs the next cell
+            self.start(distributed.serve, coordinator.address, AUTHKEY, self.nx_graph, 'fixture', 1)
+            experiment.prepare(graph)
+            assert coordinator.run(experiment, self.trials[:2]) == [experiment.run_trial(graph, trial)
+                                                                    for trial in self.trials[:2]]
+
+    def test_parse_address(self):
+        assert distributed.parse_address('10.0.0.1:6000') == ('10.0.0.1', 6000)
+        assert distributed.parse_address(':6000') == ('localhost', 6000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,301 @@
+import unittest
+import errno
+import os
+import gc
+import itertools
+import shutil
+import tempfile
+import time
+import multiprocessing as mp
+from unittest import mock
+
+import numpy as np
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.error as error
+import bgpsecsim.experiments as experiments
+import bgpsecsim.seeding as seeding
+from bgpsecsim.baseline import BaselineCache
+from bgpsecsim.routing_policy import DefaultPolicy, RPKIPolicy, PathEndValidationPolicy, BGPsecMedSecPolicy
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel-extended.txt')
+
+
+class FailingExperiment(experiments.Experiment):
+
+    def run_trial(self, graph, trial):
+        raise ValueError(trial)
+
+
+def hold_pool(graph, pids):
+    # A process with a pool of its own that is killed while the pool is running
+    with experiments.ExperimentPool(graph, processes=2) as pool:
+        pids.put((pool._directory, [worker.pid for worker in pool.workers]))
+        time.sleep(60)
+
+
+def is_running(pid):
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # Orphans that exited may not be reaped in containers
+            return f.read().rpartition(')')[2].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+class TestExperimentPool(unittest.TestCase):
+
+    def setUp(self):
+        self.nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        self.trials = [(victim, attacker)
+                       for victim, attacker in itertools.product(['9', '13', '17', '18'], ['3', '11', '15'])]
+
+    def run_directly(self, graph, experiment):
+        experiment.prepare(graph)
+        return [experiment.run_trial(graph, trial) for trial in self.trials]
+
+    def test_get_graph_is_reused(self):
+        graph = experiments.get_graph(self.nx_graph, RPKIPolicy())
+        graph.get_asys('5').bgp_sec_enabled = True
+        assert experiments.get_graph(self.nx_graph, DefaultPolicy()) is graph
+        assert not graph.get_asys('5').bgp_sec_enabled
+        assert all(isinstance(asys.policy, DefaultPolicy) for asys in graph.asyss.values())
+
+    def test_worker_count(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        footprint = experiments.worker_footprint(graph)
+        assert footprint > 0
+        with mock.patch.object(experiments, 'available_memory', return_value=None):
+            assert experiments.worker_count(graph) == experiments.available_cpus()
+            assert experiments.worker_count(graph, 250) == 250
+        with mock.patch.object(experiments, 'available_memory', return_value=int(3.5 * footprint / experiments.MEMORY_FRACTION)):
+            assert experiments.worker_count(graph, 250) == 3
+            assert experiments.worker_count(graph, 2) == 2
+            with mock.patch.object(experiments, 'PARALLELISM', 8):
+                assert experiments.worker_count(graph) == 3
+                assert experiments.ExperimentPool(graph).processes == 3
+        with mock.patch.object(experiments, 'available_memory', return_value=0):
+            assert experiments.worker_count(graph, 4) == 1
+
+    def test_pool_matches_direct_run(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        with experiments.ExperimentPool(graph, processes=2) as pool:
+            # Cells with different deployments alternate on the same workers
+            for _ in range(2):
+                graph = experiments.get_graph(self.nx_graph, RPKIPolicy())
+                for asys in graph.identify_top_isps(3):
+                    asys.policy = PathEndValidationPolicy()
+                experiment = experiments.Figure2aExperiment(graph.get_deployment(), 1)
+                results = experiments.figure2a_experiment(graph, self.trials, n_hops=1)
+                assert results == self.run_directly(graph, experiment)
+
+                graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+                top_isps = graph.identify_top_isps(5)
+                experiment = experiments.FigureRouteLeakExperiment(
+                    [asys.as_id for asys in top_isps], [asys.as_id for asys in top_isps[:2]], 'ASPA')
+                results = experiments.figureRouteLeak_experiment_selective(
+                    graph, self.trials, top_isps, top_isps[:2], 'ASPA')
+                assert np.array_equal(results, self.run_directly(graph, experiment))
+            assert pool.workers
+            # Only the workers keep the objects of the fork out of the garbage collector
+            assert gc.get_freeze_count() == 0
+        assert experiments._active_pool is None
+
+    def test_full_random_deployment_matches_selective(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        all_ids = list(graph.asyss)
+        tier_one_and_two = graph.get_tierOne() + graph.get_tierTwo()
+        for algorithm, objects in (('ASPA', all_ids), ('ASCONES', tier_one_and_two)):
+            selective_experiment = experiments.FigureForgedOriginPrefixHijackExperiment(objects, all_ids, algorithm)
+            assert np.array_equal(experiments.figureForgedOrigin_experiment_random(graph, self.trials, 100, 100, algorithm),
+                                  self.run_directly(graph, selective_experiment))
+
+    def test_random_deployments_are_reproducible(self):
+        seeding.SEED = 8
+        try:
+            graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+            results = experiments.figure11_random_aspa_deployment(self.nx_graph, 30, 30, self.trials)
+            # Trials keep their streams in batches and in a pool
+            batches = [experiments.figure11_random_aspa_deployment(self.nx_graph, 30, 30, self.trials[:5]),
+                       experiments.figure11_random_aspa_deployment(self.nx_graph, 30, 30, self.trials[5:], 5)]
+            assert np.array_equal(np.concatenate(batches), results)
+            with experiments.ExperimentPool(graph, processes=2):
+                assert np.array_equal(experiments.figure11_random_aspa_deployment(self.nx_graph, 30, 30, self.trials), results)
+
+            # Cells and trials draw independent deployments
+            seed = seeding.cell_seed('figure11_random_aspa_deployment', 30, 30)
+            deployments = [experiments.random_deployment(graph, 30, 30, 'ASPA', seeding.trial_rng(seed, i)) for i in range(2)]
+            assert (deployments[0].aspa != deployments[1].aspa).any()
+            assert seeding.cell_seed('figure11_random_aspa_deployment', 30.0, 30).spawn_key == seed.spawn_key
+            assert seeding.cell_seed('figure11_random_aspa_deployment', 30, 40).spawn_key != seed.spawn_key
+        finally:
+            seeding.SEED = None
+
+    def test_baseline_cache(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        top_isps = graph.identify_top_isps(len(graph.asyss))
+        cells = [(top_isps[:n_objects], top_isps[:n_policies]) for n_objects in (0, 4, 12) for n_policies in (3, 18)]
+        expected = [self.run_directly(graph, experiments.FigureForgedOriginPrefixHijackExperiment(
+            [asys.as_id for asys in objects], [asys.as_id for asys in policies], 'ASPA')) for objects, policies in cells]
+
+        with experiments.ExperimentPool(graph, processes=2) as pool:
+            results = [experiments.figureForgedOrigin_experiment_selective(graph, self.trials, objects, policies, 'ASPA')
+                       for objects, policies in cells]
+            # Each victim is routed once (or once per worker, if both look it up at the same time),
+            # the ASPA deployment does not change legitimate routes
+            cache = pool.baseline_cache
+            # Kept in the temporary directory of the pool, in memory where possible
+            assert os.path.dirname(cache.directory) == pool._directory
+            assert 4 <= cache.misses.value <= 8
+            assert cache.hits.value + cache.misses.value == len(cells) * len(self.trials)
+            misses = cache.misses.value
+
+            # Partial BGPsec deployments do change legitimate routes
+            for deployment in (2, 5):
+                graph = experiments.get_graph(self.nx_graph, RPKIPolicy())
+                for asys in graph.identify_top_isps(deployment):
+                    asys.policy = BGPsecMedSecPolicy()
+                    asys.bgp_sec_enabled = True
+                experiment = experiments.Figure2aExperiment(graph.get_deployment(), 1)
+                expected.append(self.run_directly(graph, experiment))
+                results.append(experiments.figure2a_experiment(graph, self.trials, n_hops=1))
+            assert 8 <= cache.misses.value - misses <= 16
+        assert not os.path.exists(cache.directory)
+        assert len(results) == len(expected)
+        assert all(np.array_equal(result, expected_result) for result, expected_result in zip(results, expected))
+
+    def test_baseline_cache_limits(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        victims = [graph.get_asys(as_id) for as_id in ('9', '13', '17', '18')]
+        expected = []
+        for victim in victims:
+            graph.clear_routing_tables()
+            graph.find_routes_to(victim)
+            expected.append({as_id: str(asys.routing_table.get(victim.as_id)) for as_id, asys in graph.asyss.items()})
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = BaselineCache(directory)
+            graph.clear_routing_tables()
+            cache.find_routes_to(graph, victims[0])
+            size = cache.nbytes.value
+            assert cache.entries.value == 1 and size == os.path.getsize(os.path.join(directory, os.listdir(directory)[0]))
+
+        for max_bytes in (0, 2 * size):
+            with tempfile.TemporaryDirectory() as directory:
+                cache = BaselineCache(directory, max_bytes=max_bytes)
+                for victim, routes in zip(victims, expected):
+                    graph.clear_routing_tables()
+                    cache.find_routes_to(graph, victim)
+                    assert {as_id: str(asys.routing_table.get(victim.as_id))
+                            for as_id, asys in graph.asyss.items()} == routes
+                assert cache.entries.value == len(os.listdir(directory)) == max_bytes // size
+                assert cache.nbytes.value <= max_bytes
+
+        # A full file system only keeps the routes from being stored
+        with tempfile.TemporaryDirectory() as directory:
+            cache = BaselineCache(directory)
+            with mock.patch('numpy.savez', side_effect=OSError(errno.ENOSPC, "No space left on device")):
+                for victim, routes in zip(victims, expected):
+                    graph.clear_routing_tables()
+                    cache.find_routes_to(graph, victim)
+                    assert {as_id: str(asys.routing_table.get(victim.as_id))
+                            for as_id, asys in graph.asyss.items()} == routes
+            assert cache.misses.value == len(victims)
+            assert cache.entries.value == cache.nbytes.value == 0
+            assert os.listdir(directory) == []
+
+    @unittest.skipUnless(os.path.exists('/proc/self/smaps_rollup'), "needs /proc/<pid>/smaps_rollup")
+    def test_worker_memory(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        shared, private = experiments.process_memory(os.getpid())
+        assert shared >= 0 and private > 0
+        assert experiments.ExperimentPool(graph, processes=2).worker_memory() is None
+        with experiments.ExperimentPool(graph, processes=2) as pool:
+            experiments.figure2a_experiment(graph, self.trials, n_hops=1)
+            shared, private = pool.worker_memory()
+            # Forked workers share the pages of the parent they have not written to
+            assert shared > 0 and private > 0
+
+    @unittest.skipUnless(os.path.isdir('/proc/self'), "needs /proc")
+    def test_workers_of_killed_pool_stop(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        pids = mp.Queue()
+        with mock.patch.object(experiments, 'PARENT_CHECK_SECONDS', 0.1):
+            process = mp.Process(target=hold_pool, args=(graph, pids))
+            process.start()
+        directory, workers = pids.get(timeout=30)
+        process.kill()
+        process.join()
+        shutil.rmtree(directory)
+        deadline = time.monotonic() + 10
+        while any(is_running(pid) for pid in workers) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert not any(is_running(pid) for pid in workers)
+
+    def test_chunks(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        experiment = experiments.Figure2aExperiment(graph.get_deployment(), 1)
+        expected = self.run_directly(graph, experiment)
+        with experiments.ExperimentPool(graph, processes=2, chunk_size=5) as pool:
+            assert pool.run(experiment, self.trials) == expected
+        with experiments.ExperimentPool(graph, processes=2) as pool:
+            # Single trials until the time per trial is known
+            assert pool.choose_chunk_size(1000) == 1
+            assert pool.run(experiment, self.trials) == expected
+            assert 1 < pool.choose_chunk_size(1000) <= 1000 // 8
+            assert pool.choose_chunk_size(8) == 1
+            assert pool.run(experiment, self.trials * 100) == expected * 100
+
+    def test_spawned_workers(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        top_isps = graph.identify_top_isps(5)
+        for asys in top_isps[:3]:
+            asys.policy = RPKIPolicy()
+        graph.deployment = graph.get_deployment()
+        experiment = experiments.FigureRouteLeakExperiment(
+            [asys.as_id for asys in top_isps], [asys.as_id for asys in top_isps[:2]], 'ASPA')
+        expected = self.run_directly(graph, experiment)
+        start_method = mp.get_start_method()
+        mp.set_start_method('spawn', force=True)
+        try:
+            with experiments.ExperimentPool(graph, processes=2) as pool:
+                assert np.array_equal(pool.run_counts(experiment, self.trials), expected)
+                # The topology was written for the workers to map
+                assert os.listdir(os.path.join(pool._directory, 'topology'))
+        finally:
+            mp.set_start_method(start_method, force=True)
+
+    def test_shared_counts(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        top_isps = graph.identify_top_isps(5)
+        experiment = experiments.FigureRouteLeakExperiment(
+            [asys.as_id for asys in top_isps], [asys.as_id for asys in top_isps[:2]], 'ASPA')
+        expected = experiments.aggregate.as_counts(self.run_directly(graph, experiment))
+        with experiments.ExperimentPool(graph, processes=2) as pool:
+            assert np.array_equal(pool.run_counts(experiment, self.trials), expected)
+            # Cells larger than the buffer grow it
+            many_trials = self.trials * (experiments.COUNTS_CAPACITY // len(self.trials) + 1)
+            counts = pool.run_counts(experiment, many_trials)
+            assert len(counts) == len(many_trials)
+            # Only the larger buffer is kept
+            assert [name for name in os.listdir(pool._directory) if name.startswith('counts-')] == [
+                os.path.basename(pool._counts_file)]
+            assert np.array_equal(counts, np.tile(expected, (len(many_trials) // len(self.trials), 1)))
+            with self.assertRaises(error.ExperimentError):
+                pool.run_counts(FailingExperiment(), self.trials)
+            assert np.array_equal(pool.run_counts(experiment, self.trials[:3]), expected[:3])
+            directory = pool._directory
+        assert not os.path.exists(directory)
+
+    def test_pool_reports_failed_trials(self):
+        graph = experiments.get_graph(self.nx_graph, DefaultPolicy())
+        with experiments.ExperimentPool(graph, processes=2) as pool:
+            with self.assertRaises(error.ExperimentError) as context:
+                pool.run(FailingExperiment(), self.trials)
+            assert 'ValueError' in context.exception.message
+            # The pool keeps serving later cells
+            experiment = experiments.Figure2aExperiment(graph.get_deployment(), 1)
+            assert pool.run(experiment, self.trials) == self.run_directly(graph, experiment)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from bgpsecsim import refinement
+from bgpsecsim.refinement import AdaptiveSweep
+
+
+class TestAdaptiveSweep(unittest.TestCase):
+
+    def test_smooth_results_stay_coarse(self):
+        # Neighbors differ by at most 30 of 300
+        sweep = AdaptiveSweep(lambda objects, policy: 2 * objects + policy, threshold=0.2)
+        sweep.run()
+        assert len(sweep.results) == 11 * 11
+        axis, grid = sweep.dense_grid()
+        assert len(axis) == 321
+        assert np.allclose(grid, 2 * axis[:, np.newaxis] + axis[np.newaxis, :])
+
+    def test_refines_along_edges(self):
+        sweep = AdaptiveSweep(lambda objects, policy: float(objects + policy >= 50))
+        sweep.run()
+        # A 0.3125% grid has 321 x 321 points
+        assert len(sweep.results) < 321 * 321 / 20
+        assert min(side for _, _, side in sweep.leaves) == 0.3125
+        axis, grid = sweep.dense_grid()
+        expected = (axis[:, np.newaxis] + axis[np.newaxis, :] >= 50)
+        # Away from the edge, the interpolated grid is exact
+        far = np.abs(axis[:, np.newaxis] + axis[np.newaxis, :] - 50) > 1
+        assert (grid[far] == expected[far]).all()
+
+    def test_refined_quadrant_keeps_sampled_points(self):
+        # Only the square at the origin changes, so only it is split; its midpoints (5, 10) and
+        # (10, 5) lie on the edges of the coarse squares next to it
+        results = {(0.0, 0.0): 4.0, (5.0, 10.0): 2.0, (10.0, 5.0): 1.0}
+        sweep = AdaptiveSweep(lambda objects, policy: results.get((objects, policy), 0.0),
+                              step=10, min_step=5, high=20)
+        sweep.run()
+        assert sorted(side for _, _, side in sweep.leaves) == [5] * 4 + [10] * 3
+        axis, grid = sweep.dense_grid()
+        # Filled in any order, the coarse squares never overwrite the points evaluated on their edges
+        sweep.leaves.reverse()
+        assert np.array_equal(sweep.dense_grid()[1], grid)
+        for (objects, policy), result in sweep.results.items():
+            assert grid[list(axis).index(objects), list(axis).index(policy)] == result
+        assert grid[1, 2] == 2 and grid[2, 1] == 1
+
+    def test_points(self):
+        sweep = AdaptiveSweep(lambda objects, policy: objects, step=50, threshold=1)
+        sweep.run()
+        assert sweep.points().tolist() == [[objects, policy, objects] for objects in (0, 50, 100) for policy in (0, 50, 100)]
+
+    def test_min_step_for(self):
+        assert refinement.min_step_for(20) == 5
+        assert refinement.min_step_for(70000) == 0.3125
+
+if __name__ == '__main__':
+    unittest.main()
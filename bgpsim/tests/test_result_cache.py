@@ -0,0 +1,60 @@
+import unittest
+import os
+import tempfile
+import itertools
+import sys
+
+import numpy as np
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.experiments as experiments
+import bgpsecsim.result_cache as result_cache
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel-extended.txt')
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        self.trials = [(victim, attacker) for victim, attacker in itertools.product(['9', '13', '17'], ['3', '11'])]
+        self.store = result_cache.configure(self.directory.name, AS_REL_FILEPATH, self.nx_graph)
+
+    def tearDown(self):
+        result_cache._store = None
+        self.directory.cleanup()
+
+    def test_cells_are_reused(self):
+        results = experiments.figure12_selective_aspa_deployment(self.nx_graph, 20, 40, self.trials)
+        assert (self.store.hits, self.store.misses) == (0, 1)
+
+        # Another figure sweeping the same function with float percentages hits the same cell
+        assert np.array_equal(experiments.figure12_selective_aspa_deployment(self.nx_graph, 20.0, 40.0, self.trials), results)
+        assert (self.store.hits, self.store.misses) == (1, 1)
+
+        # A new store on the same directory, like a later run of generate, serves it from disk
+        store = result_cache.configure(self.directory.name, AS_REL_FILEPATH, self.nx_graph)
+        assert np.array_equal(experiments.figure12_selective_aspa_deployment(self.nx_graph, 20, 40, self.trials), results)
+        assert (store.hits, store.misses) == (1, 0)
+
+        experiments.figure12_selective_aspa_deployment(self.nx_graph, 20, 40, self.trials[1:])
+        experiments.figure12_selective_aspa_deployment(self.nx_graph, 40, 20, self.trials)
+        experiments.figure14_selective_aspa_deployment(self.nx_graph, 20, 40, self.trials)
+        assert (store.hits, store.misses) == (1, 3)
+
+    def test_key_covers_experiment_modules(self):
+        # Every module of the simulator the experiments use can change their results
+        modules = {os.path.basename(module.__file__) for module in vars(experiments).values()
+                   if getattr(module, '__name__', '').startswith('bgpsecsim.') and hasattr(module, '__file__')}
+        modules |= {os.path.basename(sys.modules[value.__module__].__file__) for value in vars(experiments).values()
+                    if getattr(value, '__module__', '').startswith('bgpsecsim.')}
+        assert modules - {'error.py', 'result_cache.py'} <= set(result_cache._CODE_MODULES)
+
+    def test_other_graphs_are_not_cached(self):
+        nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        experiments.figure12_selective_aspa_deployment(nx_graph, 20, 40, self.trials)
+        assert (self.store.hits, self.store.misses) == (0, 0)
+
+if __name__ == '__main__':
+    unittest.main()
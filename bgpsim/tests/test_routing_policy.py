@@ -0,0 +1,88 @@
+import unittest
+import os
+import random
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.routing_policy as routing_policy
+from bgpsecsim.asys import Route
+from bgpsecsim.as_graph import ASGraph
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel-extended.txt')
+
+
+class TestPathValidation(unittest.TestCase):
+
+    def random_routes(self, graph, rng, n):
+        asyss = list(graph.asyss.values())
+        for _ in range(n):
+            # Any loop-free sequence of ASes, received by a neighbor of the last one
+            path = rng.sample(asyss, rng.randint(1, 7))
+            verifying_as = rng.choice(list(path[-1].neighbors))
+            if verifying_as in path:
+                continue
+            yield Route(path[0].as_id, path + [verifying_as],
+                        origin_invalid=False, path_end_invalid=False, authenticated=False)
+
+    def random_objects(self, graph, rng):
+        for asys in graph.asyss.values():
+            choice = rng.random()
+            asys.reset_rpki_objects()
+            if choice < 0.6:
+                asys.create_new_aspa(graph)
+                asys.create_new_ascones()
+            elif choice < 0.7:
+                asys.create_dummy_aspa()
+                asys.create_dummy_ascones()
+
+    def test_validate_matches_reference(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        rng = random.Random(0)
+        for _ in range(50):
+            self.random_objects(graph, rng)
+            for route in self.random_routes(graph, rng, 100):
+                assert routing_policy.validate_ASPA(route) == routing_policy.perform_ASPA_algorithm(route)
+                assert routing_policy.validate_ASCONES(route) == routing_policy.perform_ASCONES_algorithm(route)
+
+    def test_validate_propagated_routes(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        rng = random.Random(1)
+        self.random_objects(graph, rng)
+        for victim in graph.asyss.values():
+            graph.find_routes_to(victim)
+            for asys in graph.asyss.values():
+                for neighbor in asys.neighbors:
+                    route = neighbor.forward_route(neighbor.routing_table[victim.as_id], asys)
+                    if route.contains_cycle():
+                        continue
+                    assert routing_policy.validate_ASPA(route) == routing_policy.perform_ASPA_algorithm(route)
+                    assert routing_policy.validate_ASCONES(route) == routing_policy.perform_ASCONES_algorithm(route)
+
+    def test_validate_after_object_change(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        for asys in graph.asyss.values():
+            asys.create_new_aspa(graph)
+        graph.find_routes_to(graph.get_asys('17'))
+        # 17 -> 9 -> 5 -> 2 -> 1 -> 4, received by AS 8 from its provider
+        asys_4 = graph.get_asys('4')
+        route = asys_4.forward_route(asys_4.routing_table['17'], graph.get_asys('8'))
+        assert routing_policy.validate_ASPA(route) == 'Valid'
+        # The memoized summary of the route must not survive a changed ASPA object
+        graph.get_asys('5').create_dummy_aspa()
+        assert routing_policy.validate_ASPA(route) == routing_policy.perform_ASPA_algorithm(route) == 'Invalid'
+        graph.get_asys('5').aspa = None
+        assert routing_policy.validate_ASPA(route) == routing_policy.perform_ASPA_algorithm(route) == 'Unknown'
+
+    def test_hop(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        asys_7, asys_3, asys_8 = graph.get_asys('7'), graph.get_asys('3'), graph.get_asys('8')
+        assert routing_policy.aspa_hop(asys_7, asys_3) == routing_policy.NO_ATTESTATION
+        asys_7.create_new_aspa(graph)
+        assert routing_policy.aspa_hop(asys_7, asys_3) == routing_policy.PROVIDER_PLUS
+        assert routing_policy.aspa_hop(asys_7, asys_8) == routing_policy.NOT_PROVIDER_PLUS
+        asys_3.create_new_ascones()
+        assert routing_policy.ascones_hop(asys_7, asys_3) == routing_policy.PROVIDER_PLUS
+        asys_7.aspa = None
+        assert routing_policy.aspa_hop(asys_7, asys_3) == routing_policy.NO_ATTESTATION
+
+if __name__ == '__main__':
+    unittest.main()
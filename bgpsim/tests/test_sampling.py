@@ -0,0 +1,51 @@
+import unittest
+import bgpsecsim.aggregate as aggregate
+import bgpsecsim.sampling as sampling
+
+
+class TestSampling(unittest.TestCase):
+
+    def setUp(self):
+        self.batches = []
+        self.trials = list(range(1000))
+
+    def tearDown(self):
+        sampling.HALF_WIDTH = None
+        sampling.RELATIVE_ERROR = None
+
+    def run_trials(self, results):
+        def run(trials, first_trial):
+            assert trials[0] == first_trial
+            self.batches.append(len(trials))
+            return aggregate.as_counts([results(trial) for trial in trials])
+        return run
+
+    def test_without_target_runs_all_trials(self):
+        estimate = sampling.sequential_estimate(self.run_trials(lambda trial: (trial % 2, 100)), self.trials)
+        assert self.batches == [1000]
+        assert estimate.n_trials == 1000
+        assert estimate.mean == 0.5
+        # 1.96 * 0.5 / sqrt(1000)
+        self.assertAlmostEqual(estimate.half_width, 0.031, places=3)
+
+    def test_constant_cells_stop_early(self):
+        sampling.HALF_WIDTH = 0.01
+        estimate = sampling.sequential_estimate(self.run_trials(lambda trial: (0, 100)), self.trials)
+        assert self.batches == [sampling.MIN_TRIALS]
+        assert estimate == sampling.Estimate(0.0, 0.0, sampling.MIN_TRIALS)
+
+    def test_batches_double_up_to_cap(self):
+        sampling.HALF_WIDTH = 0.01
+        estimate = sampling.sequential_estimate(self.run_trials(lambda trial: (trial % 2, 100)), self.trials)
+        assert self.batches == [30, 30, 60, 120, 240, 480, 40]
+        assert estimate.n_trials == 1000
+        assert estimate.half_width > 0.01
+
+    def test_relative_error(self):
+        sampling.RELATIVE_ERROR = 0.1
+        estimate = sampling.sequential_estimate(self.run_trials(lambda trial: (trial % 2, 100)), self.trials)
+        assert estimate.half_width <= 0.1 * estimate.mean
+        assert estimate.n_trials == 480
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import os
+import tempfile
+
+import numpy as np
+
+import bgpsecsim.as_graph as as_graph
+from bgpsecsim.asys import Relation
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.routing_policy import ASPAPolicy, DefaultPolicy, RouteLeakPolicy, POLICY_IDS
+from bgpsecsim.topology import Deployment, Topology, TIER_ONE, TIER_TWO, TIER_THREE
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel-extended.txt')
+
+
+class TestTopology(unittest.TestCase):
+
+    def test_csr_matches_as_view(self):
+        nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        topology = Topology.from_nx_graph(nx_graph)
+        graph = ASGraph(topology)
+        assert graph.topology is topology
+        for i, as_id in enumerate(topology.as_ids):
+            asys = graph.get_asys(as_id)
+            assert [topology.as_ids[j] for j in topology.get_customers(i)] == asys.get_customers()
+            assert [topology.as_ids[j] for j in topology.get_providers(i)] == asys.get_providers()
+            assert [topology.as_ids[j] for j in topology.get_peers(i)] == asys.get_peers()
+
+    def test_from_edges_matches_nx_graph(self):
+        # Repeated edges, also listed the other way round or with another relation
+        lines = ['# source: test', '1|2|-1', '3|1|0', '2|4|-1', '4|2|0', '1|2|0', '5|3|-1', '3|5|-1', '2|1|-1', '4|5|0']
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'as-rel.txt')
+            for source in (AS_REL_FILEPATH, None):
+                if source is None:
+                    with open(filename, 'w') as f:
+                        f.write('\n'.join(lines) + '\n')
+                    source = filename
+                expected = Topology.from_nx_graph(as_graph.parse_as_rel_file(source))
+                topology = as_graph.parse_topology(source)
+                assert topology.as_ids == expected.as_ids
+                assert topology.edges.tolist() == expected.edges.tolist()
+                assert topology.edge_relation.tolist() == expected.edge_relation.tolist()
+
+            with open(filename, 'a') as f:
+                f.write('6|7\n')
+            with self.assertRaises(as_graph.error.InvalidASRelFile):
+                as_graph.parse_topology(filename)
+
+    def test_save_and_load(self):
+        nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        topology = Topology.from_nx_graph(nx_graph)
+        with tempfile.TemporaryDirectory() as directory:
+            topology.save(directory, version=1)
+            loaded = Topology.load(directory)
+            assert Topology.metadata(directory) == {'version': 1}
+            assert loaded.as_ids == topology.as_ids and list(loaded) == topology.as_ids
+            assert loaded.directory == directory and topology.directory is None
+            for name in ('edges', 'edge_relation', 'customers_indptr', 'customers', 'peers', 'providers', 'tier', 'rank'):
+                assert (getattr(loaded, name) == getattr(topology, name)).all()
+            # Shared read-only, the deployment lives in the AS objects
+            assert isinstance(loaded.customers, np.memmap) and not loaded.customers.flags.writeable
+            graph = ASGraph(loaded)
+            graph.get_asys('8').policy = ASPAPolicy()
+            assert graph.get_deployment().policy[loaded.index['8']] == POLICY_IDS[ASPAPolicy]
+            del graph, loaded
+
+        converted = topology.to_nx_graph()
+        assert list(converted.nodes) == list(nx_graph.nodes)
+        assert dict(converted.edges) == dict(nx_graph.edges)
+
+    def test_tiers(self):
+        topology = Topology.from_nx_graph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        assert topology.tier[topology.index['1']] == TIER_ONE
+        assert topology.tier[topology.index['5']] == TIER_TWO
+        assert topology.tier[topology.index['17']] == TIER_THREE
+
+    def test_rank_by_customer_degree(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        expected = sorted(graph.asyss.values(),
+                          key=lambda asys: -asys.neighbor_counts_by_relation()[Relation.CUSTOMER])
+        assert graph.identify_top_isps(len(graph.asyss)) == expected
+
+    def test_apply_deployment(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        index = graph.topology.index
+        deployment = Deployment(len(graph.asyss))
+        deployment.policy[[index['5'], index['6']]] = POLICY_IDS[ASPAPolicy]
+        deployment.aspa[[index['7'], index['9']]] = True
+        deployment.bgp_sec_enabled[index['3']] = True
+        graph.apply_deployment(deployment)
+        assert isinstance(graph.get_asys('5').policy, ASPAPolicy)
+        assert graph.get_asys('7').aspa == ('7', ['3', '4'])
+        assert graph.get_asys('3').bgp_sec_enabled
+        applied = graph.get_deployment()
+        for name in Deployment.__slots__:
+            assert (getattr(applied, name) == getattr(deployment, name)).all()
+
+        # Switching deployments only touches the ASes that differ
+        aspa_9 = graph.get_asys('9').aspa
+        deployment = deployment.copy()
+        deployment.aspa[index['7']] = False
+        deployment.policy[index['5']] = POLICY_IDS[RouteLeakPolicy]
+        graph.apply_deployment(deployment)
+        assert graph.get_asys('7').aspa is None
+        assert graph.get_asys('9').aspa is aspa_9
+        assert isinstance(graph.get_asys('5').policy, RouteLeakPolicy)
+
+        graph.apply_deployment(Deployment(len(graph.asyss)))
+        assert all(isinstance(asys.policy, DefaultPolicy) and asys.aspa is None and not asys.bgp_sec_enabled
+                   for asys in graph.asyss.values())
+
+if __name__ == '__main__':
+    unittest.main()